@@ -22,39 +22,11 @@ def create_app():
     # Ensure upload directory exists
     os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
 
-    # Create database indexes
+    # Indexes and data migrations are applied by `flask db upgrade`;
+    # workers only compare the recorded schema version
     with app.app_context():
-        # Users collection indexes
-        mongo.db.users.create_index('email', unique=True)
-        mongo.db.users.create_index('camp_id')
-
-        # Camps collection indexes
-        mongo.db.camps.create_index('name')
-        mongo.db.camps.create_index('leader_id')
-
-        # Messages collection indexes
-        mongo.db.messages.create_index([('recipient_type', 1), ('recipient_id', 1)])
-        mongo.db.messages.create_index('sender_id')
-        mongo.db.messages.create_index('created_at')
-
-        # Meetings collection indexes
-        mongo.db.meetings.create_index('scheduled_start')
-        mongo.db.meetings.create_index('camp_id')
-        mongo.db.meetings.create_index('host_id')
-        mongo.db.meetings.create_index('status')
-
-        # Prayer requests indexes
-        mongo.db.prayer_requests.create_index('user_id')
-        mongo.db.prayer_requests.create_index('camp_id')
-        mongo.db.prayer_requests.create_index('created_at')
-
-        # Notifications indexes
-        mongo.db.notifications.create_index([('user_id', 1), ('is_read', 1)])
-        mongo.db.notifications.create_index('created_at')
-
-        # Meeting messages indexes
-        mongo.db.meeting_messages.create_index('meeting_id')
-        mongo.db.meeting_messages.create_index('timestamp')
+        from app.services.migration_service import check_schema_version
+        check_schema_version(app)
 
     # Register blueprints
     from app.routes.auth import auth_bp
@@ -65,6 +37,7 @@ def create_app():
     from app.routes.prayer_requests import prayer_requests_bp
     from app.routes.meeting_messages import meeting_messages_bp as meeting_chat_blueprint
     from app.routes.health import health_bp
+    from app.routes.uploads import uploads_bp
 
     app.register_blueprint(health_bp, url_prefix='/api')
     app.register_blueprint(auth_bp, url_prefix='/api/auth')
@@ -74,6 +47,14 @@ def create_app():
     app.register_blueprint(meetings_blueprint, url_prefix='/api/meetings')
     app.register_blueprint(meeting_chat_blueprint, url_prefix='/api/meetings/messages')
     app.register_blueprint(prayer_requests_bp, url_prefix='/api/prayer-requests')
+    app.register_blueprint(uploads_bp, url_prefix='/api/uploads')
+
+    # CLI commands (flask db ..., flask indexes ..., flask jobs ..., flask socket ...)
+    from app.commands import db_cli, indexes_cli, jobs_cli, socket_cli
+    app.cli.add_command(db_cli)
+    app.cli.add_command(indexes_cli)
+    app.cli.add_command(jobs_cli)
+    app.cli.add_command(socket_cli)
 
     # Initialize SocketIO
     from app.services.socket_service import configure_socket
@@ -0,0 +1,160 @@
+import click
+from flask.cli import AppGroup
+
+from app import mongo
+
+db_cli = AppGroup('db', help='Schema migrations.')
+indexes_cli = AppGroup('indexes', help='Manage and check MongoDB indexes.')
+jobs_cli = AppGroup('jobs', help='Background job queue.')
+socket_cli = AppGroup('socket', help='Socket.IO tooling.')
+
+@db_cli.command('upgrade')
+@click.option('--target', type=int, default=None, help='Stop at this schema version (default: latest).')
+def db_upgrade_command(target):
+    """Apply pending schema migrations"""
+    from app.services.migration_service import current_version, upgrade
+
+    before = current_version()
+    after = upgrade(target=target, log=click.echo)
+    if after == before:
+        click.echo(f'Schema is up to date (version {after})')
+    else:
+        click.echo(f'Upgraded schema from version {before} to {after}')
+
+@db_cli.command('current')
+def db_current_command():
+    """Show the recorded and expected schema versions"""
+    from app.services.migration_service import current_version, latest_version, pending_migrations
+
+    click.echo(f'Database schema version: {current_version()}')
+    click.echo(f'Latest known version:    {latest_version()}')
+    for m in pending_migrations():
+        click.echo(f"  pending {m['version']}: {m['description']}")
+
+@indexes_cli.command('ensure')
+def ensure_indexes_command():
+    """Create every index declared in the index catalog"""
+    from app.services.index_service import ensure_indexes
+
+    for collection, names in ensure_indexes().items():
+        click.echo(f"{collection}: {', '.join(names)}")
+
+@indexes_cli.command('advise')
+@click.option('--seed', type=int, default=0,
+              help='Seed a scratch database with this many synthetic documents per collection and explain against it.')
+@click.option('--keep', is_flag=True, help='Keep the scratch database after a seeded run.')
+def advise_indexes_command(seed, keep):
+    """Explain each canonical route query and flag COLLSCANs and in-memory SORTs"""
+    from app.services.index_service import advise, ensure_indexes, seed_sample_data, unlisted_indexes
+
+    db = mongo.db
+    if seed:
+        db = mongo.cx[f'{mongo.db.name}_index_advisor']
+        mongo.cx.drop_database(db.name)
+        ensure_indexes(db)
+        seed_sample_data(db, seed)
+        click.echo(f'Seeded {db.name} with {seed} documents per collection')
+
+    problems = 0
+    try:
+        for report in advise(db):
+            status = 'OK  ' if not report['problems'] else 'WARN'
+            problems += bool(report['problems'])
+            click.echo(f"{status} {report['name']}")
+            click.echo(f"     plan: {' <- '.join(s for s in report['stages'] if s)}")
+            click.echo(f"     indexes: {', '.join(report['indexes']) or '-'}")
+            if report['problems']:
+                click.echo(f"     problems: {', '.join(report['problems'])}")
+
+        for collection, names in unlisted_indexes(db).items():
+            click.echo(f"NOTE {collection}: indexes not in the catalog: {', '.join(names)}")
+    finally:
+        if seed and not keep:
+            mongo.cx.drop_database(db.name)
+
+    if problems:
+        raise SystemExit(1)
+
+@jobs_cli.command('work')
+@click.option('--once', is_flag=True, help='Run the jobs that are due now, then exit.')
+def jobs_work_command(once):
+    """Run a job worker in the foreground (use with JOB_WORKERS=0 on web processes)"""
+    import time
+    from app.config import app_config
+    from app.services.job_service import enqueue_periodic_jobs, load_handlers, run_pending, worker_name
+
+    load_handlers()
+    worker_id = worker_name(0)
+    next_scan = 0.0
+    while True:
+        if time.monotonic() >= next_scan:
+            enqueue_periodic_jobs()
+            next_scan = time.monotonic() + app_config.JOB_REMINDER_INTERVAL
+        ran = run_pending(worker_id)
+        if once:
+            click.echo(f'Ran {ran} jobs')
+            return
+        if not ran:
+            time.sleep(app_config.JOB_POLL_INTERVAL)
+
+@jobs_cli.command('status')
+def jobs_status_command():
+    """Show job counts by status and the most recent failures"""
+    counts = mongo.db.jobs.aggregate([{'$group': {'_id': '$status', 'count': {'$sum': 1}}}])
+    for row in sorted(counts, key=lambda r: r['_id']):
+        click.echo(f"{row['_id']}: {row['count']}")
+
+    for job in mongo.db.jobs.find({'status': 'failed'}).sort('finished_at', -1).limit(5):
+        error = (job.get('last_error') or '').strip().splitlines()[-1:] or ['']
+        click.echo(f"failed {job['name']} {job['_id']} after {job['attempts']} attempts: {error[0]}")
+
+def _emit_fanout_cpu(json_module, recipients: int, per_recipient: bool, rounds: int) -> float:
+    """CPU milliseconds for one fan-out of a notification-sized payload to `recipients` sockets"""
+    import time
+    import socketio as sio
+
+    # A detached server: connections are registered directly with the manager and
+    # sends stop after the engine.io packet is encoded, so only encoding and routing are timed
+    server = sio.Server(json=json_module, async_mode='threading')
+    server._send_eio_packet = lambda eio_sid, pkt: pkt.encode()
+    for i in range(recipients):
+        sid = server.manager.connect(f'eio_{i}', '/')
+        server.manager.enter_room(sid, '/', 'ministry')
+        server.manager.enter_room(sid, '/', f'user_{i}')
+
+    payload = {
+        'notification_id': '6ad2be40f9de89e1432c77c9',
+        'type': 'meeting',
+        'title': 'Meeting Update: Sunday prayer',
+        'body': 'New meeting scheduled for October 19 at 09:00 AM',
+        'timestamp': '2026-10-17T09:00:00+00:00'
+    }
+
+    start = time.process_time()
+    for _ in range(rounds):
+        if per_recipient:
+            for i in range(recipients):
+                server.emit('notification', payload, to=f'user_{i}')
+        else:
+            server.emit('notification', payload, to='ministry')
+    return (time.process_time() - start) / rounds * 1000
+
+@socket_cli.command('bench-emit')
+@click.option('--recipients', type=int, default=1000, help='Sockets reached by one fan-out.')
+@click.option('--rounds', type=int, default=20, help='Fan-outs to average over.')
+def bench_emit_command(recipients, rounds):
+    """Compare per-recipient emits with one room emit, for the stdlib and fast JSON codecs"""
+    import json
+    from app.utils import fast_json
+
+    codecs = [('json', json)]
+    if fast_json.BACKEND != 'json':
+        codecs.append((fast_json.BACKEND, fast_json))
+
+    baseline = None
+    click.echo(f'CPU per fan-out to {recipients} sockets (mean of {rounds}):')
+    for name, codec in codecs:
+        for label, per_recipient in (('per-recipient emits', True), ('one room emit', False)):
+            ms = _emit_fanout_cpu(codec, recipients, per_recipient, rounds)
+            baseline = baseline or ms
+            click.echo(f'  {name:<7} {label:<20} {ms:9.2f} ms  ({baseline / ms:6.1f}x)')
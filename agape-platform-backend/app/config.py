@@ -9,7 +9,53 @@ class Config:
     MONGODB_URI = os.getenv('MONGODB_URI')
     JWT_ACCESS_TOKEN_EXPIRES = 60 * 60 * 24  # 24 hours
     UPLOAD_FOLDER = os.path.join(os.getcwd(), 'uploads')
-    MAX_CONTENT_LENGTH = 16 * 1024 * 1024  # 16MB max upload
+    MAX_CONTENT_LENGTH = 16 * 1024 * 1024  # 16MB max request body (and upload chunk)
+    UPLOAD_MAX_SIZE = int(os.getenv('UPLOAD_MAX_SIZE', 512 * 1024 * 1024))  # bytes, chunked uploads of large types
+    UPLOAD_LARGE_EXTENSIONS = set(os.getenv('UPLOAD_LARGE_EXTENSIONS', 'mp4,mp3').lower().split(','))  # may exceed 16MB
+    UPLOAD_CHUNK_SIZE = int(os.getenv('UPLOAD_CHUNK_SIZE', 4 * 1024 * 1024))  # suggested chunk size sent to clients
+    UPLOAD_SESSION_TTL = int(os.getenv('UPLOAD_SESSION_TTL', 24 * 3600))  # seconds an unfinished upload is kept
+    UPLOAD_CLEANUP_INTERVAL = int(os.getenv('UPLOAD_CLEANUP_INTERVAL', 3600))  # seconds between expired-upload sweeps
+    USER_CARD_CACHE_SIZE = int(os.getenv('USER_CARD_CACHE_SIZE', 10000))
+    USER_CARD_CACHE_TTL = int(os.getenv('USER_CARD_CACHE_TTL', 300))  # seconds
+    NOTIFICATION_FANOUT_CHUNK_SIZE = int(os.getenv('NOTIFICATION_FANOUT_CHUNK_SIZE', 1000))  # receipts per insert_many
+    JOB_WORKERS = int(os.getenv('JOB_WORKERS', 2))  # in-process workers; 0 when using `flask jobs work`
+    JOB_POLL_INTERVAL = float(os.getenv('JOB_POLL_INTERVAL', 1.0))  # seconds between empty polls
+    JOB_MAX_ATTEMPTS = int(os.getenv('JOB_MAX_ATTEMPTS', 5))
+    JOB_RETRY_BASE_DELAY = int(os.getenv('JOB_RETRY_BASE_DELAY', 10))  # seconds, doubled per attempt
+    JOB_LOCK_TIMEOUT = int(os.getenv('JOB_LOCK_TIMEOUT', 300))  # seconds before a running job is reclaimed
+    JOB_REMINDER_INTERVAL = int(os.getenv('JOB_REMINDER_INTERVAL', 300))  # seconds between reminder scans
+    JOB_RETENTION = int(os.getenv('JOB_RETENTION', 7 * 24 * 3600))  # seconds finished jobs are kept
+    PRESENCE_BACKEND = os.getenv('PRESENCE_BACKEND', 'memory')  # 'memory' (single worker) or 'mongo'
+    PRESENCE_SNAPSHOT_TTL = float(os.getenv('PRESENCE_SNAPSHOT_TTL', 2.0))  # seconds, mongo backend
+    PRESENCE_HEARTBEAT_INTERVAL = int(os.getenv('PRESENCE_HEARTBEAT_INTERVAL', 30))  # seconds
+    PRESENCE_WORKER_TIMEOUT = int(os.getenv('PRESENCE_WORKER_TIMEOUT', 90))  # seconds without heartbeat
+    PRESENCE_BROADCAST_WINDOW = float(os.getenv('PRESENCE_BROADCAST_WINDOW', 0.25))  # seconds per status batch
+    PRESENCE_BROADCAST_SCOPE = os.getenv('PRESENCE_BROADCAST_SCOPE', 'ministry')  # 'ministry' or 'camp'
+    PRESENCE_LEGACY_STATUS_EVENTS = os.getenv('PRESENCE_LEGACY_STATUS_EVENTS', 'false').lower() == 'true'
+    # Message queue URL shared by all socket workers (e.g. mongodb://..., redis://...); unset = single worker,
+    # or with PRESENCE_BACKEND=mongo a <database>_socketio database on the MONGODB_URI server
+    SOCKETIO_MESSAGE_QUEUE = os.getenv('SOCKETIO_MESSAGE_QUEUE')
+    SOCKETIO_FAST_JSON = os.getenv('SOCKETIO_FAST_JSON', 'true').lower() == 'true'  # orjson packet encoding if installed
+    SOCKET_CHAT_RATE = float(os.getenv('SOCKET_CHAT_RATE', 2.0))  # chat events per second per connection
+    SOCKET_CHAT_BURST = int(os.getenv('SOCKET_CHAT_BURST', 5))
+    SOCKET_TYPING_RATE = float(os.getenv('SOCKET_TYPING_RATE', 4.0))  # typing events per second per connection
+    SOCKET_TYPING_BURST = int(os.getenv('SOCKET_TYPING_BURST', 8))
+    TYPING_REFRESH_INTERVAL = float(os.getenv('TYPING_REFRESH_INTERVAL', 3.0))  # seconds between typing frames
+    TYPING_TIMEOUT = float(os.getenv('TYPING_TIMEOUT', 6.0))  # seconds of silence before "stopped typing"
+    READ_COUNT_BROADCAST_WINDOW = float(os.getenv('READ_COUNT_BROADCAST_WINDOW', 2.0))  # seconds per camp/ministry read_counts frame
+    MEETING_CHAT_QUEUE_SIZE = int(os.getenv('MEETING_CHAT_QUEUE_SIZE', 1000))  # pending meeting chat writes
+    MEETING_CHAT_FLUSH_INTERVAL = float(os.getenv('MEETING_CHAT_FLUSH_INTERVAL', 0.2))  # seconds of chat held in memory at most
+    MEETING_CHAT_FLUSH_BATCH = int(os.getenv('MEETING_CHAT_FLUSH_BATCH', 200))  # flush early at this many pending
+    MEETING_CHAT_MAX_ATTEMPTS = int(os.getenv('MEETING_CHAT_MAX_ATTEMPTS', 50))  # write attempts per message before it is dropped
+    MEETING_CHAT_RECENT_SIZE = int(os.getenv('MEETING_CHAT_RECENT_SIZE', 50))  # messages sent with the join ack; 0 = off
+    MEETING_CHAT_RECENT_MEETINGS = int(os.getenv('MEETING_CHAT_RECENT_MEETINGS', 200))  # live meetings kept in memory
+    ATTENDANCE_FLUSH_INTERVAL = float(os.getenv('ATTENDANCE_FLUSH_INTERVAL', 2.0))  # seconds between attendance writes
+    ATTENDANCE_MAX_ATTEMPTS = int(os.getenv('ATTENDANCE_MAX_ATTEMPTS', 30))  # write attempts per update before it is dropped
+    ATTENDANCE_ROSTER_TTL = int(os.getenv('ATTENDANCE_ROSTER_TTL', 5))  # seconds a meeting roster is cached
+    ROSTER_DELTA_WINDOW = float(os.getenv('ROSTER_DELTA_WINDOW', 0.5))  # seconds per roster_delta frame
+    ROSTER_PAGE_SIZE = int(os.getenv('ROSTER_PAGE_SIZE', 100))  # default roster snapshot page (max 500)
+    MESSAGE_READ_RECEIPTS = os.getenv('MESSAGE_READ_RECEIPTS', 'true').lower() == 'true'  # false = watermarks only
+    SCHEMA_CHECK_ON_STARTUP = os.getenv('SCHEMA_CHECK_ON_STARTUP', 'true').lower() == 'true'
 
 class DevelopmentConfig(Config):
     """Development configuration."""
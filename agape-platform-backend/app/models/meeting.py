@@ -19,7 +19,7 @@ class Meeting:
         self.meeting_link = meeting_link
         self.status = status  # 'scheduled', 'in_progress', 'completed', 'cancelled'
         self.created_at = created_at or datetime.utcnow()
-        self.attendees = []  # List of user IDs who attended
+        self.attendee_count = 0  # Attendees are stored in meeting_attendance
         self.recording_url = None
 
     def to_dict(self):
@@ -37,7 +37,7 @@ class Meeting:
             'meeting_link': self.meeting_link,
             'status': self.status,
             'created_at': self.created_at,
-            'attendees': [str(user_id) for user_id in self.attendees],
+            'attendee_count': self.attendee_count,
             'recording_url': self.recording_url
         }
 
@@ -52,8 +52,7 @@ class Meeting:
             if date_field in data and isinstance(data[date_field], str):
                 data[date_field] = datetime.fromisoformat(data[date_field])
 
-        if 'attendees' in data:
-            data['attendees'] = [ObjectId(id_) if isinstance(id_, str) else id_
-                                for id_ in data['attendees']]
+        data.pop('attendees', None)
+        data.pop('attendee_count', None)
 
         return cls(**data)
@@ -16,7 +16,7 @@ class Message:
         self.is_announcement = is_announcement
         self.created_at = created_at or datetime.utcnow()
         self.is_deleted = is_deleted
-        self.read_by = []  # List of user IDs who have read the message
+        self.read_count = 0  # Readers are tracked in read_state/message_receipts
 
     def to_dict(self):
         """Convert message data to dictionary."""
@@ -30,7 +30,7 @@ class Message:
             'is_announcement': self.is_announcement,
             'created_at': self.created_at,
             'is_deleted': self.is_deleted,
-            'read_by': [str(user_id) for user_id in self.read_by]
+            'read_count': self.read_count
         }
 
     @classmethod
@@ -44,9 +44,9 @@ class Message:
             if isinstance(data['recipient_id'], str):
                 data['recipient_id'] = ObjectId(data['recipient_id'])
 
-        if 'read_by' in data:
-            data['read_by'] = [ObjectId(id_) if isinstance(id_, str) else id_
-                              for id_ in data['read_by']]
+        data.pop('read_by', None)
+        data.pop('read_count', None)
+        data.pop('conversation', None)
 
         if 'created_at' in data and isinstance(data['created_at'], str):
             data['created_at'] = datetime.fromisoformat(data['created_at'])
@@ -4,6 +4,7 @@ from bson.objectid import ObjectId
 from datetime import datetime, timezone
 
 from app import mongo
+from app.services.user_card_service import invalidate_user_card
 
 camps_bp = Blueprint('camps', __name__)
 
@@ -123,6 +124,7 @@ def create_camp():
                 {'_id': new_camp['leader_id']},
                 {'$set': {'role': 'camp_leader', 'camp_id': result.inserted_id}}
             )
+            invalidate_user_card(new_camp['leader_id'])
 
         return jsonify({
             'message': 'Camp created successfully',
@@ -174,6 +176,7 @@ def update_camp(camp_id):
                 {'_id': current_leader_id},
                 {'$set': {'role': 'member'}}
             )
+            invalidate_user_card(current_leader_id)
 
         if new_leader_id:
             # Set new leader's role
@@ -181,6 +184,7 @@ def update_camp(camp_id):
                 {'_id': new_leader_id},
                 {'$set': {'role': 'camp_leader', 'camp_id': ObjectId(camp_id)}}
             )
+            invalidate_user_card(new_leader_id)
 
     if not update_data:
         return jsonify({'message': 'No fields to update'}), 200
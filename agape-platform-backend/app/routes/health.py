@@ -1,6 +1,11 @@
 from flask import Blueprint, jsonify
 from flask_pymongo import PyMongo
 from app import mongo
+from app.services.user_card_service import user_card_cache
+from app.services.presence_service import presence
+from app.services.meeting_chat_buffer import meeting_chat_buffer
+from app.services.meeting_chat_history import recent_meeting_chat
+from app.services.attendance_service import attendance
 
 health_bp = Blueprint('health', __name__)
 
@@ -21,4 +26,15 @@ def health_check():
         status['mongodb'] = f'error: {str(e)}'
         status['status'] = 'degraded'
 
+    # In-process cache counters
+    status['caches'] = {
+        'user_cards': user_card_cache.stats()
+    }
+
+    # Socket presence in this process
+    status['presence'] = presence.counts()
+    status['meeting_chat_buffer'] = meeting_chat_buffer.stats()
+    status['recent_meeting_chat'] = recent_meeting_chat.stats()
+    status['attendance'] = attendance.stats()
+
     return jsonify(status)
@@ -1,10 +1,16 @@
 from flask import Blueprint, request, jsonify
 from flask_jwt_extended import jwt_required, get_jwt_identity, get_jwt
 from bson.objectid import ObjectId
-from datetime import datetime, timezone
 
 from app import mongo
-from app.services.socket_service import emit_to_room
+from app.services.socket_service import emit_to_rooms
+from app.services.meeting_chat_history import recent_meeting_chat, render_meeting_message
+from app.services.hydration_service import get_users_by_ids, collect_ids
+from app.services.user_card_service import get_user_card
+from app.services.meeting_chat_service import (
+    new_meeting_message, insert_meeting_message, find_meeting_messages, count_meeting_messages
+)
+from app.utils.pagination import parse_keyset_args, wants_total, finish_keyset_page, page_response
 
 meeting_messages_bp = Blueprint('meeting_messages', __name__)
 """Blueprint for managing in-meeting communication: chat messages during live meetings."""
@@ -23,28 +29,30 @@ def get_meeting_messages(meeting_id):
     # Check if user has access to meeting
     # For simplicity, anyone who can view the meeting can see its messages
 
-    # Pagination
+    # Pagination: keyset cursors (before/after on created_at, _id) or page numbers
+    try:
+        direction, cursor = parse_keyset_args(request.args)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     page = int(request.args.get('page', 1))
     per_page = int(request.args.get('per_page', 50))  # More messages per page for chat
-    skip = (page - 1) * per_page
+    skip = 0 if cursor else (page - 1) * per_page
 
     # Get messages for this meeting
-    messages = mongo.db.meeting_messages.find(
-        {'meeting_id': ObjectId(meeting_id)}
-    ).sort('created_at', 1).skip(skip).limit(per_page)
+    message_docs, reverse = find_meeting_messages(meeting_id, cursor, direction, skip, per_page + 1)
 
     # Process results
+    message_docs, next_cursor, has_more = finish_keyset_page(message_docs, 'created_at', per_page, reverse)
+    users_by_id = get_users_by_ids(collect_ids(message_docs, 'user_id'))
+
     result = []
-    for msg in messages:
+    for msg in message_docs:
         msg['_id'] = str(msg['_id'])
         msg['user_id'] = str(msg['user_id'])
         msg['meeting_id'] = str(msg['meeting_id'])
 
         # Add user info
-        user = mongo.db.users.find_one(
-            {'_id': ObjectId(msg['user_id'])},
-            {'first_name': 1, 'last_name': 1, 'profile_image': 1}
-        )
+        user = users_by_id.get(msg['user_id'])
         if user:
             msg['user'] = {
                 'id': str(user['_id']),
@@ -59,15 +67,15 @@ def get_meeting_messages(meeting_id):
         result.append(msg)
 
     # Get total count
-    total = mongo.db.meeting_messages.count_documents({'meeting_id': ObjectId(meeting_id)})
+    total = count_meeting_messages(meeting_id) if wants_total(request.args, default=cursor is None) else None
 
-    return jsonify({
-        'messages': result,
-        'total': total,
-        'page': page,
-        'per_page': per_page,
-        'pages': (total + per_page - 1) // per_page
-    }), 200
+    return jsonify(page_response(
+        'messages', result, per_page,
+        page=None if cursor else page,
+        total=total,
+        next_cursor=next_cursor,
+        has_more=has_more
+    )), 200
 
 @meeting_messages_bp.route('/<meeting_id>/messages', methods=['POST'])
 @jwt_required()
@@ -89,46 +97,28 @@ def create_meeting_message(meeting_id):
         return jsonify({'error': 'Message content is required'}), 400
 
     # Create message
-    new_message = {
-        'content': data['content'],
-        'user_id': ObjectId(user_id),
-        'meeting_id': ObjectId(meeting_id),
-        'message_type': data.get('message_type', 'text'),
-        'attachment_urls': data.get('attachment_urls', []),
-        'created_at': datetime.now(timezone.utc)
-    }
-
-    result = mongo.db.meeting_messages.insert_one(new_message)
-
-    if result.inserted_id:
+    new_message = new_meeting_message(
+        meeting_id, user_id, data['content'],
+        message_type=data.get('message_type', 'text'),
+        attachment_urls=data.get('attachment_urls', [])
+    )
+
+    result = insert_meeting_message(new_message)
+
+    if result:
         # Get user info for response
-        user = mongo.db.users.find_one(
-            {'_id': ObjectId(user_id)},
-            {'first_name': 1, 'last_name': 1, 'profile_image': 1}
-        )
+        user = get_user_card(user_id)
 
         # Format response
-        response = {
-            'message_id': str(result.inserted_id),
-            'content': new_message['content'],
-            'user_id': user_id,
-            'meeting_id': meeting_id,
-            'message_type': new_message['message_type'],
-            'attachment_urls': new_message['attachment_urls'],
-            'created_at': new_message['created_at'].isoformat(),
-            'user': {
-                'id': user_id,
-                'name': f"{user['first_name']} {user['last_name']}",
-                'profile_image': user.get('profile_image')
-            }
-        }
+        response = render_meeting_message(new_message, user)
 
-        # Emit via WebSocket
-        emit_to_room('new_meeting_message', response, room=f"meeting_{meeting_id}")
+        # Emit via WebSocket and keep it for late joiners
+        emit_to_rooms('new_meeting_message', response, [f"meeting_{meeting_id}"])
+        recent_meeting_chat.add(meeting_id, response)
 
         return jsonify({
             'message': 'Message sent successfully',
-            'message_id': str(result.inserted_id),
+            'message_id': str(result),
             'data': response
         }), 201
     else:
@@ -5,7 +5,18 @@ from bson.objectid import ObjectId
 from datetime import datetime, timezone, timedelta
 
 from app import mongo
-from app.services.notification_service import send_meeting_notification
+from app.services.notification_service import queue_meeting_notification
+from app.services.job_service import enqueue
+from app.services.fanout_service import audience_room
+from app.services.roster_service import meeting_roster
+from app.services.attendance_service import (
+    attendance, register_attendance, unregister_attendance, get_meeting_attendance, attending_meeting_ids
+)
+from app.services.meeting_service import close_meeting
+from app.services.hydration_service import get_users_by_ids, get_camps_by_ids, collect_ids, user_card
+from app.utils.pagination import (
+    parse_keyset_args, wants_total, keyset_sort, with_keyset, finish_keyset_page, page_response
+)
 
 meetings_bp = Blueprint('meetings', __name__)
 """Blueprint for managing meeting core functionality: creation, scheduling, attendance, etc."""
@@ -63,16 +74,19 @@ def create_meeting():
         'meeting_link': data.get('meeting_link'),
         'status': 'scheduled',
         'created_at': datetime.now(timezone.utc),
-        'attendees': [],
+        'attendee_count': 0,
         'recording_url': None
     }
 
     result = mongo.db.meetings.insert_one(new_meeting)
 
     if result.inserted_id:
-        # Send notifications to relevant users
+        # Notify relevant users and expand recurrences in the background
         meeting_id = str(result.inserted_id)
-        send_meeting_notification(meeting_id, 'created')
+        queue_meeting_notification(meeting_id, 'created', idempotency_key=f"meeting:{meeting_id}:created")
+        if new_meeting['is_recurring'] and new_meeting['recurring_pattern']:
+            enqueue('expand_recurring_meeting', {'meeting_id': meeting_id},
+                    idempotency_key=f"meeting:{meeting_id}:expand")
 
         return jsonify({
             'message': 'Meeting created successfully',
@@ -156,60 +170,68 @@ def get_meetings():
     # Super admins can see all meetings
     # Default: no additional filtering needed
 
-    # Pagination
+    # Pagination: keyset cursors (before/after on scheduled_start, _id) or page numbers
+    try:
+        direction, cursor = parse_keyset_args(request.args)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     page = int(request.args.get('page', 1))
     per_page = int(request.args.get('per_page', 20))
-    skip = (page - 1) * per_page
+    skip = 0 if cursor else (page - 1) * per_page
 
     # Execute query
-    total = mongo.db.meetings.count_documents(filters)
+    total = mongo.db.meetings.count_documents(filters) if wants_total(request.args, default=cursor is None) else None
 
     # Sort by start time, closest first
-    meetings_cursor = mongo.db.meetings.find(filters).sort(
-        'scheduled_start', 1
-    ).skip(skip).limit(per_page)
+    sort, reverse = keyset_sort('scheduled_start', 1, direction)
+    meetings_cursor = mongo.db.meetings.find(
+        with_keyset(filters, 'scheduled_start', cursor, direction)
+    ).sort(sort).skip(skip).limit(per_page + 1)
 
     # Process results
+    meeting_docs, next_cursor, has_more = finish_keyset_page(
+        list(meetings_cursor), 'scheduled_start', per_page, reverse
+    )
+
+    # Resolve hosts, camps and the caller's attendance for the whole page up front
+    hosts_by_id = get_users_by_ids(collect_ids(meeting_docs, 'host_id'))
+    camps_by_id = get_camps_by_ids(collect_ids(meeting_docs, 'camp_id'))
+    attending = attending_meeting_ids(user_id, collect_ids(meeting_docs, '_id'))
+
     meetings = []
-    for meeting in meetings_cursor:
+    for meeting in meeting_docs:
         meeting['_id'] = str(meeting['_id'])
         meeting['host_id'] = str(meeting['host_id'])
         if 'camp_id' in meeting and meeting['camp_id']:
             meeting['camp_id'] = str(meeting['camp_id'])
 
         # Add host information
-        host = mongo.db.users.find_one(
-            {'_id': ObjectId(meeting['host_id'])},
-            {'password_hash': 0, 'first_name': 1, 'last_name': 1, 'profile_image': 1}
-        )
+        host = hosts_by_id.get(meeting['host_id'])
         if host:
-            host['_id'] = str(host['_id'])
-            meeting['host'] = host
+            meeting['host'] = user_card(host)
 
         # Add camp information if applicable
         if 'camp_id' in meeting and meeting['camp_id']:
-            camp = mongo.db.camps.find_one(
-                {'_id': ObjectId(meeting['camp_id'])},
-                {'name': 1}
-            )
+            camp = camps_by_id.get(meeting['camp_id'])
             if camp:
                 meeting['camp_name'] = camp['name']
 
-        # Convert attendees to strings
-        meeting['attendees'] = [str(uid) for uid in meeting.get('attendees', [])]
+        # Attendees live in meeting_attendance; lists only carry the count
+        meeting.pop('attendees', None)
+        meeting.setdefault('attendee_count', 0)
 
         # Check if current user is attending
-        meeting['is_attending'] = ObjectId(user_id) in meeting.get('attendees', [])
+        meeting['is_attending'] = meeting['_id'] in attending
 
         meetings.append(meeting)
 
-    return jsonify({
-        'meetings': meetings,
-        'total': total,
-        'page': page,
-        'per_page': per_page,
-        'pages': (total + per_page - 1) // per_page
-    }), 200
+    return jsonify(page_response(
+        'meetings', meetings, per_page,
+        page=None if cursor else page,
+        total=total,
+        next_cursor=next_cursor,
+        has_more=has_more
+    )), 200
 
 @meetings_bp.route('/<meeting_id>', methods=['GET'])
 @jwt_required()
@@ -242,15 +264,6 @@ def get_meeting(meeting_id):
     if 'camp_id' in meeting and meeting['camp_id']:
         meeting['camp_id'] = str(meeting['camp_id'])
 
-    # Add host information
-    host = mongo.db.users.find_one(
-        {'_id': ObjectId(meeting['host_id'])},
-        {'password_hash': 0, 'first_name': 1, 'last_name': 1, 'profile_image': 1}
-    )
-    if host:
-        host['_id'] = str(host['_id'])
-        meeting['host'] = host
-
     # Add camp information if applicable
     if 'camp_id' in meeting and meeting['camp_id']:
         camp = mongo.db.camps.find_one({'_id': ObjectId(meeting['camp_id'])})
@@ -258,27 +271,52 @@ def get_meeting(meeting_id):
             camp['_id'] = str(camp['_id'])
             meeting['camp'] = camp
 
-    # Convert attendees to strings
-    meeting['attendees'] = [str(uid) for uid in meeting.get('attendees', [])]
+    # Attendance records and the live roster; host and people resolved in one user query
+    records = get_meeting_attendance(meeting['_id'])
+    roster = attendance.roster(meeting['_id'])
+    users_by_id = get_users_by_ids(
+        [meeting['host_id']] + collect_ids(records, 'user_id') + [entry['user_id'] for entry in roster]
+    )
 
-    # Check if current user is attending
-    meeting['is_attending'] = ObjectId(user_id) in meeting.get('attendees', [])
+    # Add host information
+    host = users_by_id.get(meeting['host_id'])
+    if host:
+        meeting['host'] = user_card(host)
+
+    meeting['attendees'] = [str(record['user_id']) for record in records]
+    meeting['attendee_count'] = len(records)
+    meeting['is_attending'] = user_id in meeting['attendees']
+    meeting['attendees_details'] = [
+        user_card(users_by_id[attendee_id]) for attendee_id in meeting['attendees'] if attendee_id in users_by_id
+    ]
+    meeting['participants'] = [
+        dict(user_card(users_by_id[entry['user_id']]), joined_at=entry['joined_at'].isoformat() if entry['joined_at'] else None)
+        for entry in roster if entry['user_id'] in users_by_id
+    ]
 
-    # Add attendee details
-    if meeting.get('attendees'):
-        attendees_details = []
-        for attendee_id in meeting['attendees']:
-            attendee = mongo.db.users.find_one(
-                {'_id': ObjectId(attendee_id)},
-                {'password_hash': 0, 'first_name': 1, 'last_name': 1, 'profile_image': 1}
-            )
-            if attendee:
-                attendee['_id'] = str(attendee['_id'])
-                attendees_details.append(attendee)
+    return jsonify({'meeting': meeting}), 200
 
-        meeting['attendees_details'] = attendees_details
+@meetings_bp.route('/<meeting_id>/roster', methods=['GET'])
+@jwt_required()
+def get_meeting_roster(meeting_id):
+    """Who is in the meeting right now, paged in join order"""
+    claims = get_jwt()
 
-    return jsonify({'meeting': meeting}), 200
+    meeting = mongo.db.meetings.find_one({'_id': ObjectId(meeting_id)}, {'camp_id': 1})
+    if not meeting:
+        return jsonify({'error': 'Meeting not found'}), 404
+
+    # Camp meetings are visible to the camp (and super admins)
+    if meeting.get('camp_id') and str(meeting['camp_id']) != claims.get('camp_id') \
+            and claims.get('role') != 'super_admin':
+        return jsonify({'error': 'Unauthorized access to this meeting'}), 403
+
+    try:
+        roster = meeting_roster.snapshot(meeting_id, request.args.get('cursor'), request.args.get('limit'))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    return jsonify(roster), 200
 
 @meetings_bp.route('/<meeting_id>', methods=['PUT'])
 @jwt_required()
@@ -349,9 +387,9 @@ def update_meeting(meeting_id):
     if result.modified_count:
         # Send notifications for status changes
         if 'status' in update_data and update_data['status'] != meeting['status']:
-            send_meeting_notification(meeting_id, 'status_changed', new_status=update_data['status'])
+            queue_meeting_notification(meeting_id, 'status_changed', new_status=update_data['status'])
         elif 'scheduled_start' in update_data or 'scheduled_end' in update_data:
-            send_meeting_notification(meeting_id, 'rescheduled')
+            queue_meeting_notification(meeting_id, 'rescheduled')
 
         return jsonify({'message': 'Meeting updated successfully'}), 200
     else:
@@ -384,7 +422,7 @@ def delete_meeting(meeting_id):
 
     if result.modified_count:
         # Send cancellation notification
-        send_meeting_notification(meeting_id, 'cancelled')
+        queue_meeting_notification(meeting_id, 'cancelled', idempotency_key=f"meeting:{meeting_id}:cancelled")
 
         return jsonify({'message': 'Meeting cancelled successfully'}), 200
     else:
@@ -419,11 +457,8 @@ def attend_meeting(meeting_id):
     if not can_access:
         return jsonify({'error': 'Unauthorized access to this meeting'}), 403
 
-    # Add user to attendees if not already there
-    result = mongo.db.meetings.update_one(
-        {'_id': ObjectId(meeting_id)},
-        {'$addToSet': {'attendees': ObjectId(user_id)}}
-    )
+    # Record the RSVP on the user's attendance document
+    register_attendance(meeting_id, user_id)
 
     return jsonify({'message': 'Successfully registered attendance'}), 200
 
@@ -441,11 +476,8 @@ def leave_meeting(meeting_id):
     if meeting['status'] not in ['scheduled', 'in_progress']:
         return jsonify({'error': 'Cannot leave a completed or cancelled meeting'}), 400
 
-    # Remove user from attendees
-    result = mongo.db.meetings.update_one(
-        {'_id': ObjectId(meeting_id)},
-        {'$pull': {'attendees': ObjectId(user_id)}}
-    )
+    # Withdraw the RSVP
+    unregister_attendance(meeting_id, user_id)
 
     return jsonify({'message': 'Successfully unregistered attendance'}), 200
 
@@ -479,8 +511,8 @@ def start_meeting(meeting_id):
     )
 
     if result.modified_count:
-        # Send notification via notification service
-        send_meeting_notification(meeting_id, 'started')
+        # Queue notification via notification service
+        queue_meeting_notification(meeting_id, 'started', idempotency_key=f"meeting:{meeting_id}:started")
 
         # Also emit via WebSocket from socket service
         from app.services.socket_service import socketio
@@ -540,11 +572,14 @@ def end_meeting(meeting_id):
     )
 
     if result.modified_count:
-        # Send notification via notification service
-        send_meeting_notification(meeting_id, 'ended')
+        # Chat flush, recent-chat eviction, attendance and roster close-out
+        close_meeting(meeting_id)
+
+        # Queue notification via notification service
+        queue_meeting_notification(meeting_id, 'ended', idempotency_key=f"meeting:{meeting_id}:ended")
 
         # Also emit via WebSocket from socket service
-        from app.services.socket_service import socketio
+        from app.services.socket_service import emit_to_rooms
 
         # Notify all participants in the meeting room
         meeting_data = {
@@ -556,13 +591,9 @@ def end_meeting(meeting_id):
             'recording_url': recording_url
         }
 
-        socketio.emit('meeting_ended', meeting_data, room=f"meeting_{meeting_id}")
-
-        # Also notify the camp or ministry
-        if meeting.get('camp_id'):
-            socketio.emit('meeting_ended', meeting_data, room=f"camp_{str(meeting['camp_id'])}")
-        else:
-            socketio.emit('meeting_ended', meeting_data, room="ministry")
+        # One emit to the meeting room plus the camp or ministry; attendees in both get it once
+        emit_to_rooms('meeting_ended', meeting_data,
+                      [f"meeting_{meeting_id}", audience_room(meeting.get('camp_id'))])
 
         return jsonify({'message': 'Meeting ended successfully'}), 200
     else:
@@ -4,12 +4,28 @@ from typing import Any, Dict, List, cast
 from flask import Blueprint, request, jsonify
 from flask_jwt_extended import jwt_required, get_jwt_identity, get_jwt
 from bson.objectid import ObjectId, InvalidId # Import InvalidId for error handling
-from datetime import datetime, timezone
+from datetime import datetime
 import os
 
 from app import mongo
 from app.config import app_config
 from app.utils.helpers import serialize_document # Use the helper
+from app.services.hydration_service import user_card, get_users_by_ids, get_camps_by_ids, collect_ids
+from app.services.inbox_service import get_inbox_page
+from app.utils.pagination import (
+    parse_keyset_args, wants_total, keyset_sort, with_keyset, finish_keyset_page, page_response
+)
+from app.services.user_card_service import get_user_card
+from app.services.delivery_service import message_rooms, participant_rooms
+from app.services.conversation_service import (
+    new_message_doc, conversation_of, can_read_conversation, record_message, message_deleted,
+    find_conversations, render_conversation, CONVERSATION_TYPES
+)
+from app.services.upload_service import allowed_file, stored_filename
+from app.services.unread_service import message_sent, message_deleted as unread_message_deleted, get_unread_summary
+from app.services.read_state_service import (
+    mark_message_read, read_flags, parse_read_request, mark_conversation_read, messages_read_payload
+)
 
 messages_bp = Blueprint('messages', __name__)
 
@@ -60,23 +76,19 @@ def create_message():
 
     temp_id = data.get('tempId')
     # Create message document
-    new_message = {
-        'content': data['content'],
-        'sender_id': ObjectId(user_id),
-        'recipient_type': data['recipient_type'],
-        'recipient_id': ObjectId(data['recipient_id']) if data['recipient_type'] in ['camp', 'user'] else None,
-        'message_type': data.get('message_type', 'text'),
-        'attachment_urls': data.get('attachment_urls', []),
-        'is_announcement': data.get('is_announcement', False),
-        'created_at': datetime.now(timezone.utc),
-        'is_deleted': False,
-        'read_by': []
-    }
+    new_message = new_message_doc(
+        user_id, data['recipient_type'], data.get('recipient_id'), data['content'],
+        message_type=data.get('message_type', 'text'),
+        attachment_urls=data.get('attachment_urls', []),
+        is_announcement=data.get('is_announcement', False)
+    )
 
     result = mongo.db.messages.insert_one(new_message)
 
     if result.inserted_id:
         message_id = str(result.inserted_id)
+        message_sent(new_message)
+        record_message(new_message)
 
         # Include the temp_id in response if it was provided
         response_data = {
@@ -88,7 +100,7 @@ def create_message():
             response_data['tempId'] = temp_id
 
             # Emit a message confirmation event
-            from app.services.socket_service import emit_to_room
+            from app.services.socket_service import emit_to_rooms
 
             confirmation_data = {
                 'tempId': temp_id,
@@ -97,42 +109,14 @@ def create_message():
                 'recipient_id': data['recipient_id']
             }
 
-            # socketio.emit('message_confirmed', confirmation_data, room=f"user_{user_id}")
-            # if data['recipient_type'] == 'user':
-            #     socketio.emit('message_confirmed', confirmation_data, room=f"user_{data['recipient_id']}")
+            # Send to both the sender and recipient in one emit
+            emit_to_rooms('message_confirmed', confirmation_data,
+                          participant_rooms(data['recipient_type'], user_id, data['recipient_id']))
 
-            # Send to both the sender and recipient
-            emit_to_room('message_confirmed', confirmation_data, room=f"user_{user_id}")
-            if data['recipient_type'] == 'user':
-                emit_to_room('message_confirmed', confirmation_data, room=f"user_{data['recipient_id']}")
-
-            sender = mongo.db.users.find_one(
-                {'_id': ObjectId(user_id)},
-                {'password_hash': 0, 'first_name': 1, 'last_name': 1, 'profile_image': 1}
-            )
-
-            # Format message for socket delivery
-            # message_response = {
-            #     'message_id': message_id,
-            #     'tempId': temp_id,
-            #     'content': data['content'],
-            #     'sender_id': user_id,
-            #     'recipient_type': data['recipient_type'],
-            #     'recipient_id': data['recipient_id'],
-            #     'created_at': new_message['created_at'].isoformat(),
-            #     'read_by': [],
-            #     'sender': {
-            #         'id': user_id,
-            #         'first_name': sender['first_name'],
-            #         'last_name': sender['last_name'],
-            #         'profile_image': sender.get('profile_image', None)
-            #     }
-            # }
+            sender = get_user_card(user_id)
 
             # Emit to recipient
             if data['recipient_type'] == 'user':
-                from app.services.socket_service import socketio
-
                 # Create a formatted message response
                 message_response = {
                     'message_id': message_id,
@@ -142,7 +126,7 @@ def create_message():
                     'recipient_type': data['recipient_type'],
                     'recipient_id': data['recipient_id'],
                     'created_at': new_message['created_at'].isoformat(),
-                    'read_by': [],
+                    'read_count': 0,
                     'sender': {
                         'id': user_id,
                         'first_name': sender['first_name'],
@@ -151,18 +135,9 @@ def create_message():
                     }
                 }
 
-                # Create consistent chat room name
-                chat_participants = sorted([user_id, data['recipient_id']])
-                chat_room = f"chat_{chat_participants[0]}_{chat_participants[1]}"
-
-                # Emit to the chat room
-                print(f"REST API: Emitting new_message to chat room: {chat_room}")
-                emit_to_room('new_message', message_response, room=chat_room)
-
-                # Also emit to individual user sockets
-                emit_to_room('new_message', message_response, room=f"user_{data['recipient_id']}")
-                emit_to_room('new_message', message_response, room=f"user_{user_id}")
-
+                # One emit reaches the chat room and both user rooms, each socket once
+                emit_to_rooms('new_message', message_response,
+                              message_rooms(data['recipient_type'], user_id, data['recipient_id']))
 
         return jsonify(response_data), 201
     else:
@@ -194,10 +169,16 @@ def get_messages():
 
 
         # --- Pagination ---
+        # Keyset cursors (before/after on created_at, _id) or legacy page numbers
+        try:
+            direction, cursor = parse_keyset_args(request.args)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
         page = int(request.args.get('page', 1))
         per_page = int(request.args.get('per_page', 50)) # Increase default for conversation view
         limit = int(request.args.get('limit', per_page))
-        skip = (page - 1) * limit
+        skip = 0 if cursor else (page - 1) * limit
+        include_total = wants_total(request.args, default=cursor is None)
 
         # --- Build Filters ---
         filters: Dict[str, Any] = {'is_deleted': False}
@@ -209,8 +190,8 @@ def get_messages():
             {'recipient_type': 'user', 'recipient_id': user_id},
             # Personal messages FROM the user
             {'recipient_type': 'user', 'sender_id': user_id},
-             # Ministry-wide messages
-            {'recipient_type': 'ministry'}
+             # Ministry-wide messages (recipient_id is always null; pinning it keeps the index sort)
+            {'recipient_type': 'ministry', 'recipient_id': None}
         ]
         if user_camp_id:
              # Camp messages for the user's camp
@@ -240,9 +221,14 @@ def get_messages():
                  filters['recipient_type'] = 'camp'
                  filters['recipient_id'] = user_camp_id
              else: # User not in a camp, cannot fetch camp messages specifically
-                  return jsonify({'messages': [], 'total': 0, 'page': page, 'per_page': limit, 'pages': 0}), 200
+                  return jsonify(page_response(
+                      'messages', [], limit,
+                      page=None if cursor else page,
+                      total=0 if include_total else None
+                  )), 200
         elif message_type_filter == 'ministry':
             filters['recipient_type'] = 'ministry'
+            filters['recipient_id'] = None
         elif message_type_filter == 'sent':
              filters['sender_id'] = user_id
         else:
@@ -267,29 +253,27 @@ def get_messages():
 
         # --- Execute Query ---
         print(f"DEBUG: Messages query filters: {filters}") # Log filters
-        total = mongo.db.messages.count_documents(filters)
-        messages_cursor = mongo.db.messages.find(filters).sort(
-            'created_at', -1
-        ).skip(skip).limit(limit)
+        sort, reverse = keyset_sort('created_at', -1, direction)
+        query = with_keyset(filters, 'created_at', cursor, direction)
+
+        # Page, total and sender/recipient cards in one aggregation round trip.
+        # The total always covers the whole list, so with a cursor it needs its own count.
+        message_docs, total = get_inbox_page(
+            query, skip=skip, limit=limit + 1,
+            include_total=include_total and cursor is None, sort=sort
+        )
+        if include_total and cursor is not None:
+            total = mongo.db.messages.count_documents(filters)
+        message_docs, next_cursor, has_more = finish_keyset_page(message_docs, 'created_at', limit, reverse)
 
         # --- Process Results ---
+        read_by_me = read_flags(user_id, message_docs)
         messages_list = []
-        user_cache = {} # Simple cache for user details
+        for msg_doc in message_docs:
+            sender = msg_doc.pop('sender', None)
+            recipient_user = msg_doc.pop('recipient_user', None)
+            recipient_camp = msg_doc.pop('recipient_camp', None)
 
-        def get_user_details(uid_str):
-            if not uid_str: return None
-            if uid_str in user_cache: return user_cache[uid_str]
-            try:
-                details = mongo.db.users.find_one(
-                    {'_id': ObjectId(uid_str)},
-                    {'first_name': 1, 'last_name': 1, 'profile_image': 1}
-                )
-                user_cache[uid_str] = serialize_document(details) if details else None
-                return user_cache[uid_str]
-            except InvalidId:
-                return None
-
-        for msg_doc in messages_cursor:
             serialized_msg_data= serialize_document(msg_doc)
 
             if not isinstance(serialized_msg_data, dict):
@@ -298,29 +282,29 @@ def get_messages():
                 continue
             msg: Dict[str, Any] = cast(Dict[str, Any], serialized_msg_data)
 
-            msg['sender'] = get_user_details(msg.get('sender_id'))
+            msg['sender'] = user_card(sender)
 
             if msg['recipient_type'] == 'user' and msg.get('recipient_id'):
-                msg['recipient'] = get_user_details(msg.get('recipient_id'))
+                msg['recipient'] = user_card(recipient_user)
             elif msg['recipient_type'] == 'camp' and msg.get('recipient_id'):
-                camp_info = mongo.db.camps.find_one({'_id': ObjectId(msg['recipient_id'])}, {'name': 1})
-                if camp_info:
-                    msg['recipient'] = {'name': camp_info.get('name', 'Unknown Camp')}
-                    msg['camp_name'] = camp_info.get('name')
+                if recipient_camp:
+                    msg['recipient'] = {'name': recipient_camp.get('name', 'Unknown Camp')}
+                    msg['camp_name'] = recipient_camp.get('name')
 
-            # Read status needs ObjectId comparison
-            msg['is_read'] = user_id in msg_doc.get('read_by', [])
-            msg['read_by'] = [str(uid) for uid in msg_doc.get('read_by', [])] # Keep string list for frontend
+            # Read state: a flag for the caller and a counter, never the reader list
+            msg.pop('read_by', None)
+            msg['is_read'] = read_by_me.get(msg_doc['_id'], False)
+            msg['read_count'] = msg_doc.get('read_count', 0)
 
             messages_list.append(msg)
 
-        return jsonify({
-            'messages': messages_list,
-            'total': total,
-            'page': page,
-            'per_page': limit,
-            'pages': (total + limit - 1) // limit
-        }), 200
+        return jsonify(page_response(
+            'messages', messages_list, limit,
+            page=None if cursor else page,
+            total=total,
+            next_cursor=next_cursor,
+            has_more=has_more
+        )), 200
 
     except Exception as e:
         print(f"ERROR in get_messages: {e}")
@@ -360,11 +344,8 @@ def get_message(message_id):
         return jsonify({'error': 'Unauthorized access to this message'}), 403
 
     # Mark as read if not already
-    if ObjectId(user_id) not in message.get('read_by', []):
-        mongo.db.messages.update_one(
-            {'_id': ObjectId(message_id)},
-            {'$addToSet': {'read_by': ObjectId(user_id)}}
-        )
+    if mark_message_read(user_id, message):
+        message['read_count'] = message.get('read_count', 0) + 1
 
     # Format response
     message['_id'] = str(message['_id'])
@@ -373,23 +354,15 @@ def get_message(message_id):
         message['recipient_id'] = str(message['recipient_id'])
 
     # Add sender information
-    sender = mongo.db.users.find_one(
-        {'_id': ObjectId(message['sender_id'])},
-        {'password_hash': 0, 'first_name': 1, 'last_name': 1, 'profile_image': 1}
-    )
+    sender = get_user_card(message['sender_id'])
     if sender:
-        sender['_id'] = str(sender['_id'])
-        message['sender'] = sender
+        message['sender'] = user_card(sender)
 
     # Add recipient information for personal messages
     if message['recipient_type'] == 'user':
-        recipient = mongo.db.users.find_one(
-            {'_id': ObjectId(message['recipient_id'])},
-            {'password_hash': 0, 'first_name': 1, 'last_name': 1, 'profile_image': 1}
-        )
+        recipient = get_user_card(message['recipient_id'])
         if recipient:
-            recipient['_id'] = str(recipient['_id'])
-            message['recipient'] = recipient
+            message['recipient'] = user_card(recipient)
 
     # Add camp information for camp messages
     if message['recipient_type'] == 'camp':
@@ -398,8 +371,9 @@ def get_message(message_id):
             camp['_id'] = str(camp['_id'])
             message['recipient'] = {'name': camp['name']}
 
-    message['read_by'] = [str(uid) for uid in message.get('read_by', [])]
-    message['is_read'] = ObjectId(user_id) in message.get('read_by', [])
+    message.pop('read_by', None)
+    message['is_read'] = True
+    message['read_count'] = message.get('read_count', 0)
 
     return jsonify({'message': message}), 200
 
@@ -436,47 +410,97 @@ def delete_message(message_id):
     )
 
     if result.modified_count:
+        message_deleted(message)
+        unread_message_deleted(message)
         return jsonify({'message': 'Message deleted successfully'}), 200
     else:
         return jsonify({'error': 'Failed to delete message'}), 500
 
+@messages_bp.route('/conversations', methods=['GET'])
+@jwt_required()
+def get_conversations():
+    """The user's conversations with a last-message preview and unread count, most recent first"""
+    user_id = get_jwt_identity()
+    claims = get_jwt()
+
+    try:
+        direction, cursor = parse_keyset_args(request.args)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    limit = min(int(request.args.get('limit', 20)), 100)
+
+    conversation_type = request.args.get('type')
+    kind = CONVERSATION_TYPES.get(conversation_type) if conversation_type else None
+    if conversation_type and not kind:
+        return jsonify({'error': 'type must be personal, camp or ministry'}), 400
+
+    docs, reverse = find_conversations(user_id, claims.get('camp_id'), kind, cursor, direction, limit)
+    docs, next_cursor, has_more = finish_keyset_page(docs, 'last_message_at', limit, reverse)
+
+    # Partners and camp names for the page, and the user's unread counters
+    users_by_id = get_users_by_ids([p for doc in docs for p in doc.get('participants', [])])
+    camps_by_id = get_camps_by_ids(collect_ids(docs, 'camp_id'))
+    unread = get_unread_summary(user_id)['conversations']
+
+    conversations = [render_conversation(doc, user_id, users_by_id, camps_by_id, unread) for doc in docs]
+    return jsonify(page_response(
+        'conversations', conversations, limit, next_cursor=next_cursor, has_more=has_more
+    )), 200
+
+@messages_bp.route('/unread-summary', methods=['GET'])
+@jwt_required()
+def unread_summary():
+    """Unread message counts per conversation and unread notifications, for badges"""
+    user_id = get_jwt_identity()
+    refresh = request.args.get('refresh', 'false').lower() == 'true'
+    return jsonify(get_unread_summary(user_id, refresh=refresh)), 200
+
+@messages_bp.route('/read', methods=['POST'])
+@jwt_required()
+def mark_read():
+    """Mark a conversation read up to a timestamp, or a list of its messages, in one write"""
+    user_id = get_jwt_identity()
+    claims = get_jwt()
+    data = request.get_json() or {}
+
+    try:
+        conversation, upto, message_ids = parse_read_request(data)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    # Camp membership from the token claims, not a users lookup
+    if not can_read_conversation(conversation, user_id, claims.get('camp_id')):
+        return jsonify({'error': 'Unauthorized access to this conversation'}), 403
+
+    result = mark_conversation_read(user_id, conversation, upto=upto, message_ids=message_ids)
+    payload = messages_read_payload(user_id, conversation, result)
+
+    # Only when something changed; large audiences get a coalesced read_counts frame
+    if result['count']:
+        try:
+            from app.services.socket_service import publish_messages_read
+            publish_messages_read(user_id, conversation, payload)
+        except Exception as socket_err:
+            print(f"Error emitting read state via socket: {socket_err}")
+
+    return jsonify(payload), 200
+
 @messages_bp.route('/<message_id>/read', methods=['POST'])
 @jwt_required()
 def mark_as_read(message_id):
     user_id = get_jwt_identity()
+    claims = get_jwt()
 
     message = mongo.db.messages.find_one({'_id': ObjectId(message_id)})
 
     if not message:
         return jsonify({'error': 'Message not found'}), 404
 
-    # Check if user has access to this message
-    can_access = False
-
-    # Ministry-wide messages are accessible to all
-    if message['recipient_type'] == 'ministry':
-        can_access = True
-
-    # Camp messages are accessible to camp members
-    elif message['recipient_type'] == 'camp':
-        user = mongo.db.users.find_one({'_id': ObjectId(user_id)})
-        can_access = user and user.get('camp_id') == message['recipient_id']
-
-    # Personal messages are accessible to sender and recipient
-    elif message['recipient_type'] == 'user':
-        can_access = (
-            str(message['sender_id']) == user_id or
-            str(message['recipient_id']) == user_id
-        )
-
-    if not can_access:
+    if not can_read_conversation(conversation_of(message), user_id, claims.get('camp_id')):
         return jsonify({'error': 'Unauthorized access to this message'}), 403
 
     # Mark as read
-    result = mongo.db.messages.update_one(
-        {'_id': ObjectId(message_id)},
-        {'$addToSet': {'read_by': ObjectId(user_id)}}
-    )
+    mark_message_read(user_id, message)
 
     return jsonify({'message': 'Message marked as read'}), 200
 
@@ -491,17 +515,11 @@ def upload_attachment():
         return jsonify({'error': 'No selected file'}), 400
 
     # Check file type
-    allowed_extensions = {'png', 'jpg', 'jpeg', 'gif', 'pdf', 'doc', 'docx', 'xls', 'xlsx', 'mp3', 'mp4'}
-    if '.' not in file.filename or file.filename.rsplit('.', 1)[1].lower() not in allowed_extensions:
+    if not allowed_file(file.filename):
         return jsonify({'error': 'File type not allowed'}), 400
 
-    # Create a secure filename
-    from werkzeug.utils import secure_filename
-    filename = secure_filename(file.filename)
-
-    # Add timestamp to filename to make it unique
-    timestamp = datetime.now().strftime("%Y%m%d%H%M%S")
-    filename = f"{timestamp}_{filename}"
+    # Secure, timestamped filename (same scheme as chunked uploads)
+    filename = stored_filename(file.filename)
 
     # Save file
     file_path = os.path.join(app_config.UPLOAD_FOLDER, filename)
@@ -4,6 +4,10 @@ from bson.objectid import ObjectId
 from datetime import datetime, timezone
 
 from app import mongo
+from app.services.hydration_service import get_users_by_ids, get_camps_by_ids, collect_ids, user_card
+from app.utils.pagination import (
+    parse_keyset_args, wants_total, keyset_sort, with_keyset, finish_keyset_page, page_response
+)
 
 prayer_requests_bp = Blueprint('prayer_requests', __name__)
 
@@ -138,20 +142,35 @@ def get_prayer_requests():
     if 'personal' in request.args and request.args['personal'].lower() == 'true':
         filters['user_id'] = ObjectId(user_id)
 
-    # Pagination
+    # Pagination: keyset cursors (before/after on created_at, _id) or page numbers
+    try:
+        direction, cursor = parse_keyset_args(request.args)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     page = int(request.args.get('page', 1))
     per_page = int(request.args.get('per_page', 20))
-    skip = (page - 1) * per_page
+    skip = 0 if cursor else (page - 1) * per_page
 
     # Execute query
-    total = mongo.db.prayer_requests.count_documents(filters)
-    requests_cursor = mongo.db.prayer_requests.find(filters).sort(
-        'created_at', -1  # Newest first
-    ).skip(skip).limit(per_page)
+    total = mongo.db.prayer_requests.count_documents(filters) if wants_total(request.args, default=cursor is None) else None
+    sort, reverse = keyset_sort('created_at', -1, direction)  # Newest first
+    requests_cursor = mongo.db.prayer_requests.find(
+        with_keyset(filters, 'created_at', cursor, direction)
+    ).sort(sort).skip(skip).limit(per_page + 1)
 
     # Process results
+    request_docs, next_cursor, has_more = finish_keyset_page(
+        list(requests_cursor), 'created_at', per_page, reverse
+    )
+
+    # Resolve authors (skipping anonymous requests) and camps for the whole page
+    users_by_id = get_users_by_ids(
+        collect_ids(request_docs, 'user_id', when=lambda pr: not pr.get('is_anonymous'))
+    )
+    camps_by_id = get_camps_by_ids(collect_ids(request_docs, 'camp_id'))
+
     prayer_requests = []
-    for pr in requests_cursor:
+    for pr in request_docs:
         pr['_id'] = str(pr['_id'])
         pr['user_id'] = str(pr['user_id'])
         if 'camp_id' in pr and pr['camp_id']:
@@ -159,20 +178,13 @@ def get_prayer_requests():
 
         # Add user information if not anonymous
         if not pr['is_anonymous']:
-            user = mongo.db.users.find_one(
-                {'_id': ObjectId(pr['user_id'])},
-                {'password_hash': 0, 'first_name': 1, 'last_name': 1, 'profile_image': 1}
-            )
+            user = users_by_id.get(pr['user_id'])
             if user:
-                user['_id'] = str(user['_id'])
-                pr['user'] = user
+                pr['user'] = user_card(user)
 
         # Add camp information if applicable
         if 'camp_id' in pr and pr['camp_id']:
-            camp = mongo.db.camps.find_one(
-                {'_id': ObjectId(pr['camp_id'])},
-                {'name': 1}
-            )
+            camp = camps_by_id.get(pr['camp_id'])
             if camp:
                 pr['camp_name'] = camp['name']
 
@@ -187,13 +199,13 @@ def get_prayer_requests():
 
         prayer_requests.append(pr)
 
-    return jsonify({
-        'prayer_requests': prayer_requests,
-        'total': total,
-        'page': page,
-        'per_page': per_page,
-        'pages': (total + per_page - 1) // per_page
-    }), 200
+    return jsonify(page_response(
+        'prayer_requests', prayer_requests, per_page,
+        page=None if cursor else page,
+        total=total,
+        next_cursor=next_cursor,
+        has_more=has_more
+    )), 200
 
 @prayer_requests_bp.route('/<request_id>', methods=['GET'])
 @jwt_required()
@@ -0,0 +1,92 @@
+from flask import Blueprint, request, jsonify
+from flask_jwt_extended import jwt_required, get_jwt_identity
+
+from app.services.upload_service import (
+    UploadError, create_session, get_session, parse_content_range, write_chunk,
+    complete_session, abort_session, session_payload
+)
+
+uploads_bp = Blueprint('uploads', __name__)
+"""Blueprint for resumable chunked file uploads (attachments larger than one request)."""
+
+def _error(e: UploadError):
+    body = {'error': str(e)}
+    if e.received is not None:
+        # Where the client should resume from
+        body['received'] = e.received
+    return jsonify(body), e.status
+
+@uploads_bp.route('/', methods=['POST'])
+@jwt_required()
+def start_upload():
+    """Open an upload session for a file of a known name and size"""
+    user_id = get_jwt_identity()
+    data = request.get_json() or {}
+
+    try:
+        session = create_session(user_id, data.get('filename'), data.get('size'), data.get('sha256'))
+    except UploadError as e:
+        return _error(e)
+
+    return jsonify(session_payload(session)), 201
+
+@uploads_bp.route('/<upload_id>', methods=['GET'])
+@jwt_required()
+def get_upload(upload_id):
+    """Upload progress; resume from `received`"""
+    user_id = get_jwt_identity()
+
+    try:
+        session = get_session(upload_id, user_id)
+    except UploadError as e:
+        return _error(e)
+
+    return jsonify(session_payload(session)), 200
+
+@uploads_bp.route('/<upload_id>', methods=['PUT'])
+@jwt_required()
+def put_chunk(upload_id):
+    """Write one chunk; the raw body holds the bytes named by Content-Range"""
+    user_id = get_jwt_identity()
+
+    try:
+        session = get_session(upload_id, user_id)
+        start, end = parse_content_range(request.headers.get('Content-Range'), session['size'])
+        if request.content_length is not None and request.content_length != end - start + 1:
+            raise UploadError('Content-Length does not match Content-Range')
+        # Read from the request stream as it arrives, never buffering the whole body
+        session = write_chunk(session, start, end, request.stream)
+    except UploadError as e:
+        return _error(e)
+
+    return jsonify(session_payload(session)), 200
+
+@uploads_bp.route('/<upload_id>/complete', methods=['POST'])
+@jwt_required()
+def complete_upload(upload_id):
+    """Verify the SHA-256 of the received file and publish it"""
+    user_id = get_jwt_identity()
+    data = request.get_json(silent=True) or {}
+
+    try:
+        session = complete_session(get_session(upload_id, user_id), data.get('sha256'))
+    except UploadError as e:
+        return _error(e)
+
+    return jsonify(dict(session_payload(session), message='File uploaded successfully')), 200
+
+@uploads_bp.route('/<upload_id>', methods=['DELETE'])
+@jwt_required()
+def cancel_upload(upload_id):
+    """Abandon an unfinished upload"""
+    user_id = get_jwt_identity()
+
+    try:
+        session = get_session(upload_id, user_id)
+    except UploadError as e:
+        return _error(e)
+
+    if session['status'] == 'complete':
+        return jsonify({'error': 'Upload already completed'}), 409
+    abort_session(session)
+    return jsonify({'message': 'Upload cancelled'}), 200
@@ -7,6 +7,7 @@ from datetime import datetime, timezone
 
 from app import mongo
 from app.utils.validators import is_valid_role
+from app.services.user_card_service import invalidate_user_card
 
 users_bp = Blueprint('users', __name__)
 
@@ -272,6 +273,7 @@ def update_user(user_id):
         {'_id': ObjectId(user_id)},
         {'$set': update_data}
     )
+    invalidate_user_card(user_id)
 
     if result.modified_count:
         return jsonify({'message': 'User updated successfully'}), 200
@@ -297,6 +299,7 @@ def delete_user(user_id):
         {'_id': ObjectId(user_id)},
         {'$set': {'is_active': False}}
     )
+    invalidate_user_card(user_id)
 
     if result.modified_count:
         return jsonify({'message': 'User deactivated successfully'}), 200
@@ -0,0 +1,337 @@
+import atexit
+import threading
+import time
+from collections import Counter, OrderedDict
+from datetime import datetime, timezone
+from bson import ObjectId
+from bson.errors import InvalidId
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+from app import mongo
+from app.utils.cache import TTLCache
+from app.utils.helpers import PERMANENT_WRITE_ERRORS
+
+# Meeting attendance.
+#
+# One meeting_attendance document per (meeting, user) records registration
+# (REST attend/leave), the first join, the current or last session and the
+# total time spent in the meeting; the meeting document itself only keeps
+# attendee_count. Socket joins and leaves update an in-process roster at once
+# and reach MongoDB as batched upserts every ATTENDANCE_FLUSH_INTERVAL
+# seconds, with repeated events for the same person merged into one update.
+# A user is present while any of their sockets is in the meeting room.
+# An update the server rejects for good, or still failing after
+# ATTENDANCE_MAX_ATTEMPTS flushes, is dropped rather than retried forever.
+
+Key = Tuple[str, str]
+
+# Documents that make a user an attendee: registered, or joined at least once
+ATTENDING = {'$or': [{'registered': True}, {'join_count': {'$gt': 0}}]}
+
+def _now() -> datetime:
+    return datetime.now(timezone.utc)
+
+def _combine(first: Dict[str, Dict[str, Any]], second: Dict[str, Dict[str, Any]]) -> Dict[str, Dict[str, Any]]:
+    """One pending update equivalent to applying `first` then `second`"""
+    inc = dict(first['$inc'])
+    for field, value in second['$inc'].items():
+        inc[field] = inc.get(field, 0) + value
+    earliest = dict(first['$min'])
+    for field, value in second['$min'].items():
+        earliest[field] = min(earliest[field], value) if field in earliest else value
+    return {'$set': dict(first['$set'], **second['$set']), '$inc': inc, '$min': earliest}
+
+class MeetingAttendance:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        # meeting_id -> user_id -> {'joined_at', 'sids'}
+        self._live: Dict[str, Dict[str, Dict[str, Any]]] = {}
+        # sid -> (user_id, meeting_ids)
+        self._sids: Dict[str, Tuple[str, Set[str]]] = {}
+        self._pending: "OrderedDict[Key, Dict[str, Dict[str, Any]]]" = OrderedDict()
+        # Failed write attempts of updates waiting to be retried
+        self._attempts: Dict[Key, int] = {}
+        self._rosters = TTLCache(maxsize=1000, ttl=5)
+        self._socketio = None
+        self._app = None
+        self._running = False
+        self.interval = 2.0
+        self.max_attempts = 30
+        # Metrics
+        self.written = 0
+        self.dropped = 0
+        self.flushes = 0
+        self.failures = 0
+        self.last_flush_ms: Optional[float] = None
+
+    def init_app(self, app, socketio) -> None:
+        self._app = app
+        self._socketio = socketio
+        self.interval = app.config.get('ATTENDANCE_FLUSH_INTERVAL', 2.0)
+        self.max_attempts = app.config.get('ATTENDANCE_MAX_ATTEMPTS', 30)
+        self._rosters = TTLCache(maxsize=1000, ttl=app.config.get('ATTENDANCE_ROSTER_TTL', 5))
+        atexit.register(self.flush)
+
+    # Live socket attendance
+
+    def join(self, meeting_id: str, user_id: str, sid: str) -> bool:
+        """Record a socket joining a meeting; returns True if the user was not present before"""
+        now = _now()
+        with self._lock:
+            people = self._live.setdefault(meeting_id, {})
+            entry = people.get(user_id)
+            _, meetings = self._sids.setdefault(sid, (user_id, set()))
+            meetings.add(meeting_id)
+            if entry is not None:
+                entry['sids'].add(sid)
+                return False
+
+            people[user_id] = {'joined_at': now, 'sids': {sid}}
+            self._queue((meeting_id, user_id), {
+                '$set': {'is_present': True, 'joined_at': now, 'left_at': None},
+                '$inc': {'join_count': 1},
+                '$min': {'first_joined_at': now}
+            })
+        return True
+
+    def leave(self, meeting_id: str, user_id: str, sid: str) -> bool:
+        """Record a socket leaving a meeting; returns True if it was the user's last one there"""
+        with self._lock:
+            if sid in self._sids:
+                self._sids[sid][1].discard(meeting_id)
+            return self._leave(meeting_id, user_id, sid, _now())
+
+    def disconnect(self, sid: str) -> List[Tuple[str, str]]:
+        """Drop a closed socket from every meeting; returns (meeting_id, user_id) pairs that user left"""
+        now = _now()
+        with self._lock:
+            user_id, meetings = self._sids.pop(sid, (None, set()))
+            return [(meeting_id, user_id) for meeting_id in meetings
+                    if self._leave(meeting_id, user_id, sid, now)]
+
+    def end_meeting(self, meeting_id: str) -> None:
+        """Close every open session of a meeting and write the result"""
+        now = _now()
+        with self._lock:
+            people = self._live.pop(meeting_id, {})
+            for user_id, entry in people.items():
+                for sid in entry['sids']:
+                    if sid in self._sids:
+                        self._sids[sid][1].discard(meeting_id)
+                self._queue((meeting_id, user_id), self._leave_update(entry, now))
+        self.flush()
+
+        # Sessions held by other workers (or lost in a crash) end now without a duration
+        mongo.db.meeting_attendance.update_many(
+            {'meeting_id': ObjectId(meeting_id), 'is_present': True},
+            {'$set': {'is_present': False, 'left_at': now}}
+        )
+        self._rosters.delete(meeting_id)
+
+    def _leave(self, meeting_id: str, user_id: str, sid: str, now: datetime) -> bool:
+        # Called with the lock held
+        people = self._live.get(meeting_id, {})
+        entry = people.get(user_id)
+        if entry is None or sid not in entry['sids']:
+            return False
+        entry['sids'].discard(sid)
+        if entry['sids']:
+            return False
+
+        del people[user_id]
+        if not people:
+            del self._live[meeting_id]
+        self._queue((meeting_id, user_id), self._leave_update(entry, now))
+        return True
+
+    @staticmethod
+    def _leave_update(entry: Dict[str, Any], now: datetime) -> Dict[str, Dict[str, Any]]:
+        seconds = round((now - entry['joined_at']).total_seconds(), 1)
+        return {'$set': {'is_present': False, 'left_at': now}, '$inc': {'total_seconds': seconds}, '$min': {}}
+
+    def participants(self, meeting_id: str) -> List[Dict[str, Any]]:
+        """Users present in a meeting through this process's sockets"""
+        with self._lock:
+            return [{'user_id': user_id, 'joined_at': entry['joined_at']}
+                    for user_id, entry in self._live.get(meeting_id, {}).items()]
+
+    # Batched writes
+
+    def _queue(self, key: Key, update: Dict[str, Dict[str, Any]]) -> None:
+        # Called with the lock held
+        pending = self._pending.get(key)
+        self._pending[key] = _combine(pending, update) if pending else update
+        if not self._running and self._socketio is not None:
+            self._running = True
+            self._socketio.start_background_task(self._writer_loop)
+
+    def flush(self) -> int:
+        """Write pending attendance changes now; returns the number of documents written"""
+        if self._app is None:
+            return 0
+        with self._flush_lock:
+            with self._lock:
+                batch, self._pending = list(self._pending.items()), OrderedDict()
+            if not batch:
+                return 0
+            with self._app.app_context():
+                return self._write(batch)
+
+    def _write(self, batch: List[Tuple[Key, Dict[str, Dict[str, Any]]]]) -> int:
+        started = time.monotonic()
+        now = _now()
+        operations = []
+        valid = []
+        for key, update in batch:
+            try:
+                match = {'meeting_id': ObjectId(key[0]), 'user_id': ObjectId(key[1])}
+            except (InvalidId, TypeError) as e:
+                # One bad key must not take the rest of the batch with it
+                self._drop(key, str(e))
+                continue
+            write = {op: fields for op, fields in update.items() if fields}
+            write['$setOnInsert'] = {'registered': False, 'created_at': now}
+            operations.append(UpdateOne(match, write, upsert=True))
+            valid.append((key, update))
+        batch = valid
+
+        upserted: List[int] = []
+        failed: List[int] = []
+        dropped: List[int] = []
+        try:
+            if operations:
+                result = mongo.db.meeting_attendance.bulk_write(operations, ordered=False)
+                upserted = list(result.upserted_ids)
+        except BulkWriteError as e:
+            # Concurrent first upserts can collide on the unique index; retry those
+            upserted = [row['index'] for row in e.details.get('upserted', [])]
+            for err in e.details.get('writeErrors', []):
+                if err.get('code') in PERMANENT_WRITE_ERRORS:
+                    self._drop(batch[err['index']][0], err.get('errmsg'))
+                    dropped.append(err['index'])
+                else:
+                    failed.append(err['index'])
+        except Exception as e:
+            failed = list(range(len(batch)))
+            print(f"Attendance write error: {str(e)}")
+
+        if failed:
+            self.failures += 1
+            self._requeue([batch[i] for i in failed])
+        if self._attempts:
+            for i in set(range(len(batch))) - set(failed):
+                self._attempts.pop(batch[i][0], None)
+
+        # New attendance documents are new attendees
+        new_attendees = Counter(batch[i][0][0] for i in upserted)
+        for meeting_id, count in new_attendees.items():
+            mongo.db.meetings.update_one({'_id': ObjectId(meeting_id)}, {'$inc': {'attendee_count': count}})
+        for meeting_id in {key[0] for key, _ in batch}:
+            self._rosters.delete(meeting_id)
+
+        self.flushes += 1
+        written = len(batch) - len(failed) - len(dropped)
+        self.written += written
+        self.last_flush_ms = round((time.monotonic() - started) * 1000, 2)
+        return written
+
+    def _requeue(self, items: List[Tuple[Key, Dict[str, Dict[str, Any]]]]) -> None:
+        # Failed updates go back ahead of anything queued since
+        retry = []
+        for key, update in items:
+            attempts = self._attempts.get(key, 0) + 1
+            if attempts >= self.max_attempts:
+                self._drop(key, f"still failing after {attempts} attempts")
+            else:
+                self._attempts[key] = attempts
+                retry.append((key, update))
+        with self._lock:
+            for key, update in retry:
+                newer = self._pending.pop(key, None)
+                self._pending[key] = _combine(update, newer) if newer else update
+
+    def _drop(self, key: Key, reason: Optional[str]) -> None:
+        print(f"Attendance update for meeting {key[0]}, user {key[1]} dropped: {reason}")
+        self.dropped += 1
+        self._attempts.pop(key, None)
+
+    def _writer_loop(self) -> None:
+        while True:
+            self._socketio.sleep(self.interval)
+            try:
+                self.flush()
+            except Exception as e:
+                print(f"Attendance flush error: {str(e)}")
+
+    # Reads
+
+    def roster(self, meeting_id: str) -> List[Dict[str, Any]]:
+        """Users currently present in a meeting (all workers), cached for ATTENDANCE_ROSTER_TTL"""
+        cached = self._rosters.get(meeting_id)
+        if cached is not None:
+            return cached
+
+        roster = [
+            {'user_id': str(doc['user_id']), 'joined_at': doc.get('joined_at')}
+            for doc in mongo.db.meeting_attendance.find(
+                {'meeting_id': ObjectId(meeting_id), 'is_present': True},
+                {'user_id': 1, 'joined_at': 1}
+            )
+        ]
+        self._rosters.set(meeting_id, roster)
+        return roster
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'live_meetings': len(self._live),
+            'pending': len(self._pending),
+            'written': self.written,
+            'dropped': self.dropped,
+            'flushes': self.flushes,
+            'failures': self.failures,
+            'last_flush_ms': self.last_flush_ms,
+            'flush_interval': self.interval
+        }
+
+# Process-wide attendance tracker used by the socket handlers
+attendance = MeetingAttendance()
+
+def register_attendance(meeting_id: Any, user_id: Any) -> bool:
+    """RSVP to a meeting; returns True if the user was not an attendee before"""
+    result = mongo.db.meeting_attendance.update_one(
+        {'meeting_id': ObjectId(meeting_id), 'user_id': ObjectId(user_id)},
+        {'$set': {'registered': True}, '$setOnInsert': {'created_at': _now()}},
+        upsert=True
+    )
+    if result.upserted_id:
+        mongo.db.meetings.update_one({'_id': ObjectId(meeting_id)}, {'$inc': {'attendee_count': 1}})
+        return True
+    return False
+
+def unregister_attendance(meeting_id: Any, user_id: Any) -> None:
+    """Withdraw an RSVP; someone who has already joined stays on the attendance record"""
+    key = {'meeting_id': ObjectId(meeting_id), 'user_id': ObjectId(user_id)}
+    removed = mongo.db.meeting_attendance.delete_one(dict(key, join_count={'$exists': False}))
+    if removed.deleted_count:
+        mongo.db.meetings.update_one({'_id': ObjectId(meeting_id)}, {'$inc': {'attendee_count': -1}})
+    else:
+        mongo.db.meeting_attendance.update_one(key, {'$set': {'registered': False}})
+
+def get_meeting_attendance(meeting_id: Any) -> List[Dict[str, Any]]:
+    """Attendance records of a meeting's attendees, in one query"""
+    return list(mongo.db.meeting_attendance.find(
+        {'$and': [{'meeting_id': ObjectId(meeting_id)}, ATTENDING]}
+    ))
+
+def attending_meeting_ids(user_id: Any, meeting_ids: Iterable[Any]) -> Set[str]:
+    """Which of the given meetings a user attends, in one query"""
+    object_ids = [ObjectId(m) for m in meeting_ids]
+    if not object_ids:
+        return set()
+    docs = mongo.db.meeting_attendance.find(
+        {'$and': [{'meeting_id': {'$in': object_ids}, 'user_id': ObjectId(user_id)}, ATTENDING]},
+        {'meeting_id': 1}
+    )
+    return {str(doc['meeting_id']) for doc in docs}
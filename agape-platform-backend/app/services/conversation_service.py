@@ -0,0 +1,183 @@
+from app import mongo
+from bson import ObjectId
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+from app.utils.pagination import Cursor, keyset_sort, with_keyset
+
+# Conversations.
+#
+# Every message belongs to one conversation, stored on the message as
+# `conversation`: 'ministry', 'camp:<camp_id>', or 'dm:<id>:<id>' for a
+# direct conversation (the two user ids in sorted order). Read state is
+# keyed by it, and it lets a whole conversation be addressed with one
+# indexed range on (conversation, created_at).
+#
+# The `conversations` collection is a summary per conversation (who is in
+# it and a preview of the last message), updated on every send. Its
+# `audience` tokens ('user:<id>', 'camp:<id>', 'ministry') let a user's
+# conversation list be one index scan on (audience, last_message_at, _id).
+
+# Characters of the last message kept for the list preview
+PREVIEW_LENGTH = 120
+
+CONVERSATION_TYPES = {'personal': 'dm', 'camp': 'camp', 'ministry': 'ministry'}
+
+def conversation_key(recipient_type: str, sender_id: Any, recipient_id: Optional[Any]) -> str:
+    if recipient_type == 'user':
+        first, second = sorted([str(sender_id), str(recipient_id)])
+        return f"dm:{first}:{second}"
+    if recipient_type == 'camp':
+        return f"camp:{recipient_id}"
+    return 'ministry'
+
+def conversation_of(message: Dict[str, Any]) -> str:
+    """Conversation of a stored message (computed for documents written before the field existed)"""
+    return message.get('conversation') or conversation_key(
+        message['recipient_type'], message['sender_id'], message.get('recipient_id')
+    )
+
+def can_read_conversation(conversation: str, user_id: Any, camp_id: Optional[Any] = None) -> bool:
+    """
+    Whether a user belongs to a conversation
+
+    `camp_id` is the user's camp as carried in the JWT claims or the socket
+    session, so the check reads nothing from the database.
+    """
+    if conversation == 'ministry':
+        return True
+    kind, _, rest = conversation.partition(':')
+    if kind == 'camp':
+        return bool(camp_id) and rest == str(camp_id)
+    if kind == 'dm':
+        return str(user_id) in rest.split(':')
+    return False
+
+def new_message_doc(sender_id: Any, recipient_type: str, recipient_id: Optional[Any], content: str,
+                    message_type: str = 'text', attachment_urls: Optional[List[str]] = None,
+                    is_announcement: bool = False) -> Dict[str, Any]:
+    """Build a messages document"""
+    recipient = ObjectId(recipient_id) if recipient_type in ['camp', 'user'] else None
+    return {
+        'content': content,
+        'sender_id': ObjectId(sender_id),
+        'recipient_type': recipient_type,
+        'recipient_id': recipient,
+        'conversation': conversation_key(recipient_type, sender_id, recipient),
+        'message_type': message_type,
+        'attachment_urls': attachment_urls or [],
+        'is_announcement': is_announcement,
+        'created_at': datetime.now(timezone.utc),
+        'is_deleted': False,
+        'read_count': 0
+    }
+
+def last_message_fields(message: Dict[str, Any]) -> Dict[str, Any]:
+    content = message.get('content') or ''
+    return {
+        'last_message': {
+            'message_id': message['_id'],
+            'sender_id': message['sender_id'],
+            'content': content[:PREVIEW_LENGTH],
+            'message_type': message.get('message_type', 'text'),
+            'created_at': message['created_at']
+        },
+        'last_message_at': message['created_at'],
+        'updated_at': datetime.now(timezone.utc)
+    }
+
+def new_conversation_summary(message: Dict[str, Any]) -> Dict[str, Any]:
+    key = conversation_of(message)
+    kind = key.partition(':')[0]
+    summary: Dict[str, Any] = {'key': key, 'kind': kind, 'created_at': message['created_at']}
+    if kind == 'dm':
+        participants = sorted({message['sender_id'], message['recipient_id']}, key=str)
+        summary['participants'] = participants
+        summary['audience'] = [f"user:{user_id}" for user_id in participants]
+    elif kind == 'camp':
+        summary['camp_id'] = message['recipient_id']
+        summary['audience'] = [key]
+    else:
+        summary['audience'] = ['ministry']
+    return summary
+
+def record_message(message: Dict[str, Any]) -> None:
+    """Make a stored message the last message of its conversation summary"""
+    key = conversation_of(message)
+    fields = last_message_fields(message)
+    # Only move forward; a slower concurrent send must not overwrite a newer preview
+    result = mongo.db.conversations.update_one(
+        {'key': key, 'last_message_at': {'$lt': message['created_at']}}, {'$set': fields}
+    )
+    if not result.matched_count:
+        # First message of the conversation (or an older one: then this is a no-op)
+        mongo.db.conversations.update_one(
+            {'key': key}, {'$setOnInsert': dict(new_conversation_summary(message), **fields)}, upsert=True
+        )
+
+def message_deleted(message: Dict[str, Any]) -> None:
+    """Blank the preview if the deleted message is the one shown"""
+    mongo.db.conversations.update_one(
+        {'key': conversation_of(message), 'last_message.message_id': message['_id']},
+        {'$set': {'last_message.content': None, 'last_message.is_deleted': True}}
+    )
+
+def find_conversations(user_id: Any, camp_id: Optional[Any], kind: Optional[str] = None,
+                       cursor: Optional[Cursor] = None, direction: Optional[str] = None,
+                       limit: int = 20):
+    """
+    One page of a user's conversations, most recently active first
+
+    `kind` ('dm', 'camp' or 'ministry') narrows the list to one type.
+    Returns (docs, reverse) like the other keyset queries; fetches limit+1.
+    """
+    tokens = {'dm': f"user:{user_id}", 'ministry': 'ministry'}
+    if camp_id:
+        tokens['camp'] = f"camp:{camp_id}"
+    audience = [token for token_kind, token in tokens.items() if kind in (None, token_kind)]
+    filters: Dict[str, Any] = {'audience': {'$in': audience}}
+
+    sort, reverse = keyset_sort('last_message_at', -1, direction)
+    docs = mongo.db.conversations.find(
+        with_keyset(filters, 'last_message_at', cursor, direction)
+    ).sort(sort).limit(limit + 1)
+    return list(docs), reverse
+
+def render_conversation(summary: Dict[str, Any], user_id: Any, users_by_id: Dict[str, Dict[str, Any]],
+                        camps_by_id: Dict[str, Dict[str, Any]], unread: Dict[str, int]) -> Dict[str, Any]:
+    """Client payload for one conversation list entry"""
+    key, kind = summary['key'], summary['kind']
+    last = summary.get('last_message') or {}
+    item: Dict[str, Any] = {
+        'conversation': key,
+        'type': {'dm': 'personal'}.get(kind, kind),
+        'last_message': {
+            'message_id': str(last['message_id']),
+            'sender_id': str(last['sender_id']),
+            'content': last.get('content'),
+            'message_type': last.get('message_type', 'text'),
+            'created_at': last['created_at'].isoformat(),
+            'is_deleted': last.get('is_deleted', False)
+        } if last else None,
+        'last_message_at': summary['last_message_at'].isoformat(),
+        'unread_count': unread.get(key, 0)
+    }
+
+    if kind == 'dm':
+        participants = [str(p) for p in summary.get('participants', [])]
+        # A note to self has a single participant
+        partner_id = next((p for p in participants if p != str(user_id)), str(user_id))
+        partner = users_by_id.get(partner_id)
+        item['partner'] = {
+            'id': partner_id,
+            'first_name': partner.get('first_name', '') if partner else '',
+            'last_name': partner.get('last_name', '') if partner else '',
+            'profile_image': partner.get('profile_image') if partner else None
+        }
+        item['name'] = f"{item['partner']['first_name']} {item['partner']['last_name']}".strip()
+    elif kind == 'camp':
+        camp = camps_by_id.get(str(summary['camp_id']))
+        item['camp_id'] = str(summary['camp_id'])
+        item['name'] = camp.get('name', 'Unknown Camp') if camp else 'Unknown Camp'
+    else:
+        item['name'] = 'Ministry'
+    return item
@@ -0,0 +1,51 @@
+from typing import Any, Iterable, List, Optional
+
+# Socket delivery planning.
+#
+# A client can sit in several rooms that a message targets (its user room,
+# the open chat room, its camp room). Emitting once per room sends it the
+# same frame several times. Instead, compute the set of target rooms for an
+# event and emit once to the whole list: python-socketio merges the rooms'
+# participants by sid and encodes the packet once per emit.
+
+def chat_room(user_a: Any, user_b: Any) -> str:
+    """Room shared by the two participants of a direct conversation"""
+    first, second = sorted([str(user_a), str(user_b)])
+    return f"chat_{first}_{second}"
+
+def unique_rooms(rooms: Iterable[Optional[str]]) -> List[str]:
+    """Drop empty and repeated rooms, keeping the first-seen order"""
+    seen = []
+    for room in rooms:
+        if room and room not in seen:
+            seen.append(room)
+    return seen
+
+def message_rooms(recipient_type: str, sender_id: Any, recipient_id: Optional[Any]) -> List[str]:
+    """Rooms that should receive a new message"""
+    if recipient_type == 'user':
+        return unique_rooms([
+            chat_room(sender_id, recipient_id),
+            f"user_{recipient_id}",
+            f"user_{sender_id}"
+        ])
+    if recipient_type == 'camp':
+        return [f"camp_{recipient_id}"]
+    return ['ministry']
+
+def participant_rooms(recipient_type: str, sender_id: Any, recipient_id: Optional[Any]) -> List[str]:
+    """Personal rooms of the sender and, for direct messages, the recipient"""
+    rooms = [f"user_{sender_id}"]
+    if recipient_type == 'user':
+        rooms.append(f"user_{recipient_id}")
+    return unique_rooms(rooms)
+
+def conversation_rooms(conversation: str) -> List[str]:
+    """Rooms reaching everyone in a conversation (see conversation_service)"""
+    kind, _, rest = conversation.partition(':')
+    if kind == 'dm':
+        first, _, second = rest.partition(':')
+        return [chat_room(first, second), f"user_{first}", f"user_{second}"]
+    if kind == 'camp':
+        return [f"camp_{rest}"]
+    return ['ministry']
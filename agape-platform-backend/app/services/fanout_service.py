@@ -0,0 +1,91 @@
+from app import mongo
+from app.config import app_config
+from bson import ObjectId
+from datetime import datetime, timezone
+from pymongo.errors import BulkWriteError
+from typing import Any, Dict, List, Optional
+from app.services.unread_service import notifications_received
+
+# Notification fan-out.
+#
+# A notification is stored once in `notifications`; each recipient gets a
+# compact receipt in `notification_receipts` ({notification_id, user_id,
+# is_read, created_at}). Receipts are written in fixed-size unordered batches
+# so a ministry-wide event never builds one giant list or request.
+
+def _insert_receipts(batch: List[Dict[str, Any]]) -> int:
+    failed = set()
+    try:
+        mongo.db.notification_receipts.insert_many(batch, ordered=False)
+    except BulkWriteError as e:
+        # Unordered: the rest of the batch is written even if some rows fail
+        # (e.g. duplicate receipts when a fan-out is retried)
+        failed = {err['index'] for err in e.details.get('writeErrors', [])}
+    # Only new receipts are new unread notifications
+    notifications_received(row['user_id'] for i, row in enumerate(batch) if i not in failed)
+    return len(batch) - len(failed)
+
+def fan_out_notification(notification: Dict[str, Any], recipient_filter: Dict[str, Any],
+                         exclude_user_id: Optional[ObjectId] = None,
+                         chunk_size: Optional[int] = None,
+                         notification_id: Optional[ObjectId] = None) -> Dict[str, Any]:
+    """
+    Store one shared notification and a receipt for every matching user
+
+    Args:
+        notification: Shared fields (title, body, related_type, related_id, ...)
+        recipient_filter: Query on `users` selecting the recipients
+        exclude_user_id: User who should not receive it (e.g. the author)
+        chunk_size: Receipts per insert_many batch
+        notification_id: Fixed id, so a retried fan-out resumes instead of duplicating
+
+    Returns the stored notification document, with `recipient_count` set.
+    """
+    chunk_size = chunk_size or app_config.NOTIFICATION_FANOUT_CHUNK_SIZE
+    created_at = datetime.now(timezone.utc)
+
+    doc = dict(notification, created_at=created_at, recipient_count=0)
+    if notification_id:
+        doc['_id'] = notification_id
+        mongo.db.notifications.update_one({'_id': notification_id}, {'$setOnInsert': doc}, upsert=True)
+    else:
+        doc['_id'] = mongo.db.notifications.insert_one(doc).inserted_id
+
+    if exclude_user_id:
+        recipient_filter = {'$and': [recipient_filter, {'_id': {'$ne': exclude_user_id}}]}
+
+    # Stream recipient ids in server-sized batches rather than materialising them all
+    recipients = mongo.db.users.find(recipient_filter, {'_id': 1}).batch_size(chunk_size)
+
+    count = 0
+    batch: List[Dict[str, Any]] = []
+    for user in recipients:
+        batch.append({
+            'notification_id': doc['_id'],
+            'user_id': user['_id'],
+            'is_read': False,
+            'created_at': created_at
+        })
+        if len(batch) >= chunk_size:
+            count += _insert_receipts(batch)
+            batch = []
+    if batch:
+        count += _insert_receipts(batch)
+
+    if notification_id:
+        # A retry only inserts the receipts the failed attempt missed
+        count = mongo.db.notification_receipts.count_documents({'notification_id': notification_id})
+
+    mongo.db.notifications.update_one({'_id': doc['_id']}, {'$set': {'recipient_count': count}})
+    doc['recipient_count'] = count
+    return doc
+
+def audience_room(camp_id: Optional[Any]) -> str:
+    """Socket room that reaches every recipient of a ministry or camp notification"""
+    return f"camp_{str(camp_id)}" if camp_id else 'ministry'
+
+def audience_filter(camp_id: Optional[Any]) -> Dict[str, Any]:
+    """Recipient filter on `users` for a ministry or camp notification"""
+    if camp_id:
+        return {'camp_id': camp_id, 'is_active': True}
+    return {'is_active': True}
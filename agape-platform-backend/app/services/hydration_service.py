@@ -0,0 +1,71 @@
+from app import mongo
+from app.services.user_card_service import get_user_cards
+from bson import ObjectId
+from bson.errors import InvalidId
+from typing import Any, Dict, Iterable, List, Optional
+
+# Projection used when joining camps onto list responses
+CAMP_NAME_PROJECTION = {'name': 1}
+
+def _to_object_ids(ids: Iterable[Any]) -> List[ObjectId]:
+    """Convert a mix of ObjectId/str values to a de-duplicated list of ObjectIds"""
+    object_ids = set()
+    for value in ids:
+        if not value:
+            continue
+        if isinstance(value, ObjectId):
+            object_ids.add(value)
+            continue
+        try:
+            object_ids.add(ObjectId(value))
+        except (InvalidId, TypeError):
+            continue
+    return list(object_ids)
+
+def get_users_by_ids(user_ids: Iterable[Any], projection: Optional[Dict[str, int]] = None) -> Dict[str, Dict[str, Any]]:
+    """
+    Load users with a single $in query
+
+    Without a projection this returns user cards, served from the user card
+    cache where possible. Returns a dict keyed by the string form of the user id.
+    """
+    object_ids = _to_object_ids(user_ids)
+    if not object_ids:
+        return {}
+
+    if projection is None:
+        return get_user_cards(object_ids)
+
+    cursor = mongo.db.users.find({'_id': {'$in': object_ids}}, projection)
+    return {str(user['_id']): user for user in cursor}
+
+def get_camps_by_ids(camp_ids: Iterable[Any], projection: Optional[Dict[str, int]] = None) -> Dict[str, Dict[str, Any]]:
+    """
+    Load camps with a single $in query
+
+    Returns a dict keyed by the string form of the camp id.
+    """
+    object_ids = _to_object_ids(camp_ids)
+    if not object_ids:
+        return {}
+
+    cursor = mongo.db.camps.find(
+        {'_id': {'$in': object_ids}},
+        projection or CAMP_NAME_PROJECTION
+    )
+    return {str(camp['_id']): camp for camp in cursor}
+
+def collect_ids(docs: Iterable[Dict[str, Any]], field: str, when=None) -> List[Any]:
+    """Collect the values of `field` across a page of documents, optionally filtered by `when(doc)`"""
+    return [
+        doc.get(field) for doc in docs
+        if doc.get(field) and (when is None or when(doc))
+    ]
+
+def user_card(user: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+    """Copy of a user projection with its _id stringified, ready for a response"""
+    if not user:
+        return None
+    card = dict(user)
+    card['_id'] = str(card['_id'])
+    return card
@@ -0,0 +1,87 @@
+from app import mongo
+from bson.son import SON
+from app.services.user_card_service import USER_CARD_PROJECTION
+from typing import Any, Dict, List, Optional, Tuple
+
+# Messages are listed newest first
+INBOX_SORT = [('created_at', -1), ('_id', -1)]
+
+def _card_lookup(collection: str, local_field: str, projection: Dict[str, int], as_field: str,
+                 when_recipient_type: Optional[str] = None) -> Dict[str, Any]:
+    """$lookup stage joining a single card onto each message"""
+    match_expr: Dict[str, Any] = {'$eq': ['$_id', '$$ref_id']}
+    if when_recipient_type:
+        # Only join when the polymorphic recipient_id points at this collection
+        match_expr = {'$and': [match_expr, {'$eq': ['$$recipient_type', when_recipient_type]}]}
+
+    return {
+        '$lookup': {
+            'from': collection,
+            'let': {'ref_id': f'${local_field}', 'recipient_type': '$recipient_type'},
+            'pipeline': [
+                {'$match': {'$expr': match_expr}},
+                {'$limit': 1},
+                {'$project': projection}
+            ],
+            'as': as_field
+        }
+    }
+
+def build_inbox_pipeline(filters: Dict[str, Any], skip: int = 0, limit: int = 50,
+                         include_total: bool = True, sort: Optional[List[Tuple[str, int]]] = None) -> List[Dict[str, Any]]:
+    """
+    Build the aggregation that returns one page of messages plus its total
+
+    Sender, recipient user and recipient camp cards are joined server side,
+    so the whole inbox page is a single round trip.
+    """
+    page_stages: List[Dict[str, Any]] = []
+    if skip:
+        page_stages.append({'$skip': skip})
+    page_stages += [
+        {'$limit': limit},
+        _card_lookup('users', 'sender_id', USER_CARD_PROJECTION, 'sender'),
+        _card_lookup('users', 'recipient_id', USER_CARD_PROJECTION, 'recipient_user', 'user'),
+        _card_lookup('camps', 'recipient_id', {'name': 1}, 'recipient_camp', 'camp'),
+        {'$addFields': {
+            'sender': {'$arrayElemAt': ['$sender', 0]},
+            'recipient_user': {'$arrayElemAt': ['$recipient_user', 0]},
+            'recipient_camp': {'$arrayElemAt': ['$recipient_camp', 0]}
+        }}
+    ]
+
+    # $match and $sort stay ahead of $facet so they run as an index scan;
+    # stages inside a $facet cannot use indexes
+    pipeline: List[Dict[str, Any]] = [
+        {'$match': filters},
+        {'$sort': SON(sort or INBOX_SORT)}
+    ]
+
+    if not include_total:
+        # Without a count the page can stream straight off the index and stop at the limit
+        return pipeline + page_stages + [{'$group': {'_id': None, 'page': {'$push': '$$ROOT'}}}]
+
+    return pipeline + [{'$facet': {
+        'page': page_stages,
+        'total': [{'$count': 'count'}]
+    }}]
+
+def get_inbox_page(filters: Dict[str, Any], skip: int = 0, limit: int = 50,
+                   include_total: bool = True, sort: Optional[List[Tuple[str, int]]] = None) -> Tuple[List[Dict[str, Any]], Any]:
+    """
+    Run the inbox aggregation
+
+    Returns (messages, total); total is None when include_total is False.
+    Joined cards are left on each message as `sender`, `recipient_user`
+    and `recipient_camp`.
+    """
+    pipeline = build_inbox_pipeline(filters, skip=skip, limit=limit, include_total=include_total, sort=sort)
+    result = next(mongo.db.messages.aggregate(pipeline), {})
+
+    messages = result.get('page', [])
+    total = None
+    if include_total:
+        counts = result.get('total', [])
+        total = counts[0]['count'] if counts else 0
+
+    return messages, total
@@ -0,0 +1,333 @@
+from app import mongo
+from app.config import app_config
+from bson import ObjectId
+from datetime import datetime, timezone, timedelta
+from pymongo import ASCENDING, DESCENDING, IndexModel
+from typing import Any, Dict, Iterator, List, Tuple
+
+# Declarative index catalog.
+#
+# Each index is designed for a specific route query: equality fields first,
+# then the sort key (with _id as the keyset tie-breaker), then ranges.
+# Names are left to MongoDB's default (<field>_<direction>...), so an index
+# that already exists under the same key pattern is recognised as the same one.
+INDEX_CATALOG: Dict[str, List[Dict[str, Any]]] = {
+    'users': [
+        {'keys': [('email', ASCENDING)], 'unique': True,
+         'reason': 'login/register lookups by email'},
+        {'keys': [('camp_id', ASCENDING), ('is_active', ASCENDING)],
+         'reason': 'camp member lists and camp notification recipients'},
+        {'keys': [('is_active', ASCENDING), ('last_name', ASCENDING), ('first_name', ASCENDING)],
+         'reason': 'GET /api/users sorted by name'},
+    ],
+    'camps': [
+        {'keys': [('name', ASCENDING)],
+         'reason': 'duplicate name check on create'},
+        {'keys': [('leader_id', ASCENDING)],
+         'reason': 'leader lookups'},
+    ],
+    'messages': [
+        {'keys': [('recipient_type', ASCENDING), ('recipient_id', ASCENDING), ('is_deleted', ASCENDING),
+                  ('created_at', DESCENDING), ('_id', DESCENDING)],
+         'reason': 'inbox $or branches for personal, camp and ministry messages, newest first'},
+        {'keys': [('sender_id', ASCENDING), ('is_deleted', ASCENDING),
+                  ('created_at', DESCENDING), ('_id', DESCENDING)],
+         'reason': 'inbox "sent by me" branch and type=sent'},
+        {'keys': [('conversation', ASCENDING), ('created_at', DESCENDING), ('_id', DESCENDING)],
+         'reason': 'one conversation in order; read watermark ranges'},
+    ],
+    'conversations': [
+        {'keys': [('key', ASCENDING)], 'unique': True,
+         'reason': 'one summary per conversation; updated on every send'},
+        {'keys': [('audience', ASCENDING), ('last_message_at', DESCENDING), ('_id', DESCENDING)],
+         'reason': 'conversation list of a user, most recently active first'},
+    ],
+    'unread_counters': [
+        {'keys': [('camp_id', ASCENDING)], 'sparse': True,
+         'reason': 'camp message fan-out to members\' unread counters'},
+    ],
+    'read_state': [
+        {'keys': [('user_id', ASCENDING), ('conversation', ASCENDING)], 'unique': True,
+         'reason': 'one read watermark per user and conversation'},
+        {'keys': [('conversation', ASCENDING), ('last_read_at', ASCENDING)],
+         'reason': 'readers past a deleted message, for unread counters'},
+    ],
+    'message_receipts': [
+        {'keys': [('message_id', ASCENDING), ('user_id', ASCENDING)], 'unique': True,
+         'reason': 'one receipt per reader; repeated opens are no-ops'},
+        {'keys': [('user_id', ASCENDING), ('conversation', ASCENDING), ('created_at', ASCENDING)],
+         'reason': 'receipts passed by an advancing watermark'},
+    ],
+    'meetings': [
+        {'keys': [('camp_id', ASCENDING), ('status', ASCENDING),
+                  ('scheduled_start', ASCENDING), ('_id', ASCENDING)],
+         'reason': 'member/camp leader meeting lists filtered by camp and status'},
+        {'keys': [('camp_id', ASCENDING), ('scheduled_start', ASCENDING), ('_id', ASCENDING)],
+         'reason': 'member/camp leader meeting lists without a status filter'},
+        {'keys': [('status', ASCENDING), ('scheduled_start', ASCENDING)],
+         'reason': 'reminder scan and upcoming meetings'},
+        {'keys': [('scheduled_start', ASCENDING), ('_id', ASCENDING)],
+         'reason': 'admin meeting list sorted by start time'},
+        {'keys': [('host_id', ASCENDING)],
+         'reason': 'meetings hosted by a user'},
+        {'keys': [('recurring_group_id', ASCENDING)], 'sparse': True,
+         'reason': 'recurring instance de-duplication'},
+    ],
+    'prayer_requests': [
+        {'keys': [('is_private', ASCENDING), ('created_at', DESCENDING), ('_id', DESCENDING)],
+         'reason': 'member prayer list (public only), newest first'},
+        {'keys': [('camp_id', ASCENDING), ('is_private', ASCENDING),
+                  ('created_at', DESCENDING), ('_id', DESCENDING)],
+         'reason': 'camp filtered prayer lists and camp leader private branch'},
+        {'keys': [('user_id', ASCENDING), ('created_at', DESCENDING), ('_id', DESCENDING)],
+         'reason': 'personal=true prayer list'},
+    ],
+    'notification_receipts': [
+        {'keys': [('user_id', ASCENDING), ('is_read', ASCENDING), ('created_at', DESCENDING)],
+         'reason': 'notification list and unread count per user'},
+        {'keys': [('notification_id', ASCENDING), ('user_id', ASCENDING)], 'unique': True,
+         'reason': 'one receipt per user; retried fan-outs skip existing rows'},
+    ],
+    'meeting_messages': [
+        {'keys': [('meeting_id', ASCENDING), ('created_at', ASCENDING), ('_id', ASCENDING)],
+         'reason': 'meeting chat history in order'},
+    ],
+    'meeting_attendance': [
+        {'keys': [('meeting_id', ASCENDING), ('user_id', ASCENDING)], 'unique': True,
+         'reason': 'one attendance record per user and meeting; batched upserts and is_attending lookups'},
+        {'keys': [('meeting_id', ASCENDING), ('is_present', ASCENDING)],
+         'reason': 'live roster of a meeting'},
+    ],
+    'jobs': [
+        {'keys': [('status', ASCENDING), ('run_at', ASCENDING)],
+         'reason': 'workers claiming the next due job'},
+        {'keys': [('status', ASCENDING), ('locked_at', ASCENDING)],
+         'reason': 'reclaiming jobs abandoned by a dead worker'},
+        {'keys': [('idempotency_key', ASCENDING)], 'unique': True, 'sparse': True,
+         'reason': 'enqueue deduplication'},
+        {'keys': [('finished_at', ASCENDING)], 'expireAfterSeconds': app_config.JOB_RETENTION,
+         'reason': 'expire finished jobs'},
+    ],
+    'upload_sessions': [
+        {'keys': [('status', ASCENDING), ('expires_at', ASCENDING)],
+         'reason': 'sweeping expired unfinished uploads'},
+    ],
+    'presence_sessions': [
+        {'keys': [('worker_id', ASCENDING)],
+         'reason': 'sweeping sessions of a dead or restarted worker'},
+    ],
+    'presence': [
+        {'keys': [('status', ASCENDING)],
+         'reason': 'active user list and status counts'},
+    ],
+    'presence_workers': [
+        {'keys': [('heartbeat_at', ASCENDING)],
+         'reason': 'finding workers that stopped heartbeating'},
+    ],
+    'password_resets': [
+        {'keys': [('token', ASCENDING)],
+         'reason': 'reset token lookup'},
+    ],
+}
+
+def index_name(keys: List[Tuple[str, int]]) -> str:
+    """MongoDB's default name for an index key pattern"""
+    return '_'.join(f'{field}_{direction}' for field, direction in keys)
+
+def _index_models(specs: List[Dict[str, Any]]) -> List[IndexModel]:
+    models = []
+    for spec in specs:
+        options = {k: v for k, v in spec.items() if k not in ('keys', 'reason')}
+        models.append(IndexModel(spec['keys'], **options))
+    return models
+
+def ensure_indexes(db=None) -> Dict[str, List[str]]:
+    """Create every index in the catalog (no-op for ones that already exist)"""
+    db = db if db is not None else mongo.db
+    created = {}
+    for collection, specs in INDEX_CATALOG.items():
+        created[collection] = db[collection].create_indexes(_index_models(specs))
+    return created
+
+def unlisted_indexes(db=None) -> Dict[str, List[str]]:
+    """Indexes present in the database that the catalog does not declare (candidates to drop)"""
+    db = db if db is not None else mongo.db
+    unlisted = {}
+    for collection, specs in INDEX_CATALOG.items():
+        declared = {index_name(spec['keys']) for spec in specs} | {'_id_'}
+        extra = [name for name in db[collection].index_information() if name not in declared]
+        if extra:
+            unlisted[collection] = extra
+    return unlisted
+
+def canonical_queries() -> List[Dict[str, Any]]:
+    """
+    The query shapes issued by the list routes, with placeholder ids
+
+    Kept next to the catalog so a new route query gets an index and an
+    explain() check in the same change.
+    """
+    user_id = ObjectId()
+    partner_id = ObjectId()
+    camp_id = ObjectId()
+    meeting_id = ObjectId()
+    now = datetime.now(timezone.utc)
+    newest_first = [('created_at', DESCENDING), ('_id', DESCENDING)]
+
+    return [
+        {'name': 'messages: inbox (all accessible)', 'collection': 'messages', 'sort': newest_first,
+         'filter': {'is_deleted': False, '$or': [
+             {'recipient_type': 'user', 'recipient_id': user_id},
+             {'recipient_type': 'user', 'sender_id': user_id},
+             {'recipient_type': 'ministry', 'recipient_id': None},
+             {'recipient_type': 'camp', 'recipient_id': camp_id}
+         ]}},
+        {'name': 'messages: conversation with partner', 'collection': 'messages', 'sort': newest_first,
+         'filter': {'is_deleted': False, '$or': [
+             {'recipient_type': 'user', 'recipient_id': user_id, 'sender_id': partner_id},
+             {'recipient_type': 'user', 'recipient_id': partner_id, 'sender_id': user_id}
+         ]}},
+        {'name': 'messages: camp', 'collection': 'messages', 'sort': newest_first,
+         'filter': {'is_deleted': False, 'recipient_type': 'camp', 'recipient_id': camp_id}},
+        {'name': 'messages: ministry', 'collection': 'messages', 'sort': newest_first,
+         'filter': {'is_deleted': False, 'recipient_type': 'ministry', 'recipient_id': None}},
+        {'name': 'messages: sent', 'collection': 'messages', 'sort': newest_first,
+         'filter': {'is_deleted': False, 'sender_id': user_id}},
+        {'name': 'meetings: member list', 'collection': 'meetings',
+         'sort': [('scheduled_start', ASCENDING), ('_id', ASCENDING)],
+         'filter': {'status': 'scheduled', '$or': [{'camp_id': None}, {'camp_id': camp_id}]}},
+        {'name': 'meetings: member list (any status)', 'collection': 'meetings',
+         'sort': [('scheduled_start', ASCENDING), ('_id', ASCENDING)],
+         'filter': {'$or': [{'camp_id': None}, {'camp_id': camp_id}]}},
+        {'name': 'meetings: admin list', 'collection': 'meetings',
+         'sort': [('scheduled_start', ASCENDING), ('_id', ASCENDING)],
+         'filter': {}},
+        {'name': 'meetings: reminder scan', 'collection': 'meetings', 'sort': None,
+         'filter': {'status': 'scheduled', 'reminders_sent': {'$ne': True},
+                    'scheduled_start': {'$gte': now, '$lt': now + timedelta(hours=1)}}},
+        {'name': 'prayer_requests: member list', 'collection': 'prayer_requests', 'sort': newest_first,
+         'filter': {'is_private': False}},
+        {'name': 'prayer_requests: camp list', 'collection': 'prayer_requests', 'sort': newest_first,
+         'filter': {'camp_id': camp_id, 'is_private': False}},
+        {'name': 'prayer_requests: personal', 'collection': 'prayer_requests', 'sort': newest_first,
+         'filter': {'user_id': user_id, 'is_private': False}},
+        {'name': 'conversations: list', 'collection': 'conversations',
+         'sort': [('last_message_at', DESCENDING), ('_id', DESCENDING)],
+         'filter': {'audience': {'$in': [f"user:{user_id}", 'ministry', f"camp:{camp_id}"]}}},
+        {'name': 'read_state: readers past a message', 'collection': 'read_state', 'sort': None,
+         'filter': {'conversation': f"camp:{camp_id}", 'last_read_at': {'$gte': now}}},
+        {'name': 'notification_receipts: unread', 'collection': 'notification_receipts',
+         'sort': [('created_at', DESCENDING)],
+         'filter': {'user_id': user_id, 'is_read': False}},
+        {'name': 'jobs: claim next', 'collection': 'jobs', 'sort': [('run_at', ASCENDING)],
+         'filter': {'status': 'queued', 'run_at': {'$lte': now}}},
+        {'name': 'meeting_messages: history', 'collection': 'meeting_messages',
+         'sort': [('created_at', ASCENDING), ('_id', ASCENDING)],
+         'filter': {'meeting_id': meeting_id}},
+        {'name': 'meeting_attendance: live roster', 'collection': 'meeting_attendance',
+         'filter': {'meeting_id': meeting_id, 'is_present': True}},
+    ]
+
+def _plan_stages(plan: Dict[str, Any]) -> Iterator[Dict[str, Any]]:
+    """Walk an explain() plan tree depth first"""
+    if not isinstance(plan, dict):
+        return
+    # Slot-based engine plans nest the classic tree under queryPlan
+    if 'queryPlan' in plan:
+        plan = plan['queryPlan']
+    yield plan
+    if 'inputStage' in plan:
+        yield from _plan_stages(plan['inputStage'])
+    for child in plan.get('inputStages', []):
+        yield from _plan_stages(child)
+
+def explain_query(db, query: Dict[str, Any]) -> Dict[str, Any]:
+    """Explain one canonical query and flag collection scans and in-memory sorts"""
+    cursor = db[query['collection']].find(query['filter'])
+    if query.get('sort'):
+        cursor = cursor.sort(query['sort'])
+    explain = cursor.limit(50).explain()
+
+    winning_plan = explain.get('queryPlanner', {}).get('winningPlan', {})
+    stages = [stage.get('stage') for stage in _plan_stages(winning_plan)]
+    indexes = sorted({stage['indexName'] for stage in _plan_stages(winning_plan) if stage.get('indexName')})
+
+    problems = []
+    if 'COLLSCAN' in stages:
+        problems.append('COLLSCAN')
+    if 'SORT' in stages:
+        problems.append('in-memory SORT')
+
+    return {
+        'name': query['name'],
+        'collection': query['collection'],
+        'stages': stages,
+        'indexes': indexes,
+        'problems': problems
+    }
+
+def advise(db=None) -> List[Dict[str, Any]]:
+    """Explain every canonical route query against `db`"""
+    db = db if db is not None else mongo.db
+    return [explain_query(db, query) for query in canonical_queries()]
+
+def seed_sample_data(db, count: int = 1000) -> None:
+    """
+    Fill a scratch database with synthetic documents
+
+    The planner only picks realistic plans once collections hold data, so the
+    advisor seeds a throwaway database before running explain().
+    """
+    now = datetime.now(timezone.utc)
+    camp_ids = [ObjectId() for _ in range(10)]
+    user_ids = [ObjectId() for _ in range(max(count // 10, 10))]
+
+    db.users.insert_many([{
+        '_id': uid, 'first_name': f'User{i}', 'last_name': f'Sample{i}', 'email': f'user{i}@example.com',
+        'camp_id': camp_ids[i % len(camp_ids)], 'is_active': True, 'role': 'member'
+    } for i, uid in enumerate(user_ids)])
+    db.camps.insert_many([{'_id': cid, 'name': f'Camp {i}', 'is_active': True} for i, cid in enumerate(camp_ids)])
+
+    recipient_types = ['user', 'camp', 'ministry']
+    db.messages.insert_many([{
+        'content': f'message {i}',
+        'sender_id': user_ids[i % len(user_ids)],
+        'recipient_type': recipient_types[i % 3],
+        'recipient_id': (user_ids[(i + 1) % len(user_ids)] if i % 3 == 0
+                         else camp_ids[i % len(camp_ids)] if i % 3 == 1 else None),
+        'is_deleted': False,
+        'created_at': now - timedelta(minutes=i)
+    } for i in range(count)])
+    db.meetings.insert_many([{
+        'title': f'meeting {i}',
+        'host_id': user_ids[i % len(user_ids)],
+        'camp_id': camp_ids[i % len(camp_ids)] if i % 2 else None,
+        'status': ['scheduled', 'completed', 'cancelled'][i % 3],
+        'scheduled_start': now + timedelta(hours=i - count // 2),
+        'created_at': now
+    } for i in range(count)])
+    db.prayer_requests.insert_many([{
+        'content': f'prayer {i}',
+        'user_id': user_ids[i % len(user_ids)],
+        'camp_id': camp_ids[i % len(camp_ids)] if i % 2 else None,
+        'is_private': i % 5 == 0,
+        'status': 'active',
+        'created_at': now - timedelta(minutes=i)
+    } for i in range(count)])
+    notification_ids = db.notifications.insert_many([{
+        'title': 'Sample',
+        'recipient_count': len(user_ids),
+        'created_at': now - timedelta(minutes=i)
+    } for i in range(max(1, count // len(user_ids)))]).inserted_ids
+    db.notification_receipts.insert_many([{
+        'notification_id': notification_ids[i // len(user_ids) % len(notification_ids)],
+        'user_id': user_ids[i % len(user_ids)],
+        'is_read': i % 2 == 0,
+        'created_at': now - timedelta(minutes=i // len(user_ids))
+    } for i in range(len(notification_ids) * len(user_ids))])
+    db.meeting_messages.insert_many([{
+        'meeting_id': ObjectId(),
+        'user_id': user_ids[i % len(user_ids)],
+        'content': f'chat {i}',
+        'created_at': now - timedelta(seconds=i)
+    } for i in range(count)])
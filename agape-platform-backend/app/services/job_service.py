@@ -0,0 +1,197 @@
+import os
+import socket
+import traceback
+from app import mongo
+from app.config import app_config
+from bson import ObjectId
+from datetime import datetime, timezone, timedelta
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+from typing import Any, Callable, Dict, Optional
+
+# Background jobs.
+#
+# Jobs are rows in the `jobs` collection, so they survive restarts and any
+# worker process can pick them up. Request handlers only enqueue; workers
+# claim one job at a time with an atomic find_one_and_update, run it, and
+# either mark it done or put it back with an exponential backoff. A job that
+# keeps failing is parked as 'failed' after its max attempts.
+
+JOB_HANDLERS: Dict[str, Dict[str, Any]] = {}
+
+# Modules whose @job handlers must be registered before a worker starts
+HANDLER_MODULES = (
+    'app.services.notification_service',
+    'app.services.meeting_service',
+    'app.services.upload_service',
+)
+
+def job(name: str, max_attempts: Optional[int] = None):
+    """Register a function as the handler for jobs called `name`"""
+    def decorator(fn: Callable) -> Callable:
+        JOB_HANDLERS[name] = {'fn': fn, 'max_attempts': max_attempts}
+        return fn
+    return decorator
+
+def enqueue(name: str, payload: Optional[Dict[str, Any]] = None,
+            idempotency_key: Optional[str] = None, run_at: Optional[datetime] = None) -> ObjectId:
+    """
+    Queue a job and return its id
+
+    When an idempotency key is given and a job with the same key already
+    exists, nothing new is queued and the existing job's id is returned.
+    """
+    now = datetime.now(timezone.utc)
+    doc = {
+        'name': name,
+        'payload': payload or {},
+        'status': 'queued',
+        'attempts': 0,
+        'run_at': run_at or now,
+        'created_at': now
+    }
+    if idempotency_key:
+        doc['idempotency_key'] = idempotency_key
+
+    try:
+        return mongo.db.jobs.insert_one(doc).inserted_id
+    except DuplicateKeyError:
+        existing = mongo.db.jobs.find_one({'idempotency_key': idempotency_key}, {'_id': 1})
+        return existing['_id']
+
+def claim_next(worker_id: str) -> Optional[Dict[str, Any]]:
+    """Atomically take the next due job, including ones abandoned by a dead worker"""
+    now = datetime.now(timezone.utc)
+    stale = now - timedelta(seconds=app_config.JOB_LOCK_TIMEOUT)
+
+    return mongo.db.jobs.find_one_and_update(
+        {'$or': [
+            {'status': 'queued', 'run_at': {'$lte': now}},
+            {'status': 'running', 'locked_at': {'$lt': stale}}
+        ]},
+        {
+            '$set': {'status': 'running', 'locked_by': worker_id, 'locked_at': now},
+            '$inc': {'attempts': 1}
+        },
+        sort=[('run_at', 1)],
+        return_document=ReturnDocument.AFTER
+    )
+
+def retry_delay(attempts: int) -> timedelta:
+    """Exponential backoff after the given number of failed attempts"""
+    return timedelta(seconds=app_config.JOB_RETRY_BASE_DELAY * 2 ** (attempts - 1))
+
+def run_job(doc: Dict[str, Any]) -> bool:
+    """Run a claimed job and record the outcome; returns True on success"""
+    handler = JOB_HANDLERS.get(doc['name'])
+    now = datetime.now(timezone.utc)
+
+    if not handler:
+        mongo.db.jobs.update_one(
+            {'_id': doc['_id']},
+            {'$set': {'status': 'failed', 'last_error': f"No handler for job '{doc['name']}'",
+                      'finished_at': now}}
+        )
+        return False
+
+    try:
+        handler['fn'](**doc['payload'])
+    except Exception as e:
+        print(f"Job {doc['name']} ({doc['_id']}) failed: {str(e)}")
+        max_attempts = handler['max_attempts'] or app_config.JOB_MAX_ATTEMPTS
+        update = {'last_error': traceback.format_exc(limit=5)}
+        if doc['attempts'] >= max_attempts:
+            update.update(status='failed', finished_at=now)
+        else:
+            update.update(status='queued', run_at=now + retry_delay(doc['attempts']))
+        mongo.db.jobs.update_one({'_id': doc['_id'], 'locked_by': doc['locked_by']}, {'$set': update})
+        return False
+
+    mongo.db.jobs.update_one(
+        {'_id': doc['_id'], 'locked_by': doc['locked_by']},
+        {'$set': {'status': 'done', 'finished_at': datetime.now(timezone.utc)}}
+    )
+    return True
+
+def run_pending(worker_id: str, limit: Optional[int] = None) -> int:
+    """Run due jobs until the queue is empty (or `limit` jobs ran); returns the count"""
+    count = 0
+    while limit is None or count < limit:
+        doc = claim_next(worker_id)
+        if not doc:
+            break
+        run_job(doc)
+        count += 1
+    return count
+
+def enqueue_periodic_jobs(now: Optional[datetime] = None) -> None:
+    """
+    Queue the periodic jobs that are due
+
+    The idempotency key is the time slot, so any number of processes can
+    call this and each slot still runs once.
+    """
+    now = now or datetime.now(timezone.utc)
+    interval = app_config.JOB_REMINDER_INTERVAL
+    slot = int(now.timestamp()) // interval
+    enqueue('meeting_reminders', idempotency_key=f'meeting_reminders:{slot}')
+    upload_slot = int(now.timestamp()) // app_config.UPLOAD_CLEANUP_INTERVAL
+    enqueue('expire_uploads', idempotency_key=f'expire_uploads:{upload_slot}')
+
+def load_handlers() -> None:
+    """Import the modules that register @job handlers"""
+    import importlib
+    for module in HANDLER_MODULES:
+        importlib.import_module(module)
+
+def _worker_loop(app, worker_id: str) -> None:
+    from app.services.socket_service import socketio
+
+    with app.app_context():
+        while True:
+            try:
+                if not run_pending(worker_id, limit=100):
+                    socketio.sleep(app_config.JOB_POLL_INTERVAL)
+            except Exception as e:
+                print(f"Job worker {worker_id} error: {str(e)}")
+                socketio.sleep(app_config.JOB_POLL_INTERVAL)
+
+def _scheduler_loop(app) -> None:
+    from app.services.socket_service import socketio
+
+    with app.app_context():
+        while True:
+            try:
+                enqueue_periodic_jobs()
+            except Exception as e:
+                print(f"Job scheduler error: {str(e)}")
+            socketio.sleep(app_config.JOB_REMINDER_INTERVAL)
+
+def worker_name(index: int) -> str:
+    return f"{socket.gethostname()}:{os.getpid()}:{index}"
+
+def start_workers(app) -> int:
+    """
+    Start the in-process job workers and the periodic scheduler
+
+    Uses SocketIO background tasks, so workers are green threads under
+    eventlet. Returns the number of workers started (JOB_WORKERS=0 disables
+    them, e.g. when jobs run in a separate `flask jobs work` process).
+    """
+    from app.utils.helpers import running_under_cli
+
+    # CLI commands (`flask db upgrade`, ...) load the app too; they must not start workers
+    if running_under_cli():
+        return 0
+
+    count = app.config.get('JOB_WORKERS', 0)
+    if count <= 0:
+        return 0
+
+    from app.services.socket_service import socketio
+
+    load_handlers()
+    for index in range(count):
+        socketio.start_background_task(_worker_loop, app, worker_name(index))
+    socketio.start_background_task(_scheduler_loop, app)
+    return count
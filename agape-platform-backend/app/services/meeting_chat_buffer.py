@@ -0,0 +1,201 @@
+import atexit
+import threading
+import time
+from bson import ObjectId
+from bson.errors import InvalidDocument
+from pymongo.errors import BulkWriteError
+from app.services.meeting_chat_service import insert_meeting_messages
+from app.utils.helpers import PERMANENT_WRITE_ERRORS
+from typing import Any, Dict, List, Optional
+
+# Write-behind buffer for live meeting chat.
+#
+# The socket handler gives each message a client-side ObjectId, hands it to
+# the buffer and broadcasts straight away; the buffer writes pending messages
+# with one insert_many every MEETING_CHAT_FLUSH_INTERVAL seconds, or sooner
+# once MEETING_CHAT_FLUSH_BATCH messages are waiting. At most one interval of
+# chat is held only in memory, and the buffer is flushed when a meeting ends
+# and when the process exits. Because ids are assigned up front, rewriting a
+# batch after a partial failure is idempotent (duplicates are ignored).
+# When MEETING_CHAT_QUEUE_SIZE messages are pending, new ones are refused and
+# the sender is told to retry. A message the server rejects for good (failed
+# validation, too large) is dropped, as is one still failing after
+# MEETING_CHAT_MAX_ATTEMPTS flushes, so it cannot hold up the buffer.
+
+DUPLICATE_KEY = 11000
+
+class MeetingChatBuffer:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._pending: List[Dict[str, Any]] = []
+        # Taken by the current flush and not yet confirmed written
+        self._inflight: List[Dict[str, Any]] = []
+        # message _id -> failed write attempts, for messages waiting to be retried
+        self._attempts: Dict[ObjectId, int] = {}
+        self._socketio = None
+        self._app = None
+        self._running = False
+        self.max_pending = 1000
+        self.batch_size = 200
+        self.interval = 0.2
+        self.max_attempts = 50
+        # Metrics
+        self.rejected = 0
+        self.dropped = 0
+        self.written = 0
+        self.flushes = 0
+        self.failures = 0
+        self.last_flush_ms: Optional[float] = None
+        self.max_flush_ms: Optional[float] = None
+
+    def init_app(self, app, socketio) -> None:
+        self._app = app
+        self._socketio = socketio
+        self.max_pending = app.config.get('MEETING_CHAT_QUEUE_SIZE', 1000)
+        self.batch_size = app.config.get('MEETING_CHAT_FLUSH_BATCH', 200)
+        self.interval = app.config.get('MEETING_CHAT_FLUSH_INTERVAL', 0.2)
+        self.max_attempts = app.config.get('MEETING_CHAT_MAX_ATTEMPTS', 50)
+        atexit.register(self.flush)
+
+    def submit(self, message: Dict[str, Any]) -> bool:
+        """
+        Buffer a meeting message for writing
+
+        Assigns message['_id'] if it has none, so the caller can broadcast
+        the final id immediately. Returns False when the buffer is full.
+        """
+        message.setdefault('_id', ObjectId())
+        with self._lock:
+            if len(self._pending) >= self.max_pending:
+                self.rejected += 1
+                return False
+            self._pending.append(message)
+            if len(self._pending) >= self.batch_size:
+                self._wake.set()
+            if not self._running:
+                self._running = True
+                self._socketio.start_background_task(self._writer_loop)
+        return True
+
+    def depth(self) -> int:
+        return len(self._pending)
+
+    def pending_for(self, meeting_id: Any) -> List[Dict[str, Any]]:
+        """Messages of a meeting that are buffered or being written, not yet readable from the database"""
+        meeting = ObjectId(meeting_id)
+        with self._lock:
+            return [m for m in self._inflight + self._pending if m['meeting_id'] == meeting]
+
+    def flush(self) -> int:
+        """Write everything pending now; returns the number of messages written"""
+        if self._app is None:
+            return 0
+        with self._flush_lock:
+            with self._lock:
+                batch, self._pending = self._pending, []
+                self._inflight = batch
+            if not batch:
+                return 0
+            try:
+                with self._app.app_context():
+                    return self._write(batch)
+            finally:
+                with self._lock:
+                    self._inflight = []
+
+    def _write(self, batch: List[Dict[str, Any]]) -> int:
+        written = 0
+        started = time.monotonic()
+        for start in range(0, len(batch), self.batch_size):
+            chunk = batch[start:start + self.batch_size]
+            try:
+                written += self._write_chunk(chunk)
+            except Exception as e:
+                self._requeue(batch[start:], e)
+                break
+
+        if self._attempts:
+            # Forget attempts of messages that were written or dropped
+            with self._lock:
+                waiting = {m['_id'] for m in self._pending}
+            self._attempts = {key: n for key, n in self._attempts.items() if key in waiting}
+
+        elapsed = round((time.monotonic() - started) * 1000, 2)
+        self.flushes += 1
+        self.written += written
+        self.last_flush_ms = elapsed
+        self.max_flush_ms = max(self.max_flush_ms or 0, elapsed)
+        return written
+
+    def _write_chunk(self, chunk: List[Dict[str, Any]]) -> int:
+        # Returns the number written; connection and server failures raise
+        try:
+            return insert_meeting_messages(chunk)
+        except BulkWriteError as e:
+            retry = []
+            for err in e.details.get('writeErrors', []):
+                message = chunk[err['index']]
+                if err.get('code') == DUPLICATE_KEY:
+                    continue  # written by an earlier attempt
+                if err.get('code') in PERMANENT_WRITE_ERRORS:
+                    self._drop(message, err.get('errmsg'))
+                else:
+                    retry.append(message)
+            if retry:
+                self._requeue(retry, e)
+            return e.details.get('nInserted', 0)
+        except InvalidDocument as e:
+            # Refused before reaching the server (e.g. too large): find the message
+            if len(chunk) == 1:
+                self._drop(chunk[0], str(e))
+                return 0
+            return sum(self._write_chunk([message]) for message in chunk)
+
+    def _requeue(self, messages: List[Dict[str, Any]], error: Exception) -> None:
+        # Keep them for the next flush, ahead of anything newer
+        print(f"Meeting chat write error: {str(error)}")
+        self.failures += 1
+        retry = []
+        for message in messages:
+            attempts = self._attempts.get(message['_id'], 0) + 1
+            if attempts >= self.max_attempts:
+                self._drop(message, f"still failing after {attempts} attempts")
+            else:
+                self._attempts[message['_id']] = attempts
+                retry.append(message)
+        with self._lock:
+            self._pending[:0] = retry
+
+    def _drop(self, message: Dict[str, Any], reason: Optional[str]) -> None:
+        print(f"Meeting chat message {message['_id']} dropped: {reason}")
+        self.dropped += 1
+        self._attempts.pop(message['_id'], None)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'depth': self.depth(),
+            'rejected': self.rejected,
+            'dropped': self.dropped,
+            'written': self.written,
+            'flushes': self.flushes,
+            'failures': self.failures,
+            'last_flush_ms': self.last_flush_ms,
+            'max_flush_ms': self.max_flush_ms,
+            'flush_interval': self.interval,
+            'flush_batch': self.batch_size
+        }
+
+    def _writer_loop(self) -> None:
+        while True:
+            # Wake on the interval, or early when a full batch is waiting
+            self._wake.wait(self.interval)
+            self._wake.clear()
+            try:
+                self.flush()
+            except Exception as e:
+                print(f"Meeting chat flush error: {str(e)}")
+
+# Process-wide buffer used by the meeting chat socket handler
+meeting_chat_buffer = MeetingChatBuffer()
@@ -0,0 +1,137 @@
+import threading
+from collections import OrderedDict, deque
+from bson import ObjectId
+from typing import Any, Deque, Dict, List, Optional
+from app.services.meeting_chat_buffer import meeting_chat_buffer
+from app.services.meeting_chat_service import latest_meeting_messages
+
+# Recent chat per live meeting, kept in memory for join backfill.
+#
+# Every meeting message is rendered once, broadcast, and appended to a
+# bounded ring for its meeting. A user joining the meeting gets the ring in
+# the join_meeting ack, so late joiners see recent history without a
+# meeting_messages query or per-message user lookups. A meeting's ring is
+# seeded from the database the first time it is needed (e.g. after a
+# restart), together with messages still waiting in the write buffer, and
+# evicted when the meeting ends; the number of meetings held is capped,
+# least recently used first. Messages for a meeting without a ring are not
+# kept (they will be read back when the ring is seeded).
+
+def render_meeting_message(message: Dict[str, Any], card: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    """Client payload for a meeting message, as broadcast in new_meeting_message"""
+    user_id = str(message['user_id'])
+    sent_at = message['created_at'].isoformat()
+    name = f"{card.get('first_name', '')} {card.get('last_name', '')}".strip() if card else ''
+    profile_image = card.get('profile_image') if card else None
+    return {
+        'message_id': str(message['_id']),
+        'meeting_id': str(message['meeting_id']),
+        'user_id': user_id,
+        'user_name': name,
+        'profile_image': profile_image,
+        'content': message.get('content'),
+        'message_type': message.get('message_type', 'text'),
+        'attachment_urls': message.get('attachment_urls', []),
+        'created_at': sent_at,
+        'timestamp': sent_at,
+        'user': {
+            'id': user_id,
+            'name': name,
+            'profile_image': profile_image
+        }
+    }
+
+class RecentMeetingChat:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._rings: "OrderedDict[str, Deque[Dict[str, Any]]]" = OrderedDict()
+        # meeting_id -> messages that arrived while its ring was being seeded
+        self._loading: Dict[str, List[Dict[str, Any]]] = {}
+        self.enabled = True
+        self.size = 50
+        self.max_meetings = 200
+        self.seeds = 0
+
+    def init_app(self, app) -> None:
+        self.size = app.config.get('MEETING_CHAT_RECENT_SIZE', 50)
+        self.max_meetings = app.config.get('MEETING_CHAT_RECENT_MEETINGS', 200)
+        # With several socket workers, each would only see its own senders
+        self.enabled = self.size > 0 and not app.config.get('SOCKETIO_MESSAGE_QUEUE')
+
+    def add(self, meeting_id: Any, rendered: Dict[str, Any]) -> None:
+        """Append a rendered message to its meeting's ring, if the ring has been seeded"""
+        if not self.enabled:
+            return
+        key = str(meeting_id)
+        with self._lock:
+            ring = self._rings.get(key)
+            if ring is not None:
+                ring.append(rendered)
+            elif key in self._loading:
+                self._loading[key].append(rendered)
+
+    def recent(self, meeting_id: Any) -> Optional[List[Dict[str, Any]]]:
+        """
+        Recent messages for a meeting, oldest first
+
+        Seeds the ring from the database on first use. Returns None when the
+        ring is disabled and clients should page history over REST.
+        """
+        if not self.enabled:
+            return None
+        key = str(meeting_id)
+        with self._lock:
+            ring = self._rings.get(key)
+            if ring is not None:
+                self._rings.move_to_end(key)
+                return list(ring)
+            arrived = self._loading.setdefault(key, [])
+
+        seeded = self._load(key)
+        with self._lock:
+            ring = self._rings.get(key)
+            if ring is None:
+                # Written history, then anything buffered or sent during the load
+                merged: Dict[str, Dict[str, Any]] = {}
+                for message in seeded + arrived:
+                    merged.setdefault(message['message_id'], message)
+                ring = self._ring(key)
+                # Ids are assigned when a message is received, so they sort in arrival order
+                ring.extend(sorted(merged.values(), key=lambda m: ObjectId(m['message_id'])))
+                self.seeds += 1
+            if self._loading.get(key) is arrived:
+                del self._loading[key]
+            return list(ring)
+
+    def evict(self, meeting_id: Any) -> None:
+        with self._lock:
+            self._rings.pop(str(meeting_id), None)
+            self._loading.pop(str(meeting_id), None)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'enabled': self.enabled,
+            'meetings': len(self._rings),
+            'size': self.size,
+            'seeds': self.seeds
+        }
+
+    def _ring(self, key: str) -> Deque[Dict[str, Any]]:
+        # Called with the lock held
+        ring = self._rings.get(key)
+        if ring is None:
+            ring = self._rings[key] = deque(maxlen=self.size)
+            while len(self._rings) > self.max_meetings:
+                self._rings.popitem(last=False)
+        self._rings.move_to_end(key)
+        return ring
+
+    def _load(self, meeting_id: str) -> List[Dict[str, Any]]:
+        from app.services.hydration_service import get_users_by_ids, collect_ids
+
+        docs = latest_meeting_messages(meeting_id, self.size) + meeting_chat_buffer.pending_for(meeting_id)
+        users_by_id = get_users_by_ids(collect_ids(docs, 'user_id'))
+        return [render_meeting_message(doc, users_by_id.get(str(doc['user_id']))) for doc in docs]
+
+# Process-wide rings used by the meeting chat handlers
+recent_meeting_chat = RecentMeetingChat()
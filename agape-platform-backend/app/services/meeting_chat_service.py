@@ -0,0 +1,58 @@
+from app import mongo
+from bson import ObjectId
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+from app.utils.pagination import Cursor, keyset_sort, with_keyset
+
+# Storage for meeting chat.
+#
+# Socket and REST chat both go through here, so every stored message has the
+# same shape and is ordered by created_at (with _id as the tie-breaker). That
+# matches the (meeting_id, created_at, _id) index, so history pages are
+# index range scans rather than in-memory sorts over the whole meeting.
+
+def new_meeting_message(meeting_id: Any, user_id: Any, content: str, message_type: str = 'text',
+                        attachment_urls: Optional[List[str]] = None) -> Dict[str, Any]:
+    """Build a meeting message document; its _id is assigned up front"""
+    return {
+        '_id': ObjectId(),
+        'meeting_id': ObjectId(meeting_id),
+        'user_id': ObjectId(user_id),
+        'content': content,
+        'message_type': message_type,
+        'attachment_urls': attachment_urls or [],
+        'created_at': datetime.now(timezone.utc)
+    }
+
+def insert_meeting_message(message: Dict[str, Any]) -> ObjectId:
+    return mongo.db.meeting_messages.insert_one(message).inserted_id
+
+def insert_meeting_messages(messages: List[Dict[str, Any]]) -> int:
+    """Unordered bulk insert; returns how many were written"""
+    return len(mongo.db.meeting_messages.insert_many(messages, ordered=False).inserted_ids)
+
+def find_meeting_messages(meeting_id: Any, cursor: Optional[Cursor] = None,
+                          direction: Optional[str] = None, skip: int = 0, limit: int = 50):
+    """
+    One history page in created_at order
+
+    Returns (docs, reverse) where `reverse` is True when the docs came back
+    newest first and the page needs flipping.
+    """
+    filters = {'meeting_id': ObjectId(meeting_id)}
+    sort, reverse = keyset_sort('created_at', 1, direction)
+    docs = mongo.db.meeting_messages.find(
+        with_keyset(filters, 'created_at', cursor, direction)
+    ).sort(sort).skip(skip).limit(limit)
+    return list(docs), reverse
+
+def latest_meeting_messages(meeting_id: Any, limit: int) -> List[Dict[str, Any]]:
+    """The most recent `limit` messages of a meeting, oldest first"""
+    docs = list(mongo.db.meeting_messages.find(
+        {'meeting_id': ObjectId(meeting_id)}
+    ).sort([('created_at', -1), ('_id', -1)]).limit(limit))
+    docs.reverse()
+    return docs
+
+def count_meeting_messages(meeting_id: Any) -> int:
+    return mongo.db.meeting_messages.count_documents({'meeting_id': ObjectId(meeting_id)})
@@ -2,8 +2,15 @@ from app import mongo
 from bson import ObjectId
 from datetime import datetime, timezone, timedelta
 from app.utils.helpers import calculate_next_occurrence
-from app.services.notification_service import send_meeting_notification
-
+from app.services.notification_service import queue_meeting_notification
+from app.services.job_service import job
+from app.services.hydration_service import get_users_by_ids, collect_ids
+from app.services.attendance_service import attendance, attending_meeting_ids
+from app.services.meeting_chat_buffer import meeting_chat_buffer
+from app.services.meeting_chat_history import recent_meeting_chat
+from app.services.roster_service import meeting_roster
+
+@job('expand_recurring_meeting')
 def create_recurring_meetings(meeting_id):
     """Create future instances of a recurring meeting"""
     meeting = mongo.db.meetings.find_one({'_id': ObjectId(meeting_id)})
@@ -48,7 +55,7 @@ def create_recurring_meetings(meeting_id):
             'meeting_link': meeting.get('meeting_link'),
             'status': 'scheduled',
             'created_at': datetime.now(timezone.utc),
-            'attendees': [],
+            'attendee_count': 0,
             'recording_url': None,
             'recurring_group_id': meeting_id  # Link to the original meeting
         }
@@ -62,6 +69,16 @@ def create_recurring_meetings(meeting_id):
 
     return True
 
+def close_meeting(meeting_id):
+    """Wrap up a meeting's live state once it is marked completed (REST or socket end)"""
+    # Persist buffered live chat so the meeting's history is complete
+    meeting_chat_buffer.flush()
+    recent_meeting_chat.evict(meeting_id)
+
+    # Close open attendance sessions with their durations
+    attendance.end_meeting(meeting_id)
+    meeting_roster.forget(meeting_id)
+
 def get_upcoming_meetings_for_user(user_id, days=7):
     """Get upcoming meetings for a specific user in the next X days"""
     user = mongo.db.users.find_one({'_id': ObjectId(user_id)})
@@ -94,23 +111,25 @@ def get_upcoming_meetings_for_user(user_id, days=7):
     meetings_cursor = mongo.db.meetings.find(filters).sort('scheduled_start', 1)
 
     # Process results
+    meeting_docs = list(meetings_cursor)
+    hosts_by_id = get_users_by_ids(collect_ids(meeting_docs, 'host_id'))
+    attending = attending_meeting_ids(user_id, collect_ids(meeting_docs, '_id'))
+
     meetings = []
-    for meeting in meetings_cursor:
+    for meeting in meeting_docs:
         meeting['_id'] = str(meeting['_id'])
         meeting['host_id'] = str(meeting['host_id'])
         if 'camp_id' in meeting and meeting['camp_id']:
             meeting['camp_id'] = str(meeting['camp_id'])
 
         # Add host information
-        host = mongo.db.users.find_one(
-            {'_id': ObjectId(meeting['host_id'])},
-            {'password_hash': 0, 'first_name': 1, 'last_name': 1}
-        )
+        host = hosts_by_id.get(meeting['host_id'])
         if host:
             meeting['host_name'] = f"{host['first_name']} {host['last_name']}"
 
         # Is user attending?
-        meeting['is_attending'] = ObjectId(user_id) in meeting.get('attendees', [])
+        meeting['is_attending'] = meeting['_id'] in attending
+        meeting.pop('attendees', None)
 
         # Calculate how far in the future
         time_diff = meeting['scheduled_start'] - now
@@ -131,8 +150,9 @@ def get_upcoming_meetings_for_user(user_id, days=7):
 
     return meetings
 
+@job('meeting_reminders')
 def send_meeting_reminders():
-    """Send reminders for upcoming meetings (would be called by a scheduled task)"""
+    """Queue reminders for meetings starting within the hour (runs as a periodic job)"""
     now = datetime.now(timezone.utc)
 
     # Find meetings in the next hour
@@ -144,16 +164,16 @@ def send_meeting_reminders():
         'reminders_sent': {'$ne': True}  # Don't send reminders twice
     }
 
-    upcoming_meetings = mongo.db.meetings.find(filters)
+    upcoming_meetings = mongo.db.meetings.find(filters, {'_id': 1})
 
     for meeting in upcoming_meetings:
-        # Send reminders
-        send_meeting_notification(str(meeting['_id']), 'reminder')
-
-        # Mark as sent
-        mongo.db.meetings.update_one(
-            {'_id': meeting['_id']},
+        # Mark as sent first; only the scan that flips the flag queues the reminder
+        result = mongo.db.meetings.update_one(
+            {'_id': meeting['_id'], 'reminders_sent': {'$ne': True}},
             {'$set': {'reminders_sent': True}}
         )
+        if result.modified_count:
+            queue_meeting_notification(meeting['_id'], 'reminder',
+                                       idempotency_key=f"meeting:{meeting['_id']}:reminder")
 
     return True
@@ -0,0 +1,280 @@
+from app import mongo
+from datetime import datetime, timezone, timedelta
+from pymongo import ReturnDocument, UpdateOne
+from typing import Callable, Dict, List, Optional
+
+# Versioned schema migrations.
+#
+# Every change to indexes or stored document shapes gets a new, higher
+# version here. Migrations run from `flask db upgrade` (deploy step), never
+# from request-serving workers; workers only compare versions at startup.
+
+SCHEMA_DOC_ID = 'schema'
+LOCK_TIMEOUT = timedelta(minutes=30)
+
+MIGRATIONS: List[Dict] = []
+
+def migration(version: int, description: str):
+    """Register a migration function `fn(db)` under a schema version"""
+    def decorator(fn: Callable):
+        MIGRATIONS.append({'version': version, 'description': description, 'fn': fn})
+        MIGRATIONS.sort(key=lambda m: m['version'])
+        return fn
+    return decorator
+
+def latest_version() -> int:
+    return MIGRATIONS[-1]['version'] if MIGRATIONS else 0
+
+def current_version(db=None) -> int:
+    """Schema version recorded in the schema_version collection (0 for a fresh database)"""
+    db = db if db is not None else mongo.db
+    doc = db.schema_version.find_one({'_id': SCHEMA_DOC_ID}, {'version': 1})
+    return doc.get('version', 0) if doc else 0
+
+def pending_migrations(db=None, target: Optional[int] = None) -> List[Dict]:
+    current = current_version(db)
+    target = latest_version() if target is None else target
+    return [m for m in MIGRATIONS if current < m['version'] <= target]
+
+def _acquire_lock(db) -> bool:
+    """Take the upgrade lock so two deploy hosts never migrate at once"""
+    now = datetime.now(timezone.utc)
+    db.schema_version.update_one(
+        {'_id': SCHEMA_DOC_ID},
+        {'$setOnInsert': {'version': 0, 'history': [], 'locked_at': None}},
+        upsert=True
+    )
+    doc = db.schema_version.find_one_and_update(
+        {'_id': SCHEMA_DOC_ID, '$or': [{'locked_at': None}, {'locked_at': {'$lt': now - LOCK_TIMEOUT}}]},
+        {'$set': {'locked_at': now}},
+        return_document=ReturnDocument.AFTER
+    )
+    return doc is not None
+
+def _release_lock(db) -> None:
+    db.schema_version.update_one({'_id': SCHEMA_DOC_ID}, {'$set': {'locked_at': None}})
+
+def upgrade(db=None, target: Optional[int] = None, log: Callable[[str], None] = print) -> int:
+    """
+    Apply pending migrations in order, recording each one as it completes
+
+    Returns the schema version after the run.
+    """
+    db = db if db is not None else mongo.db
+
+    if not _acquire_lock(db):
+        raise RuntimeError('Another schema upgrade is in progress (schema_version is locked)')
+
+    try:
+        for m in pending_migrations(db, target):
+            log(f"Applying migration {m['version']}: {m['description']}")
+            m['fn'](db)
+            db.schema_version.update_one(
+                {'_id': SCHEMA_DOC_ID},
+                {
+                    '$set': {'version': m['version']},
+                    '$push': {'history': {
+                        'version': m['version'],
+                        'description': m['description'],
+                        'applied_at': datetime.now(timezone.utc)
+                    }}
+                }
+            )
+    finally:
+        _release_lock(db)
+
+    return current_version(db)
+
+def check_schema_version(app) -> None:
+    """Startup check: one point read, warn if the database is behind the code"""
+    if not app.config.get('SCHEMA_CHECK_ON_STARTUP', True):
+        return
+
+    try:
+        version = current_version()
+    except Exception as e:
+        app.logger.warning(f"Could not read schema version: {str(e)}")
+        return
+
+    if version < latest_version():
+        app.logger.warning(
+            f"Database schema is at version {version}, code expects {latest_version()}. "
+            f"Run `flask db upgrade`."
+        )
+
+# --- Migrations ---
+
+@migration(1, 'Create catalog indexes')
+def _create_catalog_indexes(db):
+    from app.services.index_service import ensure_indexes
+    ensure_indexes(db)
+
+@migration(2, 'Split per-user notifications into shared notifications and receipts')
+def _split_notification_receipts(db):
+    from app.services.index_service import ensure_indexes
+    ensure_indexes(db)
+
+    # Legacy rows carry user_id/is_read; each becomes a one-recipient notification
+    batch = []
+    legacy = db.notifications.find({'user_id': {'$exists': True}},
+                                   {'user_id': 1, 'is_read': 1, 'created_at': 1})
+    for doc in legacy:
+        batch.append(doc)
+        if len(batch) >= 1000:
+            _move_to_receipts(db, batch)
+            batch = []
+    if batch:
+        _move_to_receipts(db, batch)
+
+def _move_to_receipts(db, docs):
+    db.notification_receipts.bulk_write([
+        UpdateOne(
+            {'notification_id': doc['_id'], 'user_id': doc['user_id']},
+            {'$setOnInsert': {'is_read': doc.get('is_read', False), 'created_at': doc.get('created_at')}},
+            upsert=True
+        ) for doc in docs
+    ], ordered=False)
+    db.notifications.update_many(
+        {'_id': {'$in': [doc['_id'] for doc in docs]}},
+        {'$unset': {'user_id': '', 'is_read': ''}, '$set': {'recipient_count': 1}}
+    )
+
+@migration(3, 'Create background job queue indexes')
+def _create_job_indexes(db):
+    from app.services.index_service import ensure_indexes
+    ensure_indexes(db)
+
+@migration(4, 'Create shared presence indexes')
+def _create_presence_indexes(db):
+    from app.services.index_service import ensure_indexes
+    ensure_indexes(db)
+
+@migration(5, 'Store meeting chat time as created_at')
+def _normalize_meeting_message_time(db):
+    from app.services.index_service import ensure_indexes
+
+    # Socket chat used to be stored with `timestamp`; history sorts on created_at
+    db.meeting_messages.update_many(
+        {'timestamp': {'$exists': True}, 'created_at': {'$exists': False}},
+        {'$rename': {'timestamp': 'created_at'}}
+    )
+    db.meeting_messages.update_many({'timestamp': {'$exists': True}}, {'$unset': {'timestamp': ''}})
+    db.meeting_messages.update_many(
+        {'message_type': {'$exists': False}},
+        {'$set': {'message_type': 'text', 'attachment_urls': []}}
+    )
+
+    # Drop any index on the old field; the catalog's (meeting_id, created_at, _id) replaces it
+    for name, info in db.meeting_messages.index_information().items():
+        if any(field == 'timestamp' for field, _ in info['key']):
+            db.meeting_messages.drop_index(name)
+    ensure_indexes(db)
+
+@migration(6, 'Move meeting attendees into meeting_attendance')
+def _split_meeting_attendance(db):
+    from app.services.index_service import ensure_indexes
+    ensure_indexes(db)
+
+    # Legacy attendees are kept as registrations; join times were never recorded
+    meetings = db.meetings.find({'attendees': {'$exists': True}}, {'attendees': 1, 'created_at': 1})
+    for meeting in meetings:
+        attendees = meeting.get('attendees') or []
+        if attendees:
+            db.meeting_attendance.bulk_write([
+                UpdateOne(
+                    {'meeting_id': meeting['_id'], 'user_id': user_id},
+                    {'$set': {'registered': True}, '$setOnInsert': {'created_at': meeting.get('created_at')}},
+                    upsert=True
+                ) for user_id in attendees
+            ], ordered=False)
+        db.meetings.update_one(
+            {'_id': meeting['_id']},
+            {'$set': {'attendee_count': len(attendees)}, '$unset': {'attendees': ''}}
+        )
+
+@migration(7, 'Replace messages.read_by with read watermarks and read_count')
+def _split_message_read_state(db):
+    from app.services.index_service import ensure_indexes
+    ensure_indexes(db)
+
+    # Conversation key on every message (see conversation_service)
+    db.messages.update_many({'conversation': {'$exists': False}, 'recipient_type': 'ministry'},
+                            {'$set': {'conversation': 'ministry'}})
+    db.messages.update_many({'conversation': {'$exists': False}, 'recipient_type': 'camp'},
+                            [{'$set': {'conversation': {'$concat': ['camp:', {'$toString': '$recipient_id'}]}}}])
+    sender, recipient = {'$toString': '$sender_id'}, {'$toString': '$recipient_id'}
+    db.messages.update_many({'conversation': {'$exists': False}, 'recipient_type': 'user'}, [{'$set': {
+        'conversation': {'$cond': [
+            {'$lt': [sender, recipient]},
+            {'$concat': ['dm:', sender, ':', recipient]},
+            {'$concat': ['dm:', recipient, ':', sender]}
+        ]}
+    }}])
+
+    # Each reader's watermark is the newest message they read in the conversation
+    readers = db.messages.aggregate([
+        {'$match': {'read_by.0': {'$exists': True}}},
+        {'$unwind': '$read_by'},
+        {'$group': {'_id': {'user_id': '$read_by', 'conversation': '$conversation'},
+                    'last_read_at': {'$max': '$created_at'}}}
+    ], allowDiskUse=True)
+    batch = []
+    for row in readers:
+        batch.append(UpdateOne(
+            {'user_id': row['_id']['user_id'], 'conversation': row['_id']['conversation']},
+            {'$max': {'last_read_at': row['last_read_at']}},
+            upsert=True
+        ))
+        if len(batch) >= 1000:
+            db.read_state.bulk_write(batch, ordered=False)
+            batch = []
+    if batch:
+        db.read_state.bulk_write(batch, ordered=False)
+
+    # The array becomes a counter (the sender does not count as a reader)
+    db.messages.update_many({'read_by': {'$exists': True}}, [
+        {'$set': {'read_count': {'$size': {'$setDifference': [{'$ifNull': ['$read_by', []]}, ['$sender_id']]}}}},
+        {'$unset': 'read_by'}
+    ])
+    db.messages.update_many({'read_count': {'$exists': False}}, {'$set': {'read_count': 0}})
+
+@migration(8, 'Add unread_counters index')
+def _add_unread_counters(db):
+    # Counter documents are built on first use, so there is nothing to backfill
+    from app.services.index_service import ensure_indexes
+    ensure_indexes(db)
+
+@migration(9, 'Build conversation summaries from messages')
+def _build_conversations(db):
+    from app.services.index_service import ensure_indexes
+    from app.services.conversation_service import new_conversation_summary, last_message_fields
+    ensure_indexes(db)
+
+    latest = db.messages.aggregate([
+        {'$match': {'is_deleted': False}},
+        {'$sort': {'created_at': -1, '_id': -1}},
+        {'$group': {'_id': '$conversation', 'message': {'$first': '$$ROOT'}}}
+    ], allowDiskUse=True)
+    batch = []
+    for row in latest:
+        message = row['message']
+        batch.append(UpdateOne(
+            {'key': row['_id']},
+            {'$set': last_message_fields(message), '$setOnInsert': new_conversation_summary(message)},
+            upsert=True
+        ))
+        if len(batch) >= 1000:
+            db.conversations.bulk_write(batch, ordered=False)
+            batch = []
+    if batch:
+        db.conversations.bulk_write(batch, ordered=False)
+
+@migration(10, 'Add upload_sessions index')
+def _add_upload_sessions(db):
+    from app.services.index_service import ensure_indexes
+    ensure_indexes(db)
+
+@migration(11, 'Add read_state conversation index')
+def _add_read_state_conversation_index(db):
+    from app.services.index_service import ensure_indexes
+    ensure_indexes(db)
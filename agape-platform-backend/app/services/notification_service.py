@@ -2,11 +2,25 @@ from app import mongo
 from bson import ObjectId
 from datetime import datetime, timezone
 from app.services.socket_service import socketio
+from app.services.fanout_service import fan_out_notification, audience_filter, audience_room
+from app.services.job_service import job, enqueue
+from app.services.unread_service import get_unread_summary, notifications_read
 
 # In a real implementation, this would connect to FCM, APNS, etc.
 # For now, we'll simulate notification storage in the database
 
-def send_meeting_notification(meeting_id, event_type, new_status=None):
+def queue_meeting_notification(meeting_id, event_type, new_status=None, idempotency_key=None):
+    """Queue send_meeting_notification as a background job"""
+    return enqueue('meeting_notification', {
+        'meeting_id': str(meeting_id),
+        'event_type': event_type,
+        'new_status': new_status,
+        # Fixed up front so a retried job resumes the same fan-out
+        'notification_id': str(ObjectId())
+    }, idempotency_key=idempotency_key)
+
+@job('meeting_notification')
+def send_meeting_notification(meeting_id, event_type, new_status=None, notification_id=None):
     """
     Send notifications about meeting events
 
@@ -14,31 +28,13 @@ def send_meeting_notification(meeting_id, event_type, new_status=None):
         meeting_id: ID of the meeting
         event_type: Type of event ('created', 'rescheduled', 'cancelled', etc.)
         new_status: New status of the meeting if changed
+        notification_id: Pre-allocated notification id (set when run as a job)
     """
     # Get meeting details
     meeting = mongo.db.meetings.find_one({'_id': ObjectId(meeting_id)})
     if not meeting:
         return False
 
-    # Determine recipients
-    recipients = []
-
-    # For ministry-wide meetings, notify all active users
-    if not meeting.get('camp_id'):
-        users_cursor = mongo.db.users.find(
-            {'is_active': True},
-            {'_id': 1}
-        )
-        recipients = [user['_id'] for user in users_cursor]
-
-    # For camp meetings, notify camp members
-    else:
-        users_cursor = mongo.db.users.find(
-            {'camp_id': meeting['camp_id'], 'is_active': True},
-            {'_id': 1}
-        )
-        recipients = [user['_id'] for user in users_cursor]
-
     # Prepare notification title and body
     title = f"Meeting Update: {meeting['title']}"
     body = ""
@@ -58,22 +54,19 @@ def send_meeting_notification(meeting_id, event_type, new_status=None):
     elif event_type == 'reminder':
         body = f"Meeting starts soon: {meeting['title']} at {meeting['scheduled_start'].strftime('%I:%M %p')}"
 
-    # Create notifications in DB
-    notifications = []
-    for recipient_id in recipients:
-        notification = {
-            'user_id': recipient_id,
-            'title': title,
-            'body': body,
-            'related_type': 'meeting',
-            'related_id': meeting['_id'],
-            'created_at': datetime.now(timezone.utc),
-            'is_read': False
-        }
-        notifications.append(notification)
+    # Store one shared notification plus a receipt per camp/ministry member
+    notification = fan_out_notification({
+        'title': title,
+        'body': body,
+        'related_type': 'meeting',
+        'related_id': meeting['_id'],
+        'event_type': event_type
+    }, audience_filter(meeting.get('camp_id')),
+        notification_id=ObjectId(notification_id) if notification_id else None)
 
-    if notifications:
-        result = mongo.db.notifications.insert_many(notifications)
+    if notification['recipient_count']:
+        timestamp = datetime.now(timezone.utc).isoformat()
+        room = audience_room(meeting.get('camp_id'))
 
         # Send real-time notifications via WebSocket
         notification_data = {
@@ -81,24 +74,18 @@ def send_meeting_notification(meeting_id, event_type, new_status=None):
             'body': body,
             'meeting_id': str(meeting['_id']),
             'event_type': event_type,
-            'timestamp': datetime.now(timezone.utc).isoformat()
+            'timestamp': timestamp
         }
+        socketio.emit('meeting_notification', notification_data, room=room)
 
-        # Send to ministry or camp room
-        if not meeting.get('camp_id'):
-            socketio.emit('meeting_notification', notification_data, room='ministry')
-        else:
-            camp_id = str(meeting['camp_id'])
-            socketio.emit('meeting_notification', notification_data, room=f"camp_{camp_id}")
-
-        # Also send individual notifications
-        for recipient_id in recipients:
-            socketio.emit('notification', {
-                'type': 'meeting',
-                'title': title,
-                'body': body,
-                'timestamp': datetime.now(timezone.utc).isoformat()
-            }, room=f"user_{str(recipient_id)}")
+        # One room-level emit reaches every recipient's socket
+        socketio.emit('notification', {
+            'notification_id': str(notification['_id']),
+            'type': 'meeting',
+            'title': title,
+            'body': body,
+            'timestamp': timestamp
+        }, room=room)
 
     # In a real implementation, we'd trigger push notifications here
     return True
@@ -120,25 +107,6 @@ def send_prayer_request_notification(request_id, event_type):
     if prayer.get('is_private', False):
         return True
 
-    # Determine recipients
-    recipients = []
-
-    # For ministry-wide prayer requests, notify all active users
-    if not prayer.get('camp_id'):
-        users_cursor = mongo.db.users.find(
-            {'is_active': True},
-            {'_id': 1}
-        )
-        recipients = [user['_id'] for user in users_cursor]
-
-    # For camp prayer requests, notify camp members
-    else:
-        users_cursor = mongo.db.users.find(
-            {'camp_id': prayer['camp_id'], 'is_active': True},
-            {'_id': 1}
-        )
-        recipients = [user['_id'] for user in users_cursor]
-
     # Prepare notification title and body
     title = "Prayer Request"
     body = ""
@@ -157,26 +125,18 @@ def send_prayer_request_notification(request_id, event_type):
             if user:
                 body = f"{user['first_name']}'s prayer request has been answered!"
 
-    # Create notifications in DB
-    notifications = []
-    for recipient_id in recipients:
-        # Don't notify the author about their own request
-        if recipient_id == prayer['user_id']:
-            continue
-
-        notification = {
-            'user_id': recipient_id,
-            'title': title,
-            'body': body,
-            'related_type': 'prayer_request',
-            'related_id': prayer['_id'],
-            'created_at': datetime.now(timezone.utc),
-            'is_read': False
-        }
-        notifications.append(notification)
+    # Store one shared notification plus a receipt per member, skipping the author
+    notification = fan_out_notification({
+        'title': title,
+        'body': body,
+        'related_type': 'prayer_request',
+        'related_id': prayer['_id'],
+        'event_type': event_type
+    }, audience_filter(prayer.get('camp_id')), exclude_user_id=prayer['user_id'])
 
-    if notifications:
-        result = mongo.db.notifications.insert_many(notifications)
+    if notification['recipient_count']:
+        timestamp = datetime.now(timezone.utc).isoformat()
+        room = audience_room(prayer.get('camp_id'))
 
         # Send real-time notifications via WebSocket
         notification_data = {
@@ -184,24 +144,19 @@ def send_prayer_request_notification(request_id, event_type):
             'body': body,
             'prayer_request_id': str(prayer['_id']),
             'event_type': event_type,
-            'timestamp': datetime.now(timezone.utc).isoformat()
+            'timestamp': timestamp
         }
+        socketio.emit('prayer_notification', notification_data, room=room)
 
-        # Broadcast to appropriate room
-        if not prayer.get('camp_id'):
-            socketio.emit('prayer_notification', notification_data, room='ministry')
-        else:
-            camp_id = str(prayer['camp_id'])
-            socketio.emit('prayer_notification', notification_data, room=f"camp_{camp_id}")
-
-        # Also send individual notifications
-        for recipient in notifications:
-            socketio.emit('notification', {
-                'type': 'prayer_request',
-                'title': title,
-                'body': body,
-                'timestamp': datetime.now(timezone.utc).isoformat()
-            }, room=f"user_{str(recipient['user_id'])}")
+        # One room-level emit; the author is in the room too, so tell clients to skip it
+        socketio.emit('notification', {
+            'notification_id': str(notification['_id']),
+            'type': 'prayer_request',
+            'title': title,
+            'body': body,
+            'exclude_user_id': str(prayer['user_id']),
+            'timestamp': timestamp
+        }, room=room)
 
     # In a real implementation, we'd trigger push notifications here
     return True
@@ -213,35 +168,54 @@ def get_user_notifications(user_id, unread_only=False, limit=20):
     if unread_only:
         filters['is_read'] = False
 
-    notifications = mongo.db.notifications.find(filters).sort(
+    receipts = list(mongo.db.notification_receipts.find(filters).sort(
         'created_at', -1
-    ).limit(limit)
+    ).limit(limit))
+
+    # Join the shared notification documents in one query
+    notifications_by_id = {
+        n['_id']: n for n in mongo.db.notifications.find(
+            {'_id': {'$in': [r['notification_id'] for r in receipts]}}
+        )
+    }
 
     result = []
-    for notification in notifications:
+    for receipt in receipts:
+        notification = notifications_by_id.get(receipt['notification_id'])
+        if not notification:
+            continue
+        notification = dict(notification)
         notification['_id'] = str(notification['_id'])
-        notification['user_id'] = str(notification['user_id'])
+        notification['user_id'] = str(receipt['user_id'])
+        notification['is_read'] = receipt['is_read']
+        notification.pop('recipient_count', None)
         if 'related_id' in notification and notification['related_id']:
             notification['related_id'] = str(notification['related_id'])
         result.append(notification)
 
     return result
 
+def get_unread_notification_count(user_id):
+    """Number of unread notifications for a user (from the unread counters)"""
+    return get_unread_summary(user_id)['notifications']
+
 def mark_notification_as_read(notification_id, user_id):
     """Mark a notification as read"""
-    result = mongo.db.notifications.update_one(
-        {'_id': ObjectId(notification_id), 'user_id': ObjectId(user_id)},
+    result = mongo.db.notification_receipts.update_one(
+        {'notification_id': ObjectId(notification_id), 'user_id': ObjectId(user_id)},
         {'$set': {'is_read': True}}
     )
+    notifications_read(user_id, result.modified_count)
 
     return result.modified_count > 0
 
 def mark_all_notifications_as_read(user_id):
     """Mark all notifications as read for a user"""
-    result = mongo.db.notifications.update_many(
+    result = mongo.db.notification_receipts.update_many(
         {'user_id': ObjectId(user_id), 'is_read': False},
         {'$set': {'is_read': True}}
     )
+    notifications_read(user_id)
 
     # Emit notification count update via WebSocket
     socketio.emit('notifications_read', {
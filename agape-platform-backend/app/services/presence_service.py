@@ -0,0 +1,426 @@
+import os
+import socket
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import Counter
+from datetime import datetime, timezone, timedelta
+from pymongo import ReturnDocument
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import urlsplit, urlunsplit
+
+# Socket presence.
+#
+# The socket handlers talk to `presence`, which delegates to a backend chosen
+# by PRESENCE_BACKEND:
+#   memory - one process only (development, single worker)
+#   mongo  - shared through MongoDB, so every worker and host sees the same
+#            users; also supplies the Socket.IO message queue for
+#            cross-worker emits when SOCKETIO_MESSAGE_QUEUE is unset
+
+class PresenceBackend(ABC):
+    """Interface shared by the presence backends"""
+
+    @abstractmethod
+    def connect(self, user_id: str, sid: str, user_info: Dict[str, Any], camp_id: Optional[str] = None) -> bool:
+        """Add a session for a user; returns True if the user was not connected before
+
+        A further session (another tab) keeps the user's current status.
+        `camp_id` routes the offline change if another worker sweeps the session.
+        """
+
+    @abstractmethod
+    def disconnect(self, sid: str) -> Tuple[Optional[str], bool]:
+        """Drop a session; returns (user_id, went_offline), user_id is None for unknown sids"""
+
+    @abstractmethod
+    def set_status(self, user_id: str, status: str) -> bool:
+        """Change a connected user's status; returns False for users not connected"""
+
+    @abstractmethod
+    def user_for_sid(self, sid: str) -> Optional[str]:
+        """User owning a session, or None"""
+
+    @abstractmethod
+    def status_of(self, user_id: str) -> str:
+        """A user's status ('offline' when not connected)"""
+
+    def statuses_of(self, user_ids: List[str]) -> Dict[str, str]:
+        """Status of each given user ('offline' when not connected)"""
+        return {user_id: self.status_of(user_id) for user_id in user_ids}
+
+    @abstractmethod
+    def active_users(self) -> List[Dict[str, Any]]:
+        """Connected users not marked offline, as sent in the `active_users` event (shared; do not mutate)"""
+
+    @abstractmethod
+    def counts(self) -> Dict[str, int]:
+        """Number of connected users per status, plus session total"""
+
+    def set_camp(self, sid: str, camp_id: Optional[str]) -> None:
+        """Record a session's new camp (the user moved camps while connected)"""
+
+    def heartbeat(self) -> List[Tuple[str, Optional[str]]]:
+        """Periodic upkeep; returns (user_id, camp_id) of users that went offline because their worker died"""
+        return []
+
+    def clear_worker(self) -> List[Tuple[str, Optional[str]]]:
+        """Drop sessions a previous run of this worker left behind; returns (user_id, camp_id) of users now offline"""
+        return []
+
+    @classmethod
+    def message_queue(cls, app) -> Optional[str]:
+        """Socket.IO message queue URL that fans emits out to the other workers"""
+        return app.config.get('SOCKETIO_MESSAGE_QUEUE')
+
+class PresenceRegistry(PresenceBackend):
+    """
+    In-process presence
+
+    Every operation is O(1) in the number of connected users: a sid -> user
+    reverse index serves disconnects, per-status counters are kept up to
+    date on each change, and the active-user list is rebuilt only after
+    presence actually changed.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._users: Dict[str, Dict[str, Any]] = {}
+        self._sid_to_user: Dict[str, str] = {}
+        self._status_counts: Counter = Counter()
+        self._snapshot: Optional[List[Dict[str, Any]]] = None
+
+    def connect(self, user_id: str, sid: str, user_info: Dict[str, Any], camp_id: Optional[str] = None) -> bool:
+        with self._lock:
+            self._sid_to_user[sid] = user_id
+            entry = self._users.get(user_id)
+            came_online = entry is None
+            if came_online:
+                entry = self._users[user_id] = {'sessions': set(), 'status': 'online', 'user_info': user_info}
+                self._status_counts['online'] += 1
+            entry['sessions'].add(sid)
+            self._snapshot = None
+            return came_online
+
+    def disconnect(self, sid: str) -> Tuple[Optional[str], bool]:
+        with self._lock:
+            user_id = self._sid_to_user.pop(sid, None)
+            if user_id is None:
+                return None, False
+
+            entry = self._users[user_id]
+            entry['sessions'].discard(sid)
+            if entry['sessions']:
+                return user_id, False
+
+            # Last session gone: the user is offline
+            del self._users[user_id]
+            self._status_counts[entry['status']] -= 1
+            self._snapshot = None
+            return user_id, True
+
+    def set_status(self, user_id: str, status: str) -> bool:
+        with self._lock:
+            entry = self._users.get(user_id)
+            if entry is None:
+                return False
+            if entry['status'] != status:
+                self._move(entry, status)
+                self._snapshot = None
+            return True
+
+    def _move(self, entry: Dict[str, Any], status: str) -> None:
+        self._status_counts[entry['status']] -= 1
+        self._status_counts[status] += 1
+        entry['status'] = status
+
+    def user_for_sid(self, sid: str) -> Optional[str]:
+        return self._sid_to_user.get(sid)
+
+    def status_of(self, user_id: str) -> str:
+        entry = self._users.get(user_id)
+        return entry['status'] if entry else 'offline'
+
+    def active_users(self) -> List[Dict[str, Any]]:
+        snapshot = self._snapshot
+        if snapshot is not None:
+            return snapshot
+
+        with self._lock:
+            if self._snapshot is None:
+                self._snapshot = [
+                    {'user_id': user_id, 'status': entry['status'], 'user_info': entry['user_info']}
+                    for user_id, entry in self._users.items()
+                    if entry['status'] != 'offline'
+                ]
+            return self._snapshot
+
+    def counts(self) -> Dict[str, int]:
+        with self._lock:
+            counts = {status: n for status, n in self._status_counts.items() if n}
+            counts['sessions'] = len(self._sid_to_user)
+            return counts
+
+    def __len__(self) -> int:
+        return len(self._users)
+
+class MongoPresence(PresenceBackend):
+    """
+    Presence shared across workers through MongoDB
+
+    `presence_sessions` holds one document per socket ({_id: sid, user_id,
+    camp_id, worker_id}); `presence` holds one per connected user ({_id: user_id,
+    status, user_info, session_count}). Every change is a single atomic
+    update keyed by _id. Each worker heartbeats into `presence_workers`, and
+    sessions left behind by a worker that stopped heartbeating are swept.
+    """
+
+    def __init__(self, db_getter, snapshot_ttl: float, worker_timeout: int):
+        self._db = db_getter
+        self._snapshot_ttl = snapshot_ttl
+        self._worker_timeout = timedelta(seconds=worker_timeout)
+        self._snapshot: Optional[List[Dict[str, Any]]] = None
+        self._snapshot_at = 0.0
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}"
+
+    def connect(self, user_id: str, sid: str, user_info: Dict[str, Any], camp_id: Optional[str] = None) -> bool:
+        db = self._db()
+        now = datetime.now(timezone.utc)
+        session = db.presence_sessions.update_one(
+            {'_id': sid},
+            {'$setOnInsert': {'user_id': user_id, 'camp_id': camp_id, 'worker_id': self.worker_id,
+                              'connected_at': now}},
+            upsert=True
+        )
+        if session.upserted_id is None:
+            # Re-authentication on a socket that is already counted
+            return False
+
+        before = db.presence.find_one_and_update(
+            {'_id': user_id},
+            {'$inc': {'session_count': 1}, '$set': {'user_info': user_info}, '$setOnInsert': {'status': 'online'}},
+            upsert=True,
+            return_document=ReturnDocument.BEFORE
+        )
+        self._snapshot = None
+        came_online = before is None or before.get('session_count', 0) <= 0
+        if came_online and before is not None:
+            # Revived a document whose last session was just leaving
+            db.presence.update_one({'_id': user_id}, {'$set': {'status': 'online'}})
+        return came_online
+
+    def disconnect(self, sid: str) -> Tuple[Optional[str], bool]:
+        db = self._db()
+        session = db.presence_sessions.find_one_and_delete({'_id': sid})
+        if not session:
+            return None, False
+
+        user_id = session['user_id']
+        after = db.presence.find_one_and_update(
+            {'_id': user_id},
+            {'$inc': {'session_count': -1}},
+            return_document=ReturnDocument.AFTER
+        )
+        self._snapshot = None
+        if after and after['session_count'] > 0:
+            return user_id, False
+
+        # Last session gone; a reconnect on another worker may have raced in
+        result = db.presence.delete_one({'_id': user_id, 'session_count': {'$lte': 0}})
+        return user_id, result.deleted_count > 0
+
+    def set_status(self, user_id: str, status: str) -> bool:
+        result = self._db().presence.update_one({'_id': user_id}, {'$set': {'status': status}})
+        if result.modified_count:
+            self._snapshot = None
+        return result.matched_count > 0
+
+    def user_for_sid(self, sid: str) -> Optional[str]:
+        session = self._db().presence_sessions.find_one({'_id': sid}, {'user_id': 1})
+        return session['user_id'] if session else None
+
+    def status_of(self, user_id: str) -> str:
+        entry = self._db().presence.find_one({'_id': user_id}, {'status': 1})
+        return entry['status'] if entry else 'offline'
+
+    def statuses_of(self, user_ids: List[str]) -> Dict[str, str]:
+        found = {
+            entry['_id']: entry['status']
+            for entry in self._db().presence.find({'_id': {'$in': list(user_ids)}}, {'status': 1})
+        }
+        return {user_id: found.get(user_id, 'offline') for user_id in user_ids}
+
+    def active_users(self) -> List[Dict[str, Any]]:
+        # Other workers change presence too, so the snapshot is only reused briefly
+        snapshot = self._snapshot
+        if snapshot is not None and time.monotonic() - self._snapshot_at < self._snapshot_ttl:
+            return snapshot
+
+        snapshot = [
+            {'user_id': entry['_id'], 'status': entry['status'], 'user_info': entry.get('user_info')}
+            for entry in self._db().presence.find({'status': {'$ne': 'offline'}})
+        ]
+        self._snapshot, self._snapshot_at = snapshot, time.monotonic()
+        return snapshot
+
+    def counts(self) -> Dict[str, int]:
+        db = self._db()
+        counts = {
+            row['_id']: row['count'] for row in db.presence.aggregate([
+                {'$group': {'_id': '$status', 'count': {'$sum': 1}}}
+            ])
+        }
+        counts['sessions'] = db.presence_sessions.estimated_document_count()
+        return counts
+
+    def set_camp(self, sid: str, camp_id: Optional[str]) -> None:
+        self._db().presence_sessions.update_one({'_id': sid}, {'$set': {'camp_id': camp_id}})
+
+    def heartbeat(self) -> List[Tuple[str, Optional[str]]]:
+        db = self._db()
+        now = datetime.now(timezone.utc)
+        db.presence_workers.update_one(
+            {'_id': self.worker_id}, {'$set': {'heartbeat_at': now}}, upsert=True
+        )
+
+        went_offline = []
+        dead_workers = [w['_id'] for w in db.presence_workers.find(
+            {'heartbeat_at': {'$lt': now - self._worker_timeout}}, {'_id': 1}
+        )]
+        for worker_id in dead_workers:
+            went_offline.extend(self._sweep(worker_id))
+            db.presence_workers.delete_one({'_id': worker_id})
+        return went_offline
+
+    def clear_worker(self) -> List[Tuple[str, Optional[str]]]:
+        # A restarted container can come back with the same hostname and pid
+        return self._sweep(self.worker_id)
+
+    def _sweep(self, worker_id: str) -> List[Tuple[str, Optional[str]]]:
+        # The session document keeps the camp, for routing the offline change
+        went_offline = []
+        for session in self._db().presence_sessions.find({'worker_id': worker_id}, {'_id': 1, 'camp_id': 1}):
+            user_id, offline = self.disconnect(session['_id'])
+            if offline:
+                went_offline.append((user_id, session.get('camp_id')))
+        return went_offline
+
+    @classmethod
+    def message_queue(cls, app) -> Optional[str]:
+        # Shared presence is pointless if emits stay on the worker that made them,
+        # so default to a queue on the same MongoDB server (needs kombu). It gets
+        # its own database: kombu's `messages` collection would clash with ours.
+        queue = super().message_queue(app)
+        if queue or not app.config.get('MONGODB_URI'):
+            return queue
+        parts = urlsplit(app.config['MONGODB_URI'])
+        database = parts.path.strip('/') or 'agape'
+        return urlunsplit(parts._replace(path=f"/{database}_socketio"))
+
+class Presence:
+    """
+    Flask extension holding the configured presence backend
+
+    Initialised with init_app like the other extensions; attribute access is
+    delegated to the backend.
+    """
+
+    def __init__(self):
+        self.backend: PresenceBackend = PresenceRegistry()
+
+    def init_app(self, app) -> None:
+        kind = app.config.get('PRESENCE_BACKEND', 'memory')
+        if kind == 'memory':
+            self.backend = PresenceRegistry()
+        elif kind == 'mongo':
+            from app import mongo
+            self.backend = MongoPresence(
+                lambda: mongo.db,
+                snapshot_ttl=app.config.get('PRESENCE_SNAPSHOT_TTL', 2.0),
+                worker_timeout=app.config.get('PRESENCE_WORKER_TIMEOUT', 90)
+            )
+        else:
+            raise ValueError(f"Unknown PRESENCE_BACKEND '{kind}' (use 'memory' or 'mongo')")
+
+        # Read by configure_socket and by the services that change behaviour across workers
+        app.config['SOCKETIO_MESSAGE_QUEUE'] = self.backend.message_queue(app)
+
+    def __getattr__(self, name):
+        return getattr(self.backend, name)
+
+class PresenceBroadcaster:
+    """
+    Coalesces presence changes into one `user_status_batch` per room per window
+
+    A reconnect wave would otherwise send one `user_status_change` frame to
+    every socket per user. Changes are collected for PRESENCE_BROADCAST_WINDOW
+    seconds; only each user's latest status in the window is sent, to the
+    ministry room or (with PRESENCE_BROADCAST_SCOPE=camp) the user's camp room.
+    PRESENCE_LEGACY_STATUS_EVENTS=true sends the old per-change
+    `user_status_change` broadcast instead.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._pending: Dict[str, Dict[str, str]] = {}
+        self._socketio = None
+        self._running = False
+        self.window = 0.25
+        self.scope = 'ministry'
+        self.legacy = False
+
+    def init_app(self, app, socketio) -> None:
+        self._socketio = socketio
+        self.window = app.config.get('PRESENCE_BROADCAST_WINDOW', 0.25)
+        self.scope = app.config.get('PRESENCE_BROADCAST_SCOPE', 'ministry')
+        self.legacy = app.config.get('PRESENCE_LEGACY_STATUS_EVENTS', False)
+
+    def room_for(self, camp_id: Optional[Any]) -> str:
+        """Room that receives a user's presence changes"""
+        if self.scope == 'camp' and camp_id:
+            return f"camp_{str(camp_id)}"
+        return 'ministry'
+
+    def publish(self, user_id: str, status: str, room: str) -> None:
+        """Queue a status change for `room` (see room_for)"""
+        if self.legacy:
+            self._socketio.emit('user_status_change', {'user_id': user_id, 'status': status})
+            return
+
+        with self._lock:
+            # Later changes in the same window replace earlier ones
+            self._pending.setdefault(room, {})[user_id] = status
+
+            if not self._running:
+                self._running = True
+                self._socketio.start_background_task(self._flush_loop)
+
+    def flush(self) -> int:
+        """Emit the pending batches now; returns the number of frames sent"""
+        with self._lock:
+            pending, self._pending = self._pending, {}
+
+        timestamp = datetime.now(timezone.utc).isoformat()
+        for room, changes in pending.items():
+            self._socketio.emit('user_status_batch', {
+                'changes': [{'user_id': user_id, 'status': status} for user_id, status in changes.items()],
+                'timestamp': timestamp
+            }, room=room)
+        return len(pending)
+
+    def _flush_loop(self) -> None:
+        while True:
+            self._socketio.sleep(self.window)
+            try:
+                self.flush()
+            except Exception as e:
+                print(f"Presence broadcast error: {str(e)}")
+            with self._lock:
+                # Stop when idle; the next publish starts a new loop
+                if not self._pending:
+                    self._running = False
+                    return
+
+# Process-wide presence state and broadcaster used by the socket handlers
+presence = Presence()
+presence_broadcaster = PresenceBroadcaster()
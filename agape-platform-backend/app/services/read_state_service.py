@@ -0,0 +1,237 @@
+from app import mongo
+from bson import ObjectId
+from datetime import datetime, timezone
+from pymongo import ReturnDocument
+from pymongo.errors import BulkWriteError, DuplicateKeyError
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+from app.config import app_config
+from app.services.conversation_service import conversation_of
+from app.services.unread_service import messages_read
+
+# Read state for messages.
+#
+# Instead of a read_by array on every message, each user has one read_state
+# document per conversation holding a watermark: everything in the
+# conversation created at or before `last_read_at` is read. A message read
+# out of order above the watermark (opening a single message) gets a sparse
+# message_receipts row, dropped once the watermark passes it. Messages carry
+# a read_count counter, bumped once per reader, so list responses need only
+# is_read and read_count however large the audience is.
+
+# Most message ids accepted by one bulk read
+READ_BATCH_MAX = 500
+
+def _utc(value: datetime) -> datetime:
+    # Dates read back from MongoDB are naive UTC
+    return value if value.tzinfo else value.replace(tzinfo=timezone.utc)
+
+def get_watermark(user_id: Any, conversation: str) -> Optional[datetime]:
+    state = mongo.db.read_state.find_one(
+        {'user_id': ObjectId(user_id), 'conversation': conversation}, {'last_read_at': 1}
+    )
+    return _utc(state['last_read_at']) if state and state.get('last_read_at') else None
+
+def advance_watermark(user_id: Any, conversation: str, upto: datetime) -> int:
+    """
+    Mark everything in a conversation up to `upto` as read
+
+    Returns the number of messages that became read. Concurrent calls for
+    the same user see disjoint ranges, so no message is counted twice.
+    """
+    user = ObjectId(user_id)
+    before = mongo.db.read_state.find_one_and_update(
+        {'user_id': user, 'conversation': conversation},
+        {'$max': {'last_read_at': upto}, '$set': {'updated_at': datetime.now(timezone.utc)}},
+        projection={'last_read_at': 1},
+        upsert=True,
+        return_document=ReturnDocument.BEFORE
+    )
+    previous = _utc(before['last_read_at']) if before and before.get('last_read_at') else None
+    if previous and previous >= _utc(upto):
+        return 0
+
+    window: Dict[str, Any] = {'$lte': upto}
+    if previous:
+        window['$gt'] = previous
+
+    # Messages already receipted were counted when they were opened; deleted
+    # messages left the unread counts when they were deleted
+    receipted = [r['message_id'] for r in mongo.db.message_receipts.find(
+        {'user_id': user, 'conversation': conversation, 'created_at': window}, {'message_id': 1}
+    )]
+    result = mongo.db.messages.update_many(
+        {'conversation': conversation, 'created_at': window, 'sender_id': {'$ne': user},
+         'is_deleted': False, '_id': {'$nin': receipted}},
+        {'$inc': {'read_count': 1}}
+    )
+    if receipted:
+        mongo.db.message_receipts.delete_many({'user_id': user, 'message_id': {'$in': receipted}})
+    messages_read(user, conversation, result.modified_count)
+    return result.modified_count
+
+def mark_message_read(user_id: Any, message: Dict[str, Any]) -> bool:
+    """Mark one message read; returns True if it was unread"""
+    user = ObjectId(user_id)
+    if message['sender_id'] == user or message.get('is_deleted'):
+        return False
+
+    conversation = conversation_of(message)
+    if not app_config.MESSAGE_READ_RECEIPTS:
+        # Without receipts, opening a message reads everything up to it
+        return advance_watermark(user, conversation, message['created_at']) > 0
+
+    watermark = get_watermark(user, conversation)
+    if watermark and _utc(message['created_at']) <= watermark:
+        return False
+
+    try:
+        mongo.db.message_receipts.insert_one({
+            'message_id': message['_id'],
+            'user_id': user,
+            'conversation': conversation,
+            'created_at': message['created_at'],
+            'read_at': datetime.now(timezone.utc)
+        })
+    except DuplicateKeyError:
+        return False
+    mongo.db.messages.update_one({'_id': message['_id']}, {'$inc': {'read_count': 1}})
+    messages_read(user, conversation, 1)
+    return True
+
+def parse_read_request(data: Dict[str, Any]) -> Tuple[str, Optional[datetime], Optional[List[ObjectId]]]:
+    """
+    (conversation, upto, message_ids) from a bulk read request body
+
+    Exactly one of `upto` (ISO timestamp) and `message_ids` must be given;
+    raises ValueError with a client-facing message otherwise.
+    """
+    conversation = data.get('conversation')
+    if not conversation or not isinstance(conversation, str):
+        raise ValueError('conversation is required')
+
+    upto, message_ids = data.get('upto'), data.get('message_ids')
+    if (upto is None) == (message_ids is None):
+        raise ValueError('Provide either upto or message_ids')
+
+    if upto is not None:
+        try:
+            parsed = datetime.fromisoformat(str(upto))
+        except ValueError:
+            raise ValueError('upto must be an ISO 8601 timestamp')
+        return conversation, _utc(parsed), None
+
+    if not isinstance(message_ids, list) or not message_ids:
+        raise ValueError('message_ids must be a non-empty list')
+    if len(message_ids) > READ_BATCH_MAX:
+        raise ValueError(f'At most {READ_BATCH_MAX} message_ids per request')
+    if not all(ObjectId.is_valid(message_id) for message_id in message_ids):
+        raise ValueError('Invalid message id')
+    return conversation, None, [ObjectId(message_id) for message_id in message_ids]
+
+def mark_conversation_read(user_id: Any, conversation: str, upto: Optional[datetime] = None,
+                           message_ids: Optional[List[ObjectId]] = None) -> Dict[str, Any]:
+    """
+    Mark many messages of one conversation read in a single write
+
+    With `upto` the user's watermark moves there (never past now). With
+    `message_ids` those messages get receipts, or with receipts disabled the
+    watermark moves to the newest of them. Returns the newly read count, the
+    watermark and, for ids, which of them became read.
+    """
+    user = ObjectId(user_id)
+    newly_read: List[ObjectId] = []
+
+    if message_ids is not None:
+        messages = list(mongo.db.messages.find(
+            {'_id': {'$in': message_ids}, 'conversation': conversation, 'sender_id': {'$ne': user},
+             'is_deleted': False},
+            {'created_at': 1}
+        ))
+        if messages and not app_config.MESSAGE_READ_RECEIPTS:
+            upto = max(_utc(m['created_at']) for m in messages)
+        elif messages:
+            watermark = get_watermark(user, conversation)
+            above = [m for m in messages if not watermark or _utc(m['created_at']) > watermark]
+            newly_read = _insert_receipts(user, conversation, above)
+            if newly_read:
+                mongo.db.messages.update_many({'_id': {'$in': newly_read}}, {'$inc': {'read_count': 1}})
+                messages_read(user, conversation, len(newly_read))
+            return {
+                'count': len(newly_read),
+                'last_read_at': watermark,
+                'message_ids': [str(message_id) for message_id in newly_read]
+            }
+
+    count = 0
+    if upto is not None:
+        count = advance_watermark(user, conversation, min(_utc(upto), datetime.now(timezone.utc)))
+    return {'count': count, 'last_read_at': get_watermark(user, conversation), 'message_ids': []}
+
+def messages_read_payload(user_id: Any, conversation: str, result: Dict[str, Any]) -> Dict[str, Any]:
+    """Body of the messages_read event sent to the rest of the conversation"""
+    last_read_at = result['last_read_at']
+    return {
+        'conversation': conversation,
+        'user_id': str(user_id),
+        'count': result['count'],
+        'last_read_at': last_read_at.isoformat() if last_read_at else None,
+        'message_ids': result['message_ids'],
+        'timestamp': datetime.now(timezone.utc).isoformat()
+    }
+
+def _insert_receipts(user: ObjectId, conversation: str, messages: List[Dict[str, Any]]) -> List[ObjectId]:
+    # Returns the ids that were not receipted before
+    if not messages:
+        return []
+    now = datetime.now(timezone.utc)
+    receipts = [{
+        'message_id': m['_id'],
+        'user_id': user,
+        'conversation': conversation,
+        'created_at': m['created_at'],
+        'read_at': now
+    } for m in messages]
+    try:
+        mongo.db.message_receipts.insert_many(receipts, ordered=False)
+        return [m['_id'] for m in messages]
+    except BulkWriteError as e:
+        duplicates = {err['index'] for err in e.details.get('writeErrors', []) if err.get('code') == 11000}
+        if len(duplicates) < len(e.details.get('writeErrors', [])):
+            raise
+        return [m['_id'] for i, m in enumerate(messages) if i not in duplicates]
+
+def read_flags(user_id: Any, messages: Iterable[Dict[str, Any]]) -> Dict[Any, bool]:
+    """
+    is_read for a page of messages, keyed by message _id
+
+    Two queries for the whole page: the user's watermarks for the page's
+    conversations, then receipts for messages above them.
+    """
+    user = ObjectId(user_id)
+    messages = list(messages)
+    conversations = {conversation_of(m) for m in messages}
+    watermarks = {
+        state['conversation']: _utc(state['last_read_at'])
+        for state in mongo.db.read_state.find(
+            {'user_id': user, 'conversation': {'$in': list(conversations)}},
+            {'conversation': 1, 'last_read_at': 1}
+        ) if state.get('last_read_at')
+    }
+
+    flags: Dict[Any, bool] = {}
+    above = []
+    for message in messages:
+        watermark = watermarks.get(conversation_of(message))
+        if message['sender_id'] == user or (watermark and _utc(message['created_at']) <= watermark):
+            flags[message['_id']] = True
+        else:
+            above.append(message['_id'])
+
+    receipted = set()
+    if above:
+        receipted = {r['message_id'] for r in mongo.db.message_receipts.find(
+            {'user_id': user, 'message_id': {'$in': above}}, {'message_id': 1}
+        )}
+    for message_id in above:
+        flags[message_id] = message_id in receipted
+    return flags
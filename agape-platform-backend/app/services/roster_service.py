@@ -0,0 +1,196 @@
+import threading
+from bson import ObjectId
+from datetime import datetime, timezone
+from pymongo import ReturnDocument
+from app import mongo
+from typing import Any, Dict, List, Optional
+from app.services.attendance_service import attendance
+from app.services.presence_service import presence
+from app.services.hydration_service import get_users_by_ids
+from app.utils.pagination import encode_cursor, decode_cursor
+
+# Live meeting rosters.
+#
+# Who is in a meeting right now comes from the attendance tracker's room
+# membership (in memory; with several socket workers, the shared roster it
+# caches for ATTENDANCE_ROSTER_TTL) and each person's status from the
+# presence registry, so a snapshot reads no meeting or attendance documents.
+# Clients page through a snapshot once, then follow `roster_delta` events:
+# joins and leaves are collected for ROSTER_DELTA_WINDOW seconds and sent to
+# the meeting room as one frame carrying a per-meeting version number. With
+# several workers the version is the meeting document's roster_version, so
+# every worker's deltas share one sequence; a single worker counts in memory.
+
+ROSTER_PAGE_MAX = 500
+EPOCH = datetime.min.replace(tzinfo=timezone.utc)
+
+def _aware(value: Optional[datetime]) -> datetime:
+    # Dates read back from MongoDB are naive UTC
+    if value is None:
+        return EPOCH
+    return value if value.tzinfo else value.replace(tzinfo=timezone.utc)
+
+class MeetingRoster:
+    def __init__(self):
+        self._lock = threading.Lock()
+        # meeting_id -> user_id -> 'joined' | 'left' (latest change in the window)
+        self._pending: Dict[str, Dict[str, str]] = {}
+        self._versions: Dict[str, int] = {}
+        self._socketio = None
+        self._running = False
+        self.window = 0.5
+        self.page_size = 100
+        self.shared = False
+
+    def init_app(self, app, socketio) -> None:
+        self._socketio = socketio
+        self.window = app.config.get('ROSTER_DELTA_WINDOW', 0.5)
+        self.page_size = app.config.get('ROSTER_PAGE_SIZE', 100)
+        # With several workers each one only holds its own sockets' membership
+        self.shared = bool(app.config.get('SOCKETIO_MESSAGE_QUEUE'))
+
+    def _entries(self, meeting_id: str) -> List[Dict[str, Any]]:
+        entries = attendance.roster(meeting_id) if self.shared else attendance.participants(meeting_id)
+        entries = [{'user_id': e['user_id'], 'joined_at': _aware(e['joined_at'])} for e in entries]
+        return sorted(entries, key=lambda e: (e['joined_at'], e['user_id']))
+
+    def snapshot(self, meeting_id: str, cursor: Optional[str] = None, limit: Optional[int] = None) -> Dict[str, Any]:
+        """
+        One page of the roster, in join order
+
+        `cursor` is the next_cursor of the previous page and `limit` a page
+        size of 1..ROSTER_PAGE_MAX; raises ValueError when either is invalid.
+        Apply roster_delta frames with a higher version on top of the snapshot.
+        """
+        limit = self._limit(limit)
+        # Version before entries: a change made in between arrives with a higher version
+        version = self._version(meeting_id)
+        entries = self._entries(meeting_id)
+
+        remaining = entries
+        if cursor:
+            joined_at, user_id = decode_cursor(cursor)
+            after = (_aware(joined_at), str(user_id))
+            remaining = [e for e in entries if (e['joined_at'], e['user_id']) > after]
+
+        page = remaining[:limit]
+        has_more = len(remaining) > limit
+        next_cursor = encode_cursor({'joined_at': page[-1]['joined_at'], '_id': page[-1]['user_id']}, 'joined_at') \
+            if has_more and page else None
+
+        return {
+            'meeting_id': meeting_id,
+            'count': len(entries),
+            'version': version,
+            'participants': self._render(page),
+            'next_cursor': next_cursor,
+            'has_more': has_more
+        }
+
+    def _version(self, meeting_id: str) -> int:
+        if not self.shared:
+            return self._versions.get(meeting_id, 0)
+        meeting = mongo.db.meetings.find_one({'_id': ObjectId(meeting_id)}, {'roster_version': 1})
+        return (meeting or {}).get('roster_version', 0)
+
+    def _next_version(self, meeting_id: str) -> int:
+        if not self.shared:
+            with self._lock:
+                version = self._versions[meeting_id] = self._versions.get(meeting_id, 0) + 1
+            return version
+        meeting = mongo.db.meetings.find_one_and_update(
+            {'_id': ObjectId(meeting_id)}, {'$inc': {'roster_version': 1}},
+            projection={'roster_version': 1}, return_document=ReturnDocument.AFTER
+        )
+        return meeting['roster_version'] if meeting else 0
+
+    def _limit(self, limit: Any) -> int:
+        if limit is None or limit == '':
+            return self.page_size
+        try:
+            limit = int(limit)
+        except (TypeError, ValueError):
+            raise ValueError('limit must be a number')
+        if not 1 <= limit <= ROSTER_PAGE_MAX:
+            raise ValueError(f'limit must be between 1 and {ROSTER_PAGE_MAX}')
+        return limit
+
+    def _render(self, entries: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        user_ids = [entry['user_id'] for entry in entries]
+        cards = get_users_by_ids(user_ids)
+        statuses = presence.statuses_of(user_ids)
+        participants = []
+        for entry in entries:
+            card = cards.get(entry['user_id'], {})
+            joined_at = entry['joined_at']
+            participants.append({
+                'user_id': entry['user_id'],
+                'name': f"{card.get('first_name', '')} {card.get('last_name', '')}".strip(),
+                'profile_image': card.get('profile_image'),
+                'status': statuses.get(entry['user_id'], 'offline'),
+                'joined_at': joined_at.isoformat() if joined_at != EPOCH else None
+            })
+        return participants
+
+    def joined(self, meeting_id: str, user_id: str) -> None:
+        self._publish(meeting_id, user_id, 'joined')
+
+    def left(self, meeting_id: str, user_id: str) -> None:
+        self._publish(meeting_id, user_id, 'left')
+
+    def forget(self, meeting_id: str) -> None:
+        """Drop an ended meeting's pending changes and version"""
+        with self._lock:
+            self._pending.pop(meeting_id, None)
+            self._versions.pop(meeting_id, None)
+
+    def _publish(self, meeting_id: str, user_id: str, change: str) -> None:
+        with self._lock:
+            # Later changes in the same window replace earlier ones
+            self._pending.setdefault(meeting_id, {})[user_id] = change
+            if not self._running and self._socketio is not None:
+                self._running = True
+                self._socketio.start_background_task(self._flush_loop)
+
+    def flush(self) -> int:
+        """Emit one roster_delta per meeting with pending changes; returns the number sent"""
+        with self._lock:
+            pending, self._pending = self._pending, {}
+
+        timestamp = datetime.now(timezone.utc).isoformat()
+        for meeting_id, changes in pending.items():
+            # Changes are published by the worker holding the socket, so joiners are local
+            local = {e['user_id']: e for e in attendance.participants(meeting_id)}
+            joined = [
+                {'user_id': user_id, 'joined_at': _aware(local[user_id]['joined_at'])}
+                for user_id, change in changes.items() if change == 'joined' and user_id in local
+            ]
+            delta = {
+                'meeting_id': meeting_id,
+                'version': self._next_version(meeting_id),
+                'joined': self._render(joined),
+                'left': [user_id for user_id, change in changes.items() if change == 'left'],
+                'timestamp': timestamp
+            }
+            if not self.shared:
+                # Same in-memory membership as the delta. With several workers
+                # the shared roster lags the delta, so clients count for themselves
+                delta['count'] = len(local)
+            self._socketio.emit('roster_delta', delta, room=f"meeting_{meeting_id}")
+        return len(pending)
+
+    def _flush_loop(self) -> None:
+        while True:
+            self._socketio.sleep(self.window)
+            try:
+                self.flush()
+            except Exception as e:
+                print(f"Roster broadcast error: {str(e)}")
+            with self._lock:
+                # Stop when idle; the next change starts a new loop
+                if not self._pending:
+                    self._running = False
+                    return
+
+# Process-wide roster broadcaster used by the meeting handlers
+meeting_roster = MeetingRoster()
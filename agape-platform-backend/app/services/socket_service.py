@@ -1,4 +1,4 @@
-from flask_socketio import SocketIO, emit, join_room, leave_room
+from flask_socketio import SocketIO, emit, join_room, leave_room, rooms
 from flask_jwt_extended import decode_token
 from flask import request
 from app import mongo
@@ -6,21 +6,102 @@ from bson import ObjectId
 import json
 from datetime import datetime, timezone
 from app.utils.helpers import serialize_document
-from typing import Any, Optional
+from app.utils import fast_json
+from app.services.socket_session import socket_sessions, SESSION_PROJECTION
+from app.services.presence_service import presence, presence_broadcaster
+from app.services.socket_throttle import rate_limiter, typing_indicators, read_counts
+from app.services.meeting_chat_buffer import meeting_chat_buffer
+from app.services.meeting_chat_service import new_meeting_message
+from app.services.attendance_service import attendance
+from app.services.roster_service import meeting_roster
+from app.services.meeting_chat_history import recent_meeting_chat, render_meeting_message
+from app.services.conversation_service import new_message_doc, can_read_conversation, record_message
+from app.services.delivery_service import chat_room as chat_room_name, message_rooms, participant_rooms, conversation_rooms
+from app.services.unread_service import message_sent, get_unread_summary
+from app.services.read_state_service import parse_read_request, mark_conversation_read, messages_read_payload
+from typing import Any, Dict, List, Optional, Union
 
 # Initialize SocketIO
 socketio = SocketIO()
 
-def emit_to_room(event: str, data: Any, room: str, include_self: Optional[bool] = None) -> None:
+def emit_to_room(event: str, data: Any, room: Union[str, List[str]], include_self: Optional[bool] = None) -> None:
     """Wrapper for socketio.emit with proper type hints for room parameter."""
     socketio.emit(event, data, room=room, include_self=include_self)  # type: ignore
 
-# Store active users
-active_users = {}
+def emit_to_rooms(event: str, data: Any, rooms: List[str]) -> None:
+    """Emit once to a set of rooms; each socket in any of them gets exactly one frame"""
+    if rooms:
+        # include_self=True: the sender's own sockets are targets too, and
+        # outside a socket handler there is no request.sid to skip
+        emit_to_room(event, data, room=rooms[0] if len(rooms) == 1 else rooms, include_self=True)
+
+def publish_messages_read(user_id: str, conversation: str, payload: Dict[str, Any]) -> None:
+    """
+    Tell clients about a read
+
+    In a direct conversation both participants get the messages_read frame.
+    Camp and ministry audiences are too large for a frame per reader: the
+    reader's own devices get it, everyone else a coalesced read_counts frame.
+    """
+    rooms = conversation_rooms(conversation)
+    if conversation.startswith('dm:'):
+        emit_to_rooms('messages_read', payload, rooms)
+        return
+    emit_to_rooms('messages_read', payload, [f"user_{user_id}"])
+    read_counts.publish(conversation, rooms, payload)
+
+def _broadcast_offline(swept) -> None:
+    for user_id, camp_id in swept:
+        presence_broadcaster.publish(user_id, 'offline', presence_broadcaster.room_for(camp_id))
+
+def _presence_heartbeat_loop(app) -> None:
+    with app.app_context():
+        try:
+            _broadcast_offline(presence.clear_worker())
+        except Exception as e:
+            print(f"Presence cleanup error: {str(e)}")
+        while True:
+            try:
+                _broadcast_offline(presence.heartbeat())
+            except Exception as e:
+                print(f"Presence heartbeat error: {str(e)}")
+            socketio.sleep(app.config['PRESENCE_HEARTBEAT_INTERVAL'])
+
+def start_presence_heartbeat(app) -> bool:
+    """Start the presence upkeep task for shared backends; returns True if started"""
+    from app.utils.helpers import running_under_cli
+
+    if running_under_cli() or app.config.get('PRESENCE_BACKEND', 'memory') == 'memory':
+        return False
+    socketio.start_background_task(_presence_heartbeat_loop, app)
+    return True
+
+def current_session():
+    """Session of the calling socket; emits an error and returns None if it has not authenticated"""
+    session = socket_sessions.get(request.sid)
+    if session is None:
+        emit('error', {'message': 'Not authenticated'})
+    return session
 
 def configure_socket(app):
     """Configure socket events and initialize with app"""
-    socketio.init_app(app, cors_allowed_origins="*")
+    # The presence backend settles the message queue (PRESENCE_BACKEND=mongo brings one)
+    presence.init_app(app)
+
+    # With a message queue, emits from any worker reach clients connected to every worker
+    options = {'message_queue': app.config.get('SOCKETIO_MESSAGE_QUEUE')}
+    if app.config.get('SOCKETIO_FAST_JSON', True):
+        # Packets are encoded once per emit; make that encode cheap (orjson when installed)
+        options['json'] = fast_json
+    socketio.init_app(app, cors_allowed_origins="*", **options)
+    presence_broadcaster.init_app(app, socketio)
+    rate_limiter.init_app(app)
+    typing_indicators.init_app(app, socketio)
+    read_counts.init_app(app, socketio)
+    meeting_chat_buffer.init_app(app, socketio)
+    recent_meeting_chat.init_app(app)
+    attendance.init_app(app, socketio)
+    meeting_roster.init_app(app, socketio)
 
     @socketio.on('connect')
     def handle_connect():
@@ -32,22 +113,26 @@ def configure_socket(app):
         """Handle client disconnection"""
         sid = request.sid
 
-        # Remove user from active users
-        user_id = None
-        for uid, session_data in active_users.items():
-            if sid in session_data['sessions']:
-                user_id = uid
-                session_data['sessions'].remove(sid)
-
-                # If no more sessions, mark user as offline
-                if not session_data['sessions']:
-                    session_data['status'] = 'offline'
-                    # Broadcast user status change
-                    emit('user_status_change', {
-                        'user_id': user_id,
-                        'status': 'offline'
-                    }, broadcast=True)
-                break
+        # Remove the session; the reverse index finds its user directly
+        user_id, went_offline = presence.disconnect(sid)
+        rate_limiter.forget(sid)
+        session = socket_sessions.close(sid)
+
+        # Meetings this socket was the user's last one in
+        for meeting_id, left_user_id in attendance.disconnect(sid):
+            meeting_roster.left(meeting_id, left_user_id)
+            emit_to_room('user_left_meeting', {
+                'user_id': left_user_id,
+                'meeting_id': meeting_id,
+                'timestamp': datetime.now(timezone.utc).isoformat()
+            }, room=f"meeting_{meeting_id}")
+
+        # If no more sessions, the user is offline
+        if went_offline:
+            typing_indicators.emit_stopped(typing_indicators.stop(user_id))
+            # Queue the status change for the next presence batch
+            camp_id = session['camp_id'] if session else None
+            presence_broadcaster.publish(user_id, 'offline', presence_broadcaster.room_for(camp_id))
 
         print(f"Client disconnected: {sid}, User: {user_id}")
 
@@ -65,11 +150,14 @@ def configure_socket(app):
             user_id = decoded_token['sub']  # Subject is the user ID
 
             # Get user info
-            user = mongo.db.users.find_one({'_id': ObjectId(user_id)})
+            user = mongo.db.users.find_one({'_id': ObjectId(user_id)}, SESSION_PROJECTION)
             if not user:
                 emit('authentication_error', {'message': 'User not found'})
                 return
 
+            # Later events on this socket use the verified identity held here
+            socket_sessions.open(request.sid, user)
+
             # Join user to their personal room
             join_room(f"user_{user_id}")
 
@@ -81,39 +169,29 @@ def configure_socket(app):
             # Join ministry-wide room
             join_room("ministry")
 
-            # Store user in active users
-            if user_id in active_users:
-                active_users[user_id]['sessions'].add(request.sid)
-                active_users[user_id]['status'] = 'online'
-            else:
-                active_users[user_id] = {
-                    'sessions': {request.sid},
-                    'status': 'online',
-                    'user_info': {
-                        'id': user_id,
-                        'name': f"{user['first_name']} {user['last_name']}",
-                        'role': user.get('role', 'member'),
-                        'profile_image': user.get('profile_image')
-                    }
-                }
-
-            # Get unread notifications count
-            unread_count = mongo.db.notifications.count_documents({
-                'user_id': ObjectId(user_id),
-                'is_read': False
-            })
+            # Register the session in the presence registry
+            came_online = presence.connect(user_id, request.sid, {
+                'id': user_id,
+                'name': f"{user['first_name']} {user['last_name']}",
+                'role': user.get('role', 'member'),
+                'profile_image': user.get('profile_image')
+            }, camp_id=str(user['camp_id']) if user.get('camp_id') else None)
 
-            # Broadcast user status change to others
-            emit('user_status_change', {
-                'user_id': user_id,
-                'status': 'online'
-            }, broadcast=True, include_self=False)
+            # Badge counts: one lookup of the user's unread counters
+            unread = get_unread_summary(user_id)
+
+            # Queue the status change for the next presence batch (extra tabs are not news)
+            if came_online:
+                presence_broadcaster.publish(user_id, 'online', presence_broadcaster.room_for(user.get('camp_id')))
 
             # Emit success event to the user
             emit('authenticated', {
                 'user_id': user_id,
-                'status': 'online',
-                'unread_notifications': unread_count
+                # An extra tab keeps an away/busy status
+                'status': 'online' if came_online else presence.status_of(user_id),
+                'unread_notifications': unread['notifications'],
+                'unread_messages': unread['messages'],
+                'unread_conversations': unread['conversations']
             })
 
             print(f"User authenticated: {user_id}")
@@ -125,115 +203,148 @@ def configure_socket(app):
     @socketio.on('join_meeting')
     def handle_join_meeting(data):
         """Join a meeting room"""
+        session = current_session()
+        if not session:
+            return
         meeting_id = data.get('meeting_id')
-        user_id = data.get('user_id')
+        user_id = session['user_id']
+
+        if not meeting_id:
+            emit('error', {'message': 'Meeting ID required'})
+            return
 
-        if not meeting_id or not user_id:
-            emit('error', {'message': 'Meeting ID and User ID required'})
+        # Attendance is keyed by the meeting id; only real meetings get one
+        if not ObjectId.is_valid(meeting_id) or not mongo.db.meetings.find_one({'_id': ObjectId(meeting_id)}, {'_id': 1}):
+            emit('error', {'message': 'Meeting not found'})
             return
 
         # Join the meeting room
         meeting_room = f"meeting_{meeting_id}"
         join_room(meeting_room)
 
-        # Update meeting attendees in database
-        mongo.db.meetings.update_one(
-            {'_id': ObjectId(meeting_id)},
-            {'$addToSet': {'attendees': ObjectId(user_id)}}
-        )
+        # Attendance is recorded in memory and written in batches
+        first_join = attendance.join(meeting_id, user_id, request.sid)
 
-        # Get user info to broadcast to meeting participants
-        user = mongo.db.users.find_one(
-            {'_id': ObjectId(user_id)},
-            {'first_name': 1, 'last_name': 1, 'profile_image': 1}
-        )
+        # User info from the socket session
+        user = session['card']
 
-        # Notify other meeting participants
-        emit_to_room('user_joined_meeting', {
-            'user_id': user_id,
-            'meeting_id': meeting_id,
-            'user_name': f"{user['first_name']} {user['last_name']}",
-            'profile_image': user.get('profile_image'),
-            'timestamp': datetime.now(timezone.utc).isoformat()
-        }, room=meeting_room, include_self=False)
+        # Notify other meeting participants (another tab of someone present is not news)
+        if first_join:
+            meeting_roster.joined(meeting_id, user_id)
+            emit_to_room('user_joined_meeting', {
+                'user_id': user_id,
+                'meeting_id': meeting_id,
+                'user_name': f"{user['first_name']} {user['last_name']}",
+                'profile_image': user.get('profile_image'),
+                'timestamp': datetime.now(timezone.utc).isoformat()
+            }, room=meeting_room, include_self=False)
 
         print(f"User {user_id} joined meeting {meeting_id}")
 
+        # Ack with recent chat from memory; None means page it over REST
+        return {'meeting_id': meeting_id, 'recent_messages': recent_meeting_chat.recent(meeting_id)}
+
     @socketio.on('leave_meeting')
     def handle_leave_meeting(data):
         """Leave a meeting room"""
+        session = current_session()
+        if not session:
+            return
         meeting_id = data.get('meeting_id')
-        user_id = data.get('user_id')
+        user_id = session['user_id']
 
-        if not meeting_id or not user_id:
-            emit('error', {'message': 'Meeting ID and User ID required'})
+        if not meeting_id:
+            emit('error', {'message': 'Meeting ID required'})
             return
 
         # Leave the meeting room
         meeting_room = f"meeting_{meeting_id}"
         leave_room(meeting_room)
 
-        # Notify other meeting participants
-        emit_to_room('user_left_meeting', {
-            'user_id': user_id,
-            'meeting_id': meeting_id,
-            'timestamp': datetime.now(timezone.utc).isoformat()
-        }, room=meeting_room)
+        # Notify other meeting participants once the user's last socket has left
+        if attendance.leave(meeting_id, user_id, request.sid):
+            meeting_roster.left(meeting_id, user_id)
+            emit_to_room('user_left_meeting', {
+                'user_id': user_id,
+                'meeting_id': meeting_id,
+                'timestamp': datetime.now(timezone.utc).isoformat()
+            }, room=meeting_room)
 
         print(f"User {user_id} left meeting {meeting_id}")
 
+    @socketio.on('get_roster')
+    def handle_get_roster(data):
+        """Page of the live roster of a meeting this socket has joined"""
+        session = current_session()
+        if not session:
+            return
+        meeting_id = data.get('meeting_id')
+
+        if not meeting_id or f"meeting_{meeting_id}" not in rooms():
+            emit('error', {'message': 'Join the meeting first'})
+            return
+
+        try:
+            return meeting_roster.snapshot(meeting_id, data.get('cursor'), data.get('limit'))
+        except ValueError as e:
+            emit('error', {'message': str(e)})
+
     @socketio.on('meeting_message')
     def handle_meeting_message(data):
         """Send message within a meeting"""
+        session = current_session()
+        if not session:
+            return
         meeting_id = data.get('meeting_id')
-        user_id = data.get('user_id')
+        user_id = session['user_id']
         content = data.get('content')
 
-        if not meeting_id or not user_id or not content:
-            emit('error', {'message': 'Meeting ID, User ID and Content required'})
+        if not meeting_id or not content:
+            emit('error', {'message': 'Meeting ID and Content required'})
             return
 
-        # Get user info
-        user = mongo.db.users.find_one(
-            {'_id': ObjectId(user_id)},
-            {'first_name': 1, 'last_name': 1, 'profile_image': 1}
-        )
+        # Per-connection limit; a flooding client is told to back off
+        retry_after = rate_limiter.check(request.sid, 'chat')
+        if retry_after:
+            emit('rate_limited', {'event': 'meeting_message', 'retry_after': round(retry_after, 2)})
+            return
 
-        # Create message document
-        message = {
-            'meeting_id': ObjectId(meeting_id),
-            'user_id': ObjectId(user_id),
-            'content': content,
-            'timestamp': datetime.now(timezone.utc)
-        }
+        # User info from the socket session
+        user = session['card']
+        sid = request.sid
+        meeting_room = f"meeting_{meeting_id}"
 
-        # Store in database
-        result = mongo.db.meeting_messages.insert_one(message)
+        # Create message document (its _id is assigned up front)
+        message = new_meeting_message(meeting_id, user_id, content)
 
-        # Broadcast to meeting room
-        meeting_room = f"meeting_{meeting_id}"
-        emit_to_room('new_meeting_message', {
-            'message_id': str(result.inserted_id),
-            'meeting_id': meeting_id,
-            'user_id': user_id,
-            'user_name': f"{user['first_name']} {user['last_name']}",
-            'profile_image': user.get('profile_image'),
-            'content': content,
-            'timestamp': message['timestamp'].isoformat()
-        }, room=meeting_room)
+        # Buffered write; refuse rather than pile up when the buffer is full
+        if not meeting_chat_buffer.submit(message):
+            emit('rate_limited', {'event': 'meeting_message', 'retry_after': 1.0, 'reason': 'busy'})
+            return
+
+        # Broadcast now; the write follows within MEETING_CHAT_FLUSH_INTERVAL
+        rendered = render_meeting_message(message, user)
+        socketio.emit('new_meeting_message', rendered, room=meeting_room, skip_sid=sid)
+        recent_meeting_chat.add(meeting_id, rendered)
+
+        # The message ends the sender's typing indicator for everyone else
+        typing_indicators.emit_stopped(typing_indicators.stop(user_id, meeting_room))
 
     @socketio.on('new_message')
     def handle_new_message(data):
         """Handle new message from client"""
+        session = current_session()
+        if not session:
+            return
         content = data.get('content')
-        sender_id = data.get('sender_id')
+        sender_id = session['user_id']
         recipient_type = data.get('recipient_type')
         recipient_id = data.get('recipient_id')
         is_announcement = data.get('is_announcement', False)
         temp_id = data.get('tempId')  # Add tempId handling
 
         # Validate data
-        if not content or not sender_id or not recipient_type:
+        if not content or not recipient_type:
             emit('error', {'message': 'Incomplete message data'})
             return
 
@@ -241,28 +352,27 @@ def configure_socket(app):
             emit('error', {'message': 'Recipient ID required for camp or user messages'})
             return
 
+        # Per-connection limit; a flooding client is told to back off
+        retry_after = rate_limiter.check(request.sid, 'chat')
+        if retry_after:
+            emit('rate_limited', {'event': 'new_message', 'retry_after': round(retry_after, 2)})
+            return
+
         # Create message in database using the messages route logic
-        new_message = {
-            'content': content,
-            'sender_id': ObjectId(sender_id),
-            'recipient_type': recipient_type,
-            'recipient_id': ObjectId(recipient_id) if recipient_type in ['camp', 'user'] else None,
-            'message_type': data.get('message_type', 'text'),
-            'attachment_urls': data.get('attachment_urls', []),
-            'is_announcement': is_announcement,
-            'created_at': datetime.now(timezone.utc),
-            'is_deleted': False,
-            'read_by': []
-        }
+        new_message = new_message_doc(
+            sender_id, recipient_type, recipient_id, content,
+            message_type=data.get('message_type', 'text'),
+            attachment_urls=data.get('attachment_urls', []),
+            is_announcement=is_announcement
+        )
 
         result = mongo.db.messages.insert_one(new_message)
         message_id = str(result.inserted_id)
+        message_sent(new_message)
+        record_message(new_message)
 
-        # Get sender information for the response
-        sender = mongo.db.users.find_one(
-            {'_id': ObjectId(sender_id)},
-            {'password_hash': 0, 'first_name': 1, 'last_name': 1, 'profile_image': 1}
-        )
+        # Sender information from the socket session
+        sender = session['card']
 
         # Format response message
         response = {
@@ -276,7 +386,7 @@ def configure_socket(app):
             'is_announcement': is_announcement,
             'created_at': new_message['created_at'].isoformat(),
             'is_deleted': False,
-            'read_by': [],
+            'read_count': 0,
             'sender': {
                 'id': sender_id,
                 'first_name': sender['first_name'],
@@ -289,31 +399,13 @@ def configure_socket(app):
         if temp_id:
             response['tempId'] = temp_id
 
-        if recipient_type == 'user':
-            chat_participants = sorted([sender_id, recipient_id])
-            chat_room = f"chat_{chat_participants[0]}_{chat_participants[1]}"
-
-            # Emit to the specific chat room
-            print(f"Emitting new_message to chat room: {chat_room}")
-            emit_to_room('new_message', response, room=chat_room)
+        # The message ends the sender's typing indicator in that conversation (same rooms as `typing`)
+        typing_room = {'user': f"user_{recipient_id}", 'camp': f"camp_{recipient_id}"}.get(recipient_type)
+        if typing_room:
+            typing_indicators.emit_stopped(typing_indicators.stop(sender_id, typing_room))
 
-            # Also emit to individual user rooms for notifications when not in chat view
-            emit_to_room('new_message', response, room=f"user_{recipient_id}")
-            emit_to_room('new_message', response, room=f"user_{sender_id}")
-        elif recipient_type == 'ministry':
-            emit_to_room('new_message', response, room='ministry')
-        elif recipient_type == 'camp':
-            emit_to_room('new_message', response, room=f"camp_{recipient_id}")
-
-        # Determine room to broadcast to
-        if recipient_type == 'ministry':
-            emit_to_room('new_message', response, room='ministry')
-        elif recipient_type == 'camp':
-            emit_to_room('new_message', response, room=f"camp_{recipient_id}")
-        else:  # user-to-user message
-            # IMPORTANT: Always send to both sender and recipient rooms
-            emit_to_room('new_message', response, room=f"user_{recipient_id}")
-            emit_to_room('new_message', response, room=f"user_{sender_id}")
+        # One emit to the union of target rooms (chat room and both user rooms for DMs)
+        emit_to_rooms('new_message', response, message_rooms(recipient_type, sender_id, recipient_id))
 
         # Send specific confirmation event with tempId mapping
         if temp_id:
@@ -323,9 +415,32 @@ def configure_socket(app):
                 'sender_id': sender_id,
                 'recipient_id': recipient_id
             }
-            emit_to_room('message_confirmed', confirmation_data, room=f"user_{sender_id}")
-            if recipient_type == 'user':
-                emit_to_room('message_confirmed', confirmation_data, room=f"user_{recipient_id}")
+            emit_to_rooms('message_confirmed', confirmation_data,
+                          participant_rooms(recipient_type, sender_id, recipient_id))
+
+    @socketio.on('mark_read')
+    def handle_mark_read(data):
+        """Mark a conversation read up to a timestamp, or a list of its messages; acks with the result"""
+        session = current_session()
+        if not session:
+            return
+        user_id = session['user_id']
+
+        try:
+            conversation, upto, message_ids = parse_read_request(data or {})
+        except ValueError as e:
+            emit('error', {'message': str(e)})
+            return
+
+        if not can_read_conversation(conversation, user_id, session['camp_id']):
+            emit('error', {'message': 'Unauthorized access to this conversation'})
+            return
+
+        result = mark_conversation_read(user_id, conversation, upto=upto, message_ids=message_ids)
+        payload = messages_read_payload(user_id, conversation, result)
+        if result['count']:
+            publish_messages_read(user_id, conversation, payload)
+        return payload
 
     @socketio.on('new_prayer_request')
     def handle_new_prayer_request(data):
@@ -390,34 +505,26 @@ def configure_socket(app):
     @socketio.on('set_status')
     def handle_status_change(data):
         """Handle user status change"""
-        user_id = data.get('user_id')
+        session = current_session()
+        if not session:
+            return
+        user_id = session['user_id']
         status = data.get('status')  # 'online', 'offline', 'away', 'busy', 'in_meeting'
 
-        if not user_id or not status:
-            emit('error', {'message': 'User ID and Status required'})
+        if not status:
+            emit('error', {'message': 'Status required'})
             return
 
         # Update user status
-        if user_id in active_users:
-            active_users[user_id]['status'] = status
-
-            # Broadcast status change to all users
-            emit('user_status_change', {
-                'user_id': user_id,
-                'status': status
-            }, broadcast=True)
+        if presence.set_status(user_id, status):
+            # Queue the status change for the next presence batch
+            presence_broadcaster.publish(user_id, status, presence_broadcaster.room_for(session['camp_id']))
 
     @socketio.on('get_active_users')
     def handle_get_active_users():
         """Return list of active users"""
-        users_list = []
-        for user_id, data in active_users.items():
-            if data['status'] != 'offline' and data['sessions']:
-                users_list.append({
-                    'user_id': user_id,
-                    'status': data['status'],
-                    'user_info': data['user_info']
-                })
+        # Served from the registry's cached snapshot
+        users_list = presence.active_users()
 
         emit('active_users', {'users': users_list})
 
@@ -481,10 +588,14 @@ def configure_socket(app):
         if recording_url:
             update_data['recording_url'] = recording_url
 
-        mongo.db.meetings.update_one(
+        result = mongo.db.meetings.update_one(
             {'_id': ObjectId(meeting_id)},
             {'$set': update_data}
         )
+        if result.modified_count:
+            # Same wrap-up as the REST end route
+            from app.services.meeting_service import close_meeting
+            close_meeting(meeting_id)
 
         meeting_room = f"meeting_{meeting_id}"
 
@@ -497,12 +608,15 @@ def configure_socket(app):
 
     @socketio.on('typing')
     def handle_typing(data):
-        """Broadcast that a user is typing"""
-        user_id = data.get('user_id')
+        """Broadcast that a user is typing (coalesced: start, periodic refresh, server-side expiry)"""
+        session = socket_sessions.get(request.sid)
+        if not session:
+            return
+        user_id = session['user_id']
         conversation_type = data.get('conversation_type')  # 'meeting', 'direct', 'camp'
         conversation_id = data.get('conversation_id')  # meeting_id, user_id, or camp_id
 
-        if not user_id or not conversation_type or not conversation_id:
+        if not conversation_type or not conversation_id:
             return
 
         # Determine room to broadcast to
@@ -514,13 +628,25 @@ def configure_socket(app):
         elif conversation_type == 'camp':
             room = f"camp_{conversation_id}"
 
-        if room:
-            socketio.emit('user_typing', {
-                'user_id': user_id,
-                'conversation_type': conversation_type,
-                'conversation_id': conversation_id,
-                'timestamp': datetime.now(timezone.utc).isoformat()
-            }, room=room, include_self=False) # type: ignore
+        if not room or rate_limiter.check(request.sid, 'typing'):
+            return
+
+        indicator = {
+            'user_id': user_id,
+            'conversation_type': conversation_type,
+            'conversation_id': conversation_id
+        }
+        if data.get('is_typing') is False:
+            typing_indicators.emit_stopped(typing_indicators.stop(user_id, room))
+            return
+
+        # Only the first keystroke and periodic refreshes produce a frame
+        if typing_indicators.touch(user_id, room, request.sid, indicator):
+            socketio.emit('user_typing', dict(
+                indicator,
+                is_typing=True,
+                timestamp=datetime.now(timezone.utc).isoformat()
+            ), room=room, include_self=False) # type: ignore
 
     @socketio.on('new_notification')
     def handle_new_notification(data):
@@ -542,17 +668,19 @@ def configure_socket(app):
     @socketio.on('join_chat')
     def handle_join_chat(data):
         """Join a user-to-user chat room"""
-        user_id = data.get('user_id')
+        session = current_session()
+        if not session:
+            return
+        user_id = session['user_id']
         partner_id = data.get('partner_id')
 
-        if not user_id or not partner_id:
-            emit('error', {'message': 'User ID and Partner ID required'})
+        if not partner_id:
+            emit('error', {'message': 'Partner ID required'})
             return
 
         # Create a consistent room name for this conversation
         # Sort IDs to ensure same room regardless of who joins
-        chat_participants = sorted([user_id, partner_id])
-        chat_room = f"chat_{chat_participants[0]}_{chat_participants[1]}"
+        chat_room = chat_room_name(user_id, partner_id)
 
         join_room(chat_room)
         print(f"User {user_id} joined chat room with {partner_id}: {chat_room}")
@@ -567,16 +695,18 @@ def configure_socket(app):
     @socketio.on('leave_chat')
     def handle_leave_chat(data):
         """Leave a user-to-user chat room"""
-        user_id = data.get('user_id')
+        session = current_session()
+        if not session:
+            return
+        user_id = session['user_id']
         partner_id = data.get('partner_id')
 
-        if not user_id or not partner_id:
-            emit('error', {'message': 'User ID and Partner ID required'})
+        if not partner_id:
+            emit('error', {'message': 'Partner ID required'})
             return
 
         # Create consistent room name
-        chat_participants = sorted([user_id, partner_id])
-        chat_room = f"chat_{chat_participants[0]}_{chat_participants[1]}"
+        chat_room = chat_room_name(user_id, partner_id)
 
         leave_room(chat_room)
         print(f"User {user_id} left chat room with {partner_id}: {chat_room}")
@@ -0,0 +1,112 @@
+import threading
+import time
+from app import mongo
+from app.config import app_config
+from app.services.presence_service import presence
+from app.services.user_card_service import USER_CARD_PROJECTION, on_user_card_invalidated
+from bson import ObjectId
+from flask_socketio import join_room, leave_room
+from typing import Any, Dict, Optional, Set
+
+# Verified identity per socket connection.
+#
+# `authenticate` checks the JWT once and opens a session for the sid holding
+# the user id, role, camp id and display card. Later handlers read the
+# session instead of trusting a client-supplied user_id or re-reading the
+# user, so a chat event costs no users query. Sessions are dropped on
+# disconnect and reloaded after a profile change (or after the user card
+# TTL, which bounds staleness for changes made on another worker). A reload
+# that finds a new camp moves the socket to the new camp room.
+
+SESSION_PROJECTION = dict(USER_CARD_PROJECTION, role=1, camp_id=1, is_active=1)
+
+class SocketSessionStore:
+    def __init__(self, ttl: float):
+        self._lock = threading.Lock()
+        self._sessions: Dict[str, Dict[str, Any]] = {}
+        self._sids_by_user: Dict[str, Set[str]] = {}
+        self.ttl = ttl
+
+    @staticmethod
+    def _from_user(user: Dict[str, Any]) -> Dict[str, Any]:
+        return {
+            'user_id': str(user['_id']),
+            'role': user.get('role', 'member'),
+            'camp_id': str(user['camp_id']) if user.get('camp_id') else None,
+            'card': {
+                '_id': str(user['_id']),
+                'first_name': user.get('first_name', ''),
+                'last_name': user.get('last_name', ''),
+                'profile_image': user.get('profile_image')
+            },
+            'loaded_at': time.monotonic()
+        }
+
+    def open(self, sid: str, user: Dict[str, Any]) -> Dict[str, Any]:
+        """Start (or replace) the session for a sid from a freshly loaded user document"""
+        session = self._from_user(user)
+        with self._lock:
+            previous = self._sessions.get(sid)
+            if previous and previous['user_id'] != session['user_id']:
+                self._sids_by_user.get(previous['user_id'], set()).discard(sid)
+            self._sessions[sid] = session
+            self._sids_by_user.setdefault(session['user_id'], set()).add(sid)
+        return session
+
+    def get(self, sid: str) -> Optional[Dict[str, Any]]:
+        """Session for a sid, or None if the socket has not authenticated"""
+        session = self._sessions.get(sid)
+        if session is None:
+            return None
+        if session['loaded_at'] is None or time.monotonic() - session['loaded_at'] > self.ttl:
+            session = self._reload(sid, session)
+        return session
+
+    def _reload(self, sid: str, session: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        user = mongo.db.users.find_one({'_id': ObjectId(session['user_id'])}, SESSION_PROJECTION)
+        if not user or not user.get('is_active', True):
+            # Deleted while connected: the socket loses its identity
+            self.close(sid)
+            return None
+        fresh = self._from_user(user)
+        with self._lock:
+            if sid in self._sessions:
+                self._sessions[sid] = fresh
+        if fresh['camp_id'] != session['camp_id']:
+            self._move_camp(sid, session['camp_id'], fresh['camp_id'])
+        return fresh
+
+    @staticmethod
+    def _move_camp(sid: str, old: Optional[str], new: Optional[str]) -> None:
+        # authenticate joined camp_<id>; camp chat and camp presence follow the new camp
+        if old:
+            leave_room(f"camp_{old}", sid=sid, namespace='/')
+        if new:
+            join_room(f"camp_{new}", sid=sid, namespace='/')
+        presence.set_camp(sid, new)
+
+    def close(self, sid: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            session = self._sessions.pop(sid, None)
+            if session:
+                sids = self._sids_by_user.get(session['user_id'])
+                if sids is not None:
+                    sids.discard(sid)
+                    if not sids:
+                        del self._sids_by_user[session['user_id']]
+            return session
+
+    def invalidate_user(self, user_id: Any) -> None:
+        """Mark a user's sessions for reload on their next event"""
+        with self._lock:
+            for sid in self._sids_by_user.get(str(user_id), ()):
+                self._sessions[sid]['loaded_at'] = None
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+# Process-wide store used by the socket handlers
+socket_sessions = SocketSessionStore(ttl=app_config.USER_CARD_CACHE_TTL)
+
+# Profile, role and camp changes go through invalidate_user_card
+on_user_card_invalidated(socket_sessions.invalidate_user)
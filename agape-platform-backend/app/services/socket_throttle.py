@@ -0,0 +1,204 @@
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+# Per-connection throttling for chatty socket events.
+#
+# SocketRateLimiter keeps a token bucket per (sid, event class): a client may
+# burst up to `burst` events, then is held to `rate` events per second.
+# TypingCoalescer turns a stream of keystroke `typing` events into one
+# "started" frame, a refresh at most every TYPING_REFRESH_INTERVAL seconds,
+# and a server-side "stopped" frame once the user goes quiet.
+# ReadCountCoalescer turns reads in camp and ministry conversations into one
+# `read_counts` frame per conversation every READ_COUNT_BROADCAST_WINDOW
+# seconds, instead of one frame to the whole audience per reader.
+
+class TokenBucket:
+    __slots__ = ('rate', 'burst', 'tokens', 'updated')
+
+    def __init__(self, rate: float, burst: float):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+
+    def take(self) -> float:
+        """Take one token; returns 0 on success, else seconds until one is available"""
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+class SocketRateLimiter:
+    """Token buckets per socket session and event class"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._buckets: Dict[str, Dict[str, TokenBucket]] = {}
+        self._limits: Dict[str, Tuple[float, float]] = {}
+
+    def init_app(self, app) -> None:
+        self._limits = {
+            'chat': (app.config.get('SOCKET_CHAT_RATE', 2.0), app.config.get('SOCKET_CHAT_BURST', 5)),
+            'typing': (app.config.get('SOCKET_TYPING_RATE', 4.0), app.config.get('SOCKET_TYPING_BURST', 8)),
+        }
+
+    def check(self, sid: str, kind: str) -> float:
+        """0 if the event may proceed, else the seconds the client should wait"""
+        limit = self._limits.get(kind)
+        if not limit:
+            return 0.0
+        with self._lock:
+            buckets = self._buckets.setdefault(sid, {})
+            bucket = buckets.get(kind)
+            if bucket is None:
+                bucket = buckets[kind] = TokenBucket(*limit)
+            return bucket.take()
+
+    def forget(self, sid: str) -> None:
+        with self._lock:
+            self._buckets.pop(sid, None)
+
+class TypingCoalescer:
+    """Tracks who is typing where, so keystrokes become a handful of frames"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # (user_id, room) -> {'sid', 'data', 'last_seen', 'last_sent'}
+        self._typing: Dict[Tuple[str, str], Dict[str, Any]] = {}
+        self._socketio = None
+        self._sweeping = False
+        self.refresh_interval = 3.0
+        self.timeout = 6.0
+
+    def init_app(self, app, socketio) -> None:
+        self._socketio = socketio
+        self.refresh_interval = app.config.get('TYPING_REFRESH_INTERVAL', 3.0)
+        self.timeout = app.config.get('TYPING_TIMEOUT', 6.0)
+
+    def touch(self, user_id: str, room: str, sid: str, data: Dict[str, Any]) -> Optional[str]:
+        """
+        Record a typing event
+
+        Returns 'started' or 'refresh' when a frame should go out, None when
+        the event is absorbed.
+        """
+        now = time.monotonic()
+        with self._lock:
+            key = (user_id, room)
+            entry = self._typing.get(key)
+            if entry is None:
+                self._typing[key] = {'sid': sid, 'data': data, 'last_seen': now, 'last_sent': now}
+                self._start_sweeper()
+                return 'started'
+
+            entry['last_seen'] = now
+            if now - entry['last_sent'] >= self.refresh_interval:
+                entry['last_sent'] = now
+                return 'refresh'
+            return None
+
+    def stop(self, user_id: str, room: Optional[str] = None) -> List[Tuple[str, Dict[str, Any]]]:
+        """Stop typing for a user (in one room, or everywhere); returns the entries removed"""
+        with self._lock:
+            keys = [key for key in self._typing if key[0] == user_id and (room is None or key[1] == room)]
+            return [(key[1], self._typing.pop(key)) for key in keys]
+
+    def expire(self) -> List[Tuple[str, Dict[str, Any]]]:
+        """Remove entries not refreshed within the timeout; returns (room, entry) pairs"""
+        cutoff = time.monotonic() - self.timeout
+        with self._lock:
+            expired = [key for key, entry in self._typing.items() if entry['last_seen'] < cutoff]
+            return [(key[1], self._typing.pop(key)) for key in expired]
+
+    def emit_stopped(self, stopped: List[Tuple[str, Dict[str, Any]]]) -> None:
+        for room, entry in stopped:
+            self._socketio.emit('user_typing', dict(entry['data'], is_typing=False),
+                                room=room, skip_sid=entry['sid'])
+
+    def _start_sweeper(self) -> None:
+        # Called with the lock held
+        if not self._sweeping and self._socketio is not None:
+            self._sweeping = True
+            self._socketio.start_background_task(self._sweep_loop)
+
+    def _sweep_loop(self) -> None:
+        while True:
+            self._socketio.sleep(1)
+            try:
+                self.emit_stopped(self.expire())
+            except Exception as e:
+                print(f"Typing sweep error: {str(e)}")
+            with self._lock:
+                if not self._typing:
+                    self._sweeping = False
+                    return
+
+class ReadCountCoalescer:
+    """Collects reads per group conversation and broadcasts them once per window"""
+
+    # Receipted message ids carried in one frame at most
+    MAX_MESSAGE_IDS = 500
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # conversation -> {'rooms', 'readers', 'last_read_at', 'message_ids'}
+        self._pending: Dict[str, Dict[str, Any]] = {}
+        self._socketio = None
+        self._running = False
+        self.window = 2.0
+
+    def init_app(self, app, socketio) -> None:
+        self._socketio = socketio
+        self.window = app.config.get('READ_COUNT_BROADCAST_WINDOW', 2.0)
+
+    def publish(self, conversation: str, rooms: List[str], read: Dict[str, Any]) -> None:
+        """Queue one user's read (a messages_read payload) for the conversation's next frame"""
+        with self._lock:
+            entry = self._pending.setdefault(conversation, {
+                'rooms': rooms, 'readers': set(), 'last_read_at': None, 'message_ids': []
+            })
+            entry['readers'].add(read['user_id'])
+            if read['last_read_at'] and (entry['last_read_at'] or '') < read['last_read_at']:
+                entry['last_read_at'] = read['last_read_at']
+            room_left = self.MAX_MESSAGE_IDS - len(entry['message_ids'])
+            entry['message_ids'].extend(read['message_ids'][:max(room_left, 0)])
+
+            if not self._running and self._socketio is not None:
+                self._running = True
+                self._socketio.start_background_task(self._flush_loop)
+
+    def flush(self) -> int:
+        """Emit the pending frames now; returns the number sent"""
+        with self._lock:
+            pending, self._pending = self._pending, {}
+
+        for conversation, entry in pending.items():
+            rooms = entry['rooms']
+            self._socketio.emit('read_counts', {
+                'conversation': conversation,
+                'readers': len(entry['readers']),
+                'last_read_at': entry['last_read_at'],
+                'message_ids': entry['message_ids']
+            }, room=rooms[0] if len(rooms) == 1 else rooms)
+        return len(pending)
+
+    def _flush_loop(self) -> None:
+        while True:
+            self._socketio.sleep(self.window)
+            try:
+                self.flush()
+            except Exception as e:
+                print(f"Read count broadcast error: {str(e)}")
+            with self._lock:
+                if not self._pending:
+                    self._running = False
+                    return
+
+# Process-wide instances used by the socket handlers
+rate_limiter = SocketRateLimiter()
+typing_indicators = TypingCoalescer()
+read_counts = ReadCountCoalescer()
@@ -0,0 +1,181 @@
+from app import mongo
+from bson import ObjectId
+from datetime import datetime, timezone
+from pymongo.errors import DuplicateKeyError
+from typing import Any, Dict, Iterable, List, Optional
+from app.services.user_card_service import on_user_card_invalidated
+
+# Unread counters.
+#
+# One unread_counters document per user, keyed by the user id, holds the
+# unread message count of each conversation the user belongs to and the
+# number of unread notifications:
+#
+#   {_id: user_id, camp_id, conversations: {'ministry': 3, 'dm:<a>:<b>': 1}, notifications: 2}
+#
+# Sends and notification fan-outs $inc the recipients' documents (camp and
+# ministry messages with one update_many), reads $inc them back down, so a
+# badge is a single _id lookup. A user's document is built from messages,
+# read state and receipts the first time it is asked for, and dropped when
+# their profile or camp changes so the next read rebuilds it; a message sent
+# while a document is being built may be missed until then. Deleting a message
+# takes it back off the counts of those who had not read it.
+
+def _now() -> datetime:
+    return datetime.now(timezone.utc)
+
+def _field(conversation: str) -> str:
+    return f"conversations.{conversation}"
+
+def message_sent(message: Dict[str, Any]) -> None:
+    """Count a new message as unread for everyone in its conversation but the sender"""
+    conversation = message['conversation']
+    update = {'$inc': {_field(conversation): 1}, '$set': {'updated_at': _now()}}
+    if message['recipient_type'] == 'user':
+        mongo.db.unread_counters.update_one({'_id': message['recipient_id']}, update)
+    elif message['recipient_type'] == 'camp':
+        mongo.db.unread_counters.update_many(
+            {'camp_id': message['recipient_id'], '_id': {'$ne': message['sender_id']}}, update
+        )
+    else:
+        mongo.db.unread_counters.update_many({'_id': {'$ne': message['sender_id']}}, update)
+
+def message_deleted(message: Dict[str, Any]) -> None:
+    """Take a deleted message off the unread count of everyone who had not read it yet"""
+    conversation = message['conversation']
+    field = _field(conversation)
+    # Readers: watermark at or past the message, or a receipt for it
+    excluded = {message['sender_id']}
+    excluded.update(state['user_id'] for state in mongo.db.read_state.find(
+        {'conversation': conversation, 'last_read_at': {'$gte': message['created_at']}}, {'user_id': 1}
+    ))
+    excluded.update(receipt['user_id'] for receipt in mongo.db.message_receipts.find(
+        {'message_id': message['_id']}, {'user_id': 1}
+    ))
+
+    update = {'$inc': {field: -1}, '$set': {'updated_at': _now()}}
+    # Never below zero (a document built after the delete no longer counts it)
+    unread = {field: {'$gt': 0}}
+    if message['recipient_type'] == 'user':
+        if message['recipient_id'] not in excluded:
+            mongo.db.unread_counters.update_one(dict(unread, _id=message['recipient_id']), update)
+    elif message['recipient_type'] == 'camp':
+        mongo.db.unread_counters.update_many(
+            dict(unread, camp_id=message['recipient_id'], _id={'$nin': list(excluded)}), update
+        )
+    else:
+        mongo.db.unread_counters.update_many(dict(unread, _id={'$nin': list(excluded)}), update)
+
+def messages_read(user_id: Any, conversation: str, count: int) -> None:
+    """Take `count` newly read messages off a conversation's unread count"""
+    if count <= 0:
+        return
+    user = ObjectId(user_id)
+    field = _field(conversation)
+    result = mongo.db.unread_counters.update_one(
+        {'_id': user, field: {'$gte': count}},
+        {'$inc': {field: -count}, '$set': {'updated_at': _now()}}
+    )
+    if not result.matched_count:
+        # Never below zero (e.g. the document was built after some of these were sent)
+        mongo.db.unread_counters.update_one({'_id': user}, {'$set': {field: 0, 'updated_at': _now()}})
+
+def notifications_received(user_ids: Iterable[Any]) -> None:
+    """Count one new notification for each of the given users"""
+    object_ids = [ObjectId(user_id) for user_id in user_ids]
+    if object_ids:
+        mongo.db.unread_counters.update_many(
+            {'_id': {'$in': object_ids}},
+            {'$inc': {'notifications': 1}, '$set': {'updated_at': _now()}}
+        )
+
+def notifications_read(user_id: Any, count: Optional[int] = None) -> None:
+    """Take `count` notifications off the unread count, or clear it when count is None"""
+    user = ObjectId(user_id)
+    if count is None:
+        mongo.db.unread_counters.update_one({'_id': user}, {'$set': {'notifications': 0, 'updated_at': _now()}})
+        return
+    if count > 0:
+        result = mongo.db.unread_counters.update_one(
+            {'_id': user, 'notifications': {'$gte': count}},
+            {'$inc': {'notifications': -count}, '$set': {'updated_at': _now()}}
+        )
+        if not result.matched_count:
+            mongo.db.unread_counters.update_one({'_id': user}, {'$set': {'notifications': 0}})
+
+def forget_user(user_id: Any) -> None:
+    """Drop a user's counters; the next summary rebuilds them"""
+    mongo.db.unread_counters.delete_one({'_id': ObjectId(user_id)})
+
+def get_unread_summary(user_id: Any, refresh: bool = False) -> Dict[str, Any]:
+    """
+    Unread totals for a user: {messages, notifications, conversations}
+
+    `conversations` lists only conversations with unread messages. One
+    _id lookup, unless the counters have to be built (first use or refresh).
+    """
+    user = ObjectId(user_id)
+    counters = None if refresh else mongo.db.unread_counters.find_one({'_id': user})
+    if counters is None:
+        counters = _rebuild(user)
+
+    conversations = {key: count for key, count in (counters.get('conversations') or {}).items() if count > 0}
+    return {
+        'messages': sum(conversations.values()),
+        'notifications': max(counters.get('notifications', 0), 0),
+        'conversations': conversations
+    }
+
+def _rebuild(user: ObjectId) -> Dict[str, Any]:
+    member = mongo.db.users.find_one({'_id': user}, {'camp_id': 1}) or {}
+    camp_id = member.get('camp_id')
+    watermarks = {
+        state['conversation']: state['last_read_at']
+        for state in mongo.db.read_state.find({'user_id': user}, {'conversation': 1, 'last_read_at': 1})
+        if state.get('last_read_at')
+    }
+    membership: List[Dict[str, Any]] = [
+        {'conversation': 'ministry'},
+        {'recipient_type': 'user', 'recipient_id': user}
+    ]
+    if camp_id:
+        membership.append({'conversation': f"camp:{camp_id}"})
+    above_watermark: List[Dict[str, Any]] = [
+        {'conversation': conversation, 'created_at': {'$gt': last_read_at}}
+        for conversation, last_read_at in watermarks.items()
+    ]
+    above_watermark.append({'conversation': {'$nin': list(watermarks)}})
+
+    # Unread = messages above the watermark, minus those opened individually
+    counts: Dict[str, int] = {
+        row['_id']: row['count'] for row in mongo.db.messages.aggregate([
+            {'$match': {'$and': [
+                {'$or': membership},
+                {'$or': above_watermark},
+                {'sender_id': {'$ne': user}, 'is_deleted': False}
+            ]}},
+            {'$group': {'_id': '$conversation', 'count': {'$sum': 1}}}
+        ])
+    }
+    for row in mongo.db.message_receipts.aggregate([
+        {'$match': {'user_id': user, 'conversation': {'$in': list(counts)}}},
+        {'$group': {'_id': '$conversation', 'count': {'$sum': 1}}}
+    ]):
+        counts[row['_id']] = max(counts[row['_id']] - row['count'], 0)
+
+    counters = {
+        '_id': user,
+        'camp_id': camp_id,
+        'conversations': counts,
+        'notifications': mongo.db.notification_receipts.count_documents({'user_id': user, 'is_read': False}),
+        'updated_at': _now()
+    }
+    try:
+        mongo.db.unread_counters.insert_one(counters)
+    except DuplicateKeyError:
+        # Built concurrently (or refreshed): keep this count
+        mongo.db.unread_counters.replace_one({'_id': user}, counters)
+    return counters
+
+# Profile and camp changes go through invalidate_user_card
+on_user_card_invalidated(forget_user)
@@ -0,0 +1,244 @@
+import hashlib
+import os
+import time
+from app import mongo
+from app.config import app_config
+from app.services.job_service import job
+from bson import ObjectId
+from bson.errors import InvalidId
+from datetime import datetime, timezone, timedelta
+from typing import Any, BinaryIO, Dict, Optional
+from werkzeug.utils import secure_filename
+
+# Resumable chunked uploads.
+#
+# A client opens an upload session with the file's name and size, PUTs the
+# bytes in order as Content-Range chunks, then completes the session with
+# the file's SHA-256. Each chunk is copied from the request stream to a
+# partial file in small blocks, so memory stays bounded whatever the file
+# size, and the session records how many bytes are on disk: after a dropped
+# connection the client asks for the session and resumes from `received`.
+# Approved large types (video, audio) may exceed MAX_CONTENT_LENGTH, which
+# then only bounds a single chunk. Abandoned sessions expire after
+# UPLOAD_SESSION_TTL and are swept by a periodic job.
+
+ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif', 'pdf', 'doc', 'docx', 'xls', 'xlsx', 'mp3', 'mp4'}
+
+# Bytes copied per read/write while streaming to and from disk
+BLOCK_SIZE = 64 * 1024
+
+class UploadError(Exception):
+    """An upload request that cannot be applied; `status` is the HTTP code to answer with"""
+    def __init__(self, message: str, status: int = 400, received: Optional[int] = None):
+        super().__init__(message)
+        self.status = status
+        self.received = received
+
+def _now() -> datetime:
+    return datetime.now(timezone.utc)
+
+def _aware(value: datetime) -> datetime:
+    # Dates read back from MongoDB are naive UTC
+    return value if value.tzinfo else value.replace(tzinfo=timezone.utc)
+
+def _extension(filename: str) -> str:
+    return filename.rsplit('.', 1)[1].lower() if '.' in filename else ''
+
+def allowed_file(filename: str) -> bool:
+    return _extension(filename) in ALLOWED_EXTENSIONS
+
+def max_upload_size(filename: str) -> int:
+    """Largest file accepted for a name: UPLOAD_MAX_SIZE for approved large types, else MAX_CONTENT_LENGTH"""
+    if _extension(filename) in app_config.UPLOAD_LARGE_EXTENSIONS:
+        return app_config.UPLOAD_MAX_SIZE
+    return app_config.MAX_CONTENT_LENGTH
+
+def stored_filename(filename: str, file_id: Optional[ObjectId] = None) -> str:
+    """Unique name under UPLOAD_FOLDER for an uploaded file (an ObjectId, which also orders by time)"""
+    return f"{file_id or ObjectId()}_{secure_filename(filename)}"
+
+def _partial_path(session_id: Any) -> str:
+    return os.path.join(app_config.UPLOAD_FOLDER, '.partial', f"{session_id}.part")
+
+def create_session(user_id: Any, filename: str, size: int, sha256: Optional[str] = None) -> Dict[str, Any]:
+    """Open an upload session and its empty partial file"""
+    if not filename or not allowed_file(filename):
+        raise UploadError('File type not allowed')
+    if not isinstance(size, int) or size <= 0:
+        raise UploadError('size must be a positive number of bytes')
+    if size > max_upload_size(filename):
+        raise UploadError(f'File too large (max {max_upload_size(filename)} bytes for this type)', 413)
+
+    now = _now()
+    session_id = ObjectId()
+    session = {
+        '_id': session_id,
+        'user_id': ObjectId(user_id),
+        'filename': secure_filename(filename),
+        # The session id keeps names unique across concurrent uploads of the same file name
+        'stored_name': stored_filename(filename, session_id),
+        'size': size,
+        'sha256': sha256.lower() if sha256 else None,
+        'received': 0,
+        'status': 'open',
+        'created_at': now,
+        'updated_at': now,
+        'expires_at': now + timedelta(seconds=app_config.UPLOAD_SESSION_TTL)
+    }
+    path = _partial_path(session['_id'])
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    open(path, 'wb').close()
+    mongo.db.upload_sessions.insert_one(session)
+    return session
+
+def get_session(session_id: Any, user_id: Any) -> Dict[str, Any]:
+    """A user's upload session; raises UploadError(404) if it does not exist or has expired"""
+    try:
+        session = mongo.db.upload_sessions.find_one({'_id': ObjectId(session_id), 'user_id': ObjectId(user_id)})
+    except InvalidId:
+        session = None
+    if not session or (session['status'] == 'open' and _aware(session['expires_at']) < _now()):
+        raise UploadError('Upload session not found', 404)
+    return session
+
+def parse_content_range(header: Optional[str], size: int):
+    """(start, end) from a `bytes start-end/total` header, end inclusive; raises UploadError"""
+    try:
+        unit, _, spec = (header or '').partition(' ')
+        span, _, total = spec.partition('/')
+        start, _, end = span.partition('-')
+        start, end = int(start), int(end)
+    except ValueError:
+        raise UploadError('Content-Range header required (bytes start-end/total)', 416)
+    if unit != 'bytes' or total not in ('*', str(size)) or start < 0 or end < start or end >= size:
+        raise UploadError('Content-Range does not fit the upload', 416)
+    return start, end
+
+def write_chunk(session: Dict[str, Any], start: int, end: int, stream: BinaryIO) -> Dict[str, Any]:
+    """
+    Append bytes start..end (inclusive) from `stream` to the partial file
+
+    Chunks must arrive in order: `start` has to equal the bytes received so
+    far (UploadError 409 carries the offset to resume from). Whatever was
+    written before a dropped connection still counts.
+    """
+    if session['status'] != 'open':
+        raise UploadError('Upload already completed', 409, session['received'])
+    if start != session['received']:
+        raise UploadError('Chunk does not start at the received offset', 409, session['received'])
+
+    remaining = end - start + 1
+    written = 0
+    with open(_partial_path(session['_id']), 'r+b') as part:
+        part.seek(start)
+        part.truncate()
+        while remaining:
+            block = stream.read(min(BLOCK_SIZE, remaining))
+            if not block:
+                break
+            part.write(block)
+            written += len(block)
+            remaining -= len(block)
+
+    # Only the request that wrote from the recorded offset moves it
+    received = start + written
+    result = mongo.db.upload_sessions.update_one(
+        {'_id': session['_id'], 'received': start, 'status': 'open'},
+        {'$set': {'received': received, 'updated_at': _now()}}
+    )
+    if not result.matched_count:
+        raise UploadError('Concurrent write to the same upload', 409)
+    if remaining:
+        raise UploadError('Chunk ended early', 400, received)
+    session['received'] = received
+    return session
+
+def _file_sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(BLOCK_SIZE * 16), b''):
+            digest.update(block)
+            # Let other green threads run while hashing a large file
+            time.sleep(0)
+    return digest.hexdigest()
+
+def complete_session(session: Dict[str, Any], sha256: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Verify the received file against its SHA-256 and move it into UPLOAD_FOLDER
+
+    A checksum mismatch discards the session; the client starts over.
+    """
+    if session['status'] == 'complete':
+        return session
+    if session['received'] != session['size']:
+        raise UploadError('Upload is incomplete', 409, session['received'])
+    expected = (sha256 or session.get('sha256') or '').lower()
+    if not expected:
+        raise UploadError('sha256 is required')
+
+    # One request verifies; a repeated completion waits for its result
+    claimed = mongo.db.upload_sessions.update_one(
+        {'_id': session['_id'], 'status': 'open'}, {'$set': {'status': 'verifying', 'updated_at': _now()}}
+    )
+    if not claimed.matched_count:
+        raise UploadError('Upload is already being completed', 409, session['received'])
+
+    path = _partial_path(session['_id'])
+    try:
+        matches = _file_sha256(path) == expected
+        if matches:
+            os.replace(path, os.path.join(app_config.UPLOAD_FOLDER, session['stored_name']))
+    except OSError as e:
+        # Hand the session back so the client can retry the completion
+        print(f"Upload completion error: {str(e)}")
+        mongo.db.upload_sessions.update_one(
+            {'_id': session['_id'], 'status': 'verifying'}, {'$set': {'status': 'open', 'updated_at': _now()}}
+        )
+        raise UploadError('Could not store the upload; try completing it again', 503, session['received'])
+
+    if not matches:
+        abort_session(session)
+        raise UploadError('Checksum mismatch; upload discarded', 422)
+
+    file_url = f"/uploads/{session['stored_name']}"
+    mongo.db.upload_sessions.update_one(
+        {'_id': session['_id']},
+        {'$set': {'status': 'complete', 'sha256': expected, 'file_url': file_url, 'completed_at': _now()},
+         '$unset': {'expires_at': ''}}
+    )
+    session.update(status='complete', sha256=expected, file_url=file_url)
+    return session
+
+def abort_session(session: Dict[str, Any]) -> None:
+    """Drop an unfinished session and its partial file"""
+    try:
+        os.remove(_partial_path(session['_id']))
+    except FileNotFoundError:
+        pass
+    mongo.db.upload_sessions.delete_one({'_id': session['_id'], 'status': {'$ne': 'complete'}})
+
+def session_payload(session: Dict[str, Any]) -> Dict[str, Any]:
+    """Client view of an upload session"""
+    expires_at = session.get('expires_at')
+    return {
+        'upload_id': str(session['_id']),
+        'filename': session['filename'],
+        'size': session['size'],
+        'received': session['received'],
+        'status': session['status'],
+        'chunk_size': app_config.UPLOAD_CHUNK_SIZE,
+        'expires_at': _aware(expires_at).isoformat() if expires_at and session['status'] == 'open' else None,
+        'file_url': session.get('file_url')
+    }
+
+@job('expire_uploads')
+def expire_upload_sessions():
+    """Remove open upload sessions past their expiry, with their partial files (runs as a periodic job)"""
+    expired = mongo.db.upload_sessions.find(
+        {'status': {'$in': ['open', 'verifying']}, 'expires_at': {'$lt': _now()}}, {'_id': 1}
+    )
+    count = 0
+    for session in expired:
+        abort_session(session)
+        count += 1
+    return count
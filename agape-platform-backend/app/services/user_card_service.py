@@ -0,0 +1,80 @@
+from app import mongo
+from app.config import app_config
+from app.utils.cache import TTLCache
+from bson import ObjectId
+from bson.errors import InvalidId
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+# Fields shown wherever a user is displayed next to content (chat lines, hosts, authors)
+USER_CARD_PROJECTION = {'first_name': 1, 'last_name': 1, 'profile_image': 1}
+
+# Process-local cache of user cards, keyed by the string form of the user id
+user_card_cache = TTLCache(
+    maxsize=app_config.USER_CARD_CACHE_SIZE,
+    ttl=app_config.USER_CARD_CACHE_TTL
+)
+
+# Called with each invalidated user id (e.g. to refresh socket sessions)
+_invalidation_listeners: List[Callable[[Any], None]] = []
+
+def on_user_card_invalidated(listener: Callable[[Any], None]) -> None:
+    """Register a callback run whenever a user's card is invalidated"""
+    _invalidation_listeners.append(listener)
+
+def _copy(card: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+    # Callers are free to mutate what they get back, so never hand out the cached dict
+    return dict(card) if card else None
+
+def get_user_card(user_id: Any) -> Optional[Dict[str, Any]]:
+    """Get the {_id, first_name, last_name, profile_image} card for a user"""
+    if not user_id:
+        return None
+
+    key = str(user_id)
+    card = user_card_cache.get(key)
+    if card is not None:
+        return _copy(card)
+
+    try:
+        card = mongo.db.users.find_one({'_id': ObjectId(key)}, USER_CARD_PROJECTION)
+    except InvalidId:
+        return None
+
+    if card:
+        user_card_cache.set(key, card)
+    return _copy(card)
+
+def get_user_cards(user_ids: Iterable[Any]) -> Dict[str, Dict[str, Any]]:
+    """
+    Get cards for many users at once
+
+    Cached cards are served from memory and the rest are loaded with a
+    single $in query. Returns a dict keyed by the string form of the user id.
+    """
+    cards: Dict[str, Dict[str, Any]] = {}
+    missing = []
+
+    for user_id in {str(uid) for uid in user_ids if uid}:
+        card = user_card_cache.get(user_id)
+        if card is not None:
+            cards[user_id] = _copy(card)
+        else:
+            try:
+                missing.append(ObjectId(user_id))
+            except InvalidId:
+                continue
+
+    if missing:
+        for card in mongo.db.users.find({'_id': {'$in': missing}}, USER_CARD_PROJECTION):
+            user_card_cache.set(str(card['_id']), card)
+            cards[str(card['_id'])] = _copy(card)
+
+    return cards
+
+def invalidate_user_card(*user_ids: Any) -> None:
+    """Drop cached cards after a write to the users collection"""
+    for user_id in user_ids:
+        if user_id:
+            user_card_cache.delete(str(user_id))
+            for listener in _invalidation_listeners:
+                listener(user_id)
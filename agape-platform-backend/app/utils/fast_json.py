@@ -0,0 +1,43 @@
+import json
+from bson import ObjectId
+from datetime import datetime
+from typing import Any
+
+# JSON codec for Socket.IO packets.
+#
+# python-socketio encodes every emitted packet with `json.dumps`; passing this
+# module as SocketIO(json=...) swaps in orjson when it is installed (several
+# times faster, and it returns bytes that are decoded once here) and falls
+# back to the standard library otherwise. Both paths serialise ObjectId and
+# datetime values, so payloads do not need to be pre-stringified.
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional dependency
+    orjson = None
+
+BACKEND = 'orjson' if orjson else 'json'
+
+def _default(obj: Any) -> Any:
+    if isinstance(obj, ObjectId):
+        return str(obj)
+    if isinstance(obj, datetime):
+        return obj.isoformat()
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+if orjson:
+    _OPTIONS = orjson.OPT_NON_STR_KEYS
+
+    def dumps(obj: Any, **kwargs) -> str:
+        """Compact JSON text (keyword arguments such as separators are implied)"""
+        return orjson.dumps(obj, default=_default, option=_OPTIONS).decode()
+
+    def loads(s, **kwargs) -> Any:
+        return orjson.loads(s)
+else:
+    def dumps(obj: Any, **kwargs) -> str:
+        """Compact JSON text (keyword arguments such as separators are implied)"""
+        return json.dumps(obj, default=_default, separators=(',', ':'))
+
+    def loads(s, **kwargs) -> Any:
+        return json.loads(s)
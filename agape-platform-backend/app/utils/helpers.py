@@ -96,3 +96,13 @@ def serialize_document(obj: Union[Dict, List, ObjectId, datetime, Any]) -> Union
         return obj.isoformat(timespec='milliseconds') + 'Z'
     else:
         return obj
+
+def running_under_cli() -> bool:
+    """True while a `flask ...` CLI command is loading the app (no background tasks wanted)"""
+    import click
+    return click.get_current_context(silent=True) is not None
+
+# Server error codes that writing the same document again cannot fix (BadValue,
+# TypeMismatch, DocumentValidationFailure, BSONObjectTooLarge); write-behind
+# buffers drop such rows instead of retrying them forever
+PERMANENT_WRITE_ERRORS = {2, 14, 121, 10334}
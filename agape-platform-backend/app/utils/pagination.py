@@ -0,0 +1,111 @@
+import base64
+import json
+from datetime import datetime
+from bson import ObjectId
+from bson.errors import InvalidId
+from typing import Any, Dict, List, Optional, Tuple
+
+Cursor = Tuple[datetime, ObjectId]
+
+def encode_cursor(doc: Dict[str, Any], field: str) -> Optional[str]:
+    """Build an opaque cursor from a document's (field, _id) sort key"""
+    value = doc.get(field)
+    if not isinstance(value, datetime):
+        return None
+    payload = json.dumps({'v': value.isoformat(), 'id': str(doc['_id'])}, separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+def decode_cursor(token: str) -> Cursor:
+    """Decode an opaque cursor back to its (datetime, ObjectId) sort key; raises ValueError"""
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        return datetime.fromisoformat(payload['v']), ObjectId(payload['id'])
+    except (ValueError, KeyError, TypeError, InvalidId) as e:
+        raise ValueError('Invalid cursor') from e
+
+def parse_keyset_args(args) -> Tuple[Optional[str], Optional[Cursor]]:
+    """
+    Read the `before`/`after` cursor from request args
+
+    Returns (direction, cursor), or (None, None) when the request is not
+    cursor-paginated. Raises ValueError on a malformed cursor or when both
+    are given.
+    """
+    before = args.get('before')
+    after = args.get('after')
+    if before and after:
+        raise ValueError('Use either before or after, not both')
+    if before:
+        return 'before', decode_cursor(before)
+    if after:
+        return 'after', decode_cursor(after)
+    return None, None
+
+def wants_total(args, default: bool) -> bool:
+    """Whether the caller asked for an exact total (`include_total=true|false`)"""
+    value = args.get('include_total')
+    if value is None:
+        return default
+    return value.lower() == 'true'
+
+def keyset_condition(field: str, cursor: Cursor, direction: str) -> Dict[str, Any]:
+    """Filter for rows strictly before/after the cursor in (field, _id) order"""
+    value, object_id = cursor
+    op = '$lt' if direction == 'before' else '$gt'
+    return {'$or': [
+        {field: {op: value}},
+        {field: value, '_id': {op: object_id}}
+    ]}
+
+def with_keyset(filters: Dict[str, Any], field: str, cursor: Optional[Cursor], direction: Optional[str]) -> Dict[str, Any]:
+    """AND the keyset condition onto existing filters without clobbering their own $or"""
+    if not cursor or not direction:
+        return filters
+    condition = keyset_condition(field, cursor, direction)
+    return {'$and': [filters, condition]} if filters else condition
+
+def keyset_sort(field: str, natural_order: int, direction: Optional[str]) -> Tuple[List[Tuple[str, int]], bool]:
+    """
+    Sort to run the query with, and whether the results must be reversed
+
+    Paging against the list's natural order (e.g. `after` on a newest-first
+    list) walks the index backwards from the cursor, then flips the rows so
+    the response is always in natural order.
+    """
+    forward = 'before' if natural_order == -1 else 'after'
+    reverse = direction is not None and direction != forward
+    order = -natural_order if reverse else natural_order
+    return [(field, order), ('_id', order)], reverse
+
+def finish_keyset_page(docs: List[Dict[str, Any]], field: str, limit: int, reverse: bool) -> Tuple[List[Dict[str, Any]], Optional[str], bool]:
+    """
+    Trim a limit+1 fetch to the page and compute the continuation cursor
+
+    `next_cursor` continues in the same direction as the request (pass it back
+    as the same before/after parameter), or in the list's natural direction
+    when no cursor was given.
+    """
+    has_more = len(docs) > limit
+    docs = docs[:limit]
+    next_cursor = encode_cursor(docs[-1], field) if has_more and docs else None
+    if reverse:
+        docs.reverse()
+    return docs, next_cursor, has_more
+
+def page_response(items_key: str, items: List[Any], per_page: int, page: Optional[int] = None,
+                  total: Optional[int] = None, next_cursor: Optional[str] = None,
+                  has_more: bool = False) -> Dict[str, Any]:
+    """Common list response body for both page-number and cursor pagination"""
+    body: Dict[str, Any] = {
+        items_key: items,
+        'per_page': per_page,
+        'next_cursor': next_cursor,
+        'has_more': has_more
+    }
+    if page is not None:
+        body['page'] = page
+    if total is not None:
+        body['total'] = total
+        body['pages'] = (total + per_page - 1) // per_page
+    return body
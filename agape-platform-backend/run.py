@@ -2,7 +2,8 @@ import eventlet
 eventlet.monkey_patch() # <-- MUST BE CALLED FIRST!
 
 from app import create_app
-from app.services.socket_service import socketio
+from app.services.socket_service import socketio, start_presence_heartbeat
+from app.services.job_service import start_workers
 import logging
 
 # Configure logging
@@ -14,6 +15,12 @@ logging.basicConfig(
 # Create the Flask app instance AFTER monkey patching
 app = create_app()
 
+# Background job workers (notifications, reminders, recurring meetings)
+start_workers(app)
+
+# Shared presence upkeep (only with PRESENCE_BACKEND=mongo)
+start_presence_heartbeat(app)
+
 # This block is only executed when running the script directly (e.g., python run.py)
 # Gunicorn finds the 'app' variable directly and doesn't run this __main__ block.
 if __name__ == '__main__':
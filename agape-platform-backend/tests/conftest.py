@@ -0,0 +1,43 @@
+import os
+import sys
+
+import mongomock
+import pytest
+from flask_pymongo import PyMongo
+
+# Tests run against an in-memory mongomock database instead of a MongoDB server
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('MONGODB_URI', 'mongodb://localhost:27017/agape_test')
+
+_client = mongomock.MongoClient()
+
+def _init_app(self, app, uri=None, *args, **kwargs):
+    self.cx = _client
+    self.db = _client['agape_test']
+
+PyMongo.init_app = _init_app
+
+@pytest.fixture(scope='session')
+def app():
+    from app import create_app
+    app = create_app()
+    app.config['TESTING'] = True
+    return app
+
+@pytest.fixture
+def db(app):
+    from app import mongo
+    yield mongo.db
+    _client.drop_database('agape_test')
+
+@pytest.fixture
+def token(app):
+    """Access token for a user, with the claims the login route issues"""
+    from flask_jwt_extended import create_access_token
+
+    def make(user_id, role='member', camp_id=None):
+        with app.app_context():
+            return create_access_token(identity=str(user_id), additional_claims={
+                'role': role, 'camp_id': str(camp_id) if camp_id else None
+            })
+    return make
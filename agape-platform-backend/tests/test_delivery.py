@@ -0,0 +1,121 @@
+from collections import Counter
+
+import pytest
+
+# Frames per client for message sends: every socket that should see a
+# message gets exactly one `new_message` (and `message_confirmed` when the
+# send carried a tempId), however many of the target rooms it sits in.
+
+@pytest.fixture
+def people(db):
+    camp = db.camps.insert_one({'name': 'North', 'is_active': True}).inserted_id
+    other_camp = db.camps.insert_one({'name': 'South', 'is_active': True}).inserted_id
+
+    def user(name, camp_id):
+        return db.users.insert_one({
+            'first_name': name, 'last_name': 'Test', 'email': f"{name.lower()}@example.com",
+            'password_hash': 'x', 'role': 'member', 'camp_id': camp_id, 'is_active': True
+        }).inserted_id
+
+    return {
+        'camp': camp,
+        'sender': user('Sender', camp),
+        'recipient': user('Recipient', camp),
+        'bystander': user('Bystander', camp),
+        'outsider': user('Outsider', other_camp)
+    }
+
+@pytest.fixture
+def connect(app, token):
+    from app.services.socket_service import socketio
+
+    clients = []
+
+    def make(user_id, camp_id=None):
+        client = socketio.test_client(app)
+        client.emit('authenticate', {'token': token(user_id, camp_id=camp_id)})
+        client.get_received()
+        clients.append(client)
+        return client
+
+    yield make
+    for client in clients:
+        if client.is_connected():
+            client.disconnect()
+
+@pytest.fixture
+def sockets(people, connect):
+    clients = {name: connect(people[name], people['camp']) for name in ('sender', 'recipient', 'bystander')}
+    clients['outsider'] = connect(people['outsider'])
+    return clients
+
+def frames(client):
+    """Count of each delivery event a client received since the last call"""
+    counts = Counter(packet['name'] for packet in client.get_received())
+    return {event: counts[event] for event in ('new_message', 'message_confirmed')}
+
+def drain(clients):
+    for client in clients.values():
+        client.get_received()
+
+def open_chat(client, user_id, partner_id):
+    client.emit('join_chat', {'user_id': str(user_id), 'partner_id': str(partner_id)})
+    client.get_received()
+
+def test_direct_message_reaches_each_participant_once(people, sockets):
+    # Both sit in the chat room and their own user rooms
+    open_chat(sockets['sender'], people['sender'], people['recipient'])
+    open_chat(sockets['recipient'], people['recipient'], people['sender'])
+
+    sockets['sender'].emit('new_message', {
+        'content': 'hello', 'recipient_type': 'user', 'recipient_id': str(people['recipient']), 'tempId': 't1'
+    })
+
+    assert frames(sockets['sender']) == {'new_message': 1, 'message_confirmed': 1}
+    assert frames(sockets['recipient']) == {'new_message': 1, 'message_confirmed': 1}
+    assert frames(sockets['bystander']) == {'new_message': 0, 'message_confirmed': 0}
+    assert frames(sockets['outsider']) == {'new_message': 0, 'message_confirmed': 0}
+
+def test_direct_message_reaches_every_tab_once(people, sockets, connect):
+    second_tab = connect(people['recipient'], people['camp'])
+    drain(sockets)
+
+    sockets['sender'].emit('new_message', {
+        'content': 'hello', 'recipient_type': 'user', 'recipient_id': str(people['recipient'])
+    })
+
+    assert frames(sockets['recipient']) == {'new_message': 1, 'message_confirmed': 0}
+    assert frames(second_tab) == {'new_message': 1, 'message_confirmed': 0}
+
+def test_camp_message_reaches_camp_members_once(people, sockets):
+    drain(sockets)
+    sockets['sender'].emit('new_message', {
+        'content': 'camp news', 'recipient_type': 'camp', 'recipient_id': str(people['camp']), 'tempId': 't2'
+    })
+
+    assert frames(sockets['sender']) == {'new_message': 1, 'message_confirmed': 1}
+    assert frames(sockets['recipient']) == {'new_message': 1, 'message_confirmed': 0}
+    assert frames(sockets['bystander']) == {'new_message': 1, 'message_confirmed': 0}
+    assert frames(sockets['outsider']) == {'new_message': 0, 'message_confirmed': 0}
+
+def test_ministry_message_reaches_everyone_once(people, sockets):
+    drain(sockets)
+    sockets['sender'].emit('new_message', {'content': 'to all', 'recipient_type': 'ministry', 'tempId': 't3'})
+
+    assert frames(sockets['sender']) == {'new_message': 1, 'message_confirmed': 1}
+    for name in ('recipient', 'bystander', 'outsider'):
+        assert frames(sockets[name]) == {'new_message': 1, 'message_confirmed': 0}
+
+def test_rest_direct_message_reaches_each_participant_once(app, people, sockets, token):
+    open_chat(sockets['sender'], people['sender'], people['recipient'])
+    open_chat(sockets['recipient'], people['recipient'], people['sender'])
+
+    response = app.test_client().post('/api/messages/', json={
+        'content': 'hello', 'recipient_type': 'user', 'recipient_id': str(people['recipient']), 'tempId': 't4'
+    }, headers={'Authorization': f"Bearer {token(people['sender'], camp_id=people['camp'])}"})
+
+    assert response.status_code == 201
+    assert frames(sockets['sender']) == {'new_message': 1, 'message_confirmed': 1}
+    assert frames(sockets['recipient']) == {'new_message': 1, 'message_confirmed': 1}
+    assert frames(sockets['bystander']) == {'new_message': 0, 'message_confirmed': 0}
+    assert frames(sockets['outsider']) == {'new_message': 0, 'message_confirmed': 0}
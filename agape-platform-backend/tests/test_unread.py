@@ -0,0 +1,127 @@
+import time
+from datetime import timezone
+
+import pytest
+
+# Unread counters follow sends, reads and deletes, and always agree with a
+# rebuild from messages and read state (GET unread-summary?refresh=true).
+
+@pytest.fixture
+def camp(db):
+    camp_id = db.camps.insert_one({'name': 'North', 'is_active': True}).inserted_id
+
+    def user(name):
+        return db.users.insert_one({
+            'first_name': name, 'last_name': 'Test', 'email': f"{name.lower()}@example.com",
+            'password_hash': 'x', 'role': 'member', 'camp_id': camp_id, 'is_active': True
+        }).inserted_id
+
+    return {'id': camp_id, 'sender': user('Sender'), 'reader': user('Reader'), 'other': user('Other')}
+
+@pytest.fixture
+def api(app, token, camp):
+    client = app.test_client()
+
+    def call(method, path, user, **kwargs):
+        headers = {'Authorization': f"Bearer {token(user, camp_id=camp['id'])}"}
+        response = getattr(client, method)(path, headers=headers, **kwargs)
+        assert response.status_code in (200, 201), response.get_json()
+        return response.get_json()
+    return call
+
+@pytest.fixture
+def unread(api):
+    def count(user, refresh=False):
+        path = '/api/messages/unread-summary' + ('?refresh=true' if refresh else '')
+        return api('get', path, user)['messages']
+    return count
+
+@pytest.fixture
+def send(api, camp):
+    def send_message(recipient_type='camp', recipient_id=None):
+        message = api('post', '/api/messages/', camp['sender'], json={
+            'content': 'hello', 'recipient_type': recipient_type,
+            'recipient_id': str(recipient_id or camp['id'])
+        })
+        # Distinct created_at for each message, so a watermark can fall between them
+        time.sleep(0.005)
+        return message['message_id']
+    return send_message
+
+def created_at(db, message_id):
+    from bson import ObjectId
+    value = db.messages.find_one({'_id': ObjectId(message_id)})['created_at']
+    return (value if value.tzinfo else value.replace(tzinfo=timezone.utc)).isoformat()
+
+def test_send_counts_for_recipients_not_sender(camp, send, unread):
+    for user in ('sender', 'reader', 'other'):
+        unread(camp[user])
+    send()
+    send()
+
+    assert unread(camp['sender']) == 0
+    assert unread(camp['reader']) == 2
+    assert unread(camp['other']) == 2
+
+def test_read_up_to_a_message(db, camp, api, send, unread):
+    unread(camp['reader'])
+    first, second, third = send(), send(), send()
+
+    api('post', '/api/messages/read', camp['reader'], json={
+        'conversation': f"camp:{camp['id']}", 'upto': created_at(db, second)
+    })
+
+    assert unread(camp['reader']) == 1
+    assert unread(camp['reader'], refresh=True) == 1
+
+def test_delete_then_read_counts_each_message_once(db, camp, api, send, unread):
+    unread(camp['reader'])
+    first, second, third = send(), send(), send()
+
+    api('delete', f"/api/messages/{first}", camp['sender'])
+    assert unread(camp['reader']) == 2
+
+    # The watermark passes the deleted message; it must not be taken off again
+    result = api('post', '/api/messages/read', camp['reader'], json={
+        'conversation': f"camp:{camp['id']}", 'upto': created_at(db, second)
+    })
+
+    assert result['count'] == 1
+    assert unread(camp['reader']) == 1
+    assert unread(camp['reader'], refresh=True) == 1
+
+def test_delete_only_uncounts_unread_recipients(camp, api, send, unread):
+    unread(camp['reader'])
+    unread(camp['other'])
+    message = send()
+    api('post', '/api/messages/read', camp['reader'], json={
+        'conversation': f"camp:{camp['id']}", 'message_ids': [message]
+    })
+
+    api('delete', f"/api/messages/{message}", camp['sender'])
+
+    assert unread(camp['reader']) == 0
+    assert unread(camp['other']) == 0
+    assert unread(camp['other'], refresh=True) == 0
+
+def test_opening_a_deleted_message_is_not_a_read(camp, api, send, unread):
+    unread(camp['reader'])
+    message, kept = send(), send()
+    api('delete', f"/api/messages/{message}", camp['sender'])
+
+    result = api('post', '/api/messages/read', camp['reader'], json={
+        'conversation': f"camp:{camp['id']}", 'message_ids': [message]
+    })
+
+    assert result['count'] == 0
+    assert unread(camp['reader']) == 1
+
+def test_direct_message_send_and_delete(camp, api, send, unread):
+    unread(camp['reader'])
+    message = send('user', camp['reader'])
+    assert unread(camp['reader']) == 1
+
+    api('delete', f"/api/messages/{message}", camp['sender'])
+
+    assert unread(camp['reader']) == 0
+    assert unread(camp['reader'], refresh=True) == 0